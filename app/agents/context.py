@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+from strands.agent.conversation_manager import ConversationManager
+from strands.types.exceptions import ContextWindowOverflowException
+
+from app.config import ContextPolicy
+from app.data.tokens import estimate_tokens
+
+Message = Dict[str, Any]
+
+SUMMARY_PREFIX = "[summarized earlier tool output]"
+# key ที่บอกขนาด/โครงสร้างของผลลัพธ์ (มาจาก encode_rows / query_report) เก็บไว้ในสรุปให้ LLM รู้ว่าเคยได้อะไร
+_SUMMARY_KEYS = ("report", "row_count", "total", "columns", "omitted_rows")
+
+
+def _is_turn_start(message: Message) -> bool:
+    """ข้อความผู้ใช้ที่ไม่ใช่ toolResult = จุดเริ่ม turn และเป็นจุดตัดประวัติที่ถูกต้องเสมอ"""
+    return message.get("role") == "user" and not any("toolResult" in block for block in message.get("content", []))
+
+
+def _turn_starts(messages: List[Message]) -> List[int]:
+    return [i for i, message in enumerate(messages) if _is_turn_start(message)]
+
+
+def _tool_text(result: Dict[str, Any]) -> str:
+    parts = []
+    for block in result.get("content", []):
+        if "text" in block:
+            parts.append(block["text"])
+        elif "json" in block:
+            parts.append(json.dumps(block["json"], ensure_ascii=False, separators=(",", ":"), default=str))
+    return "\n".join(parts)
+
+
+def summarize_tool_output(text: str, max_chars: int) -> str:
+    """ย่อผลลัพธ์ tool เก่าเหลือโครงสร้าง (คอลัมน์/จำนวนแถว) + ต้นข้อความ"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    facts = []
+    if isinstance(data, dict):
+        for key in _SUMMARY_KEYS:
+            if key in data:
+                facts.append(f"{key}={json.dumps(data[key], ensure_ascii=False, default=str)}")
+    elif isinstance(data, list):
+        facts.append(f"items={len(data)}")
+    head = " ".join(text.split())
+    summary = f"{SUMMARY_PREFIX} {len(text)} chars"
+    if facts:
+        summary += "; " + ", ".join(facts)
+    budget = max_chars - len(summary) - 2
+    if budget > 20:
+        summary += ": " + (head if len(head) <= budget else head[: budget - 1] + "…")
+    return summary
+
+
+def history_tokens(messages: List[Message]) -> int:
+    return estimate_tokens(json.dumps(messages, ensure_ascii=False, separators=(",", ":"), default=str))
+
+
+class BoundedContextManager(ConversationManager):
+    """
+    คุมขนาดประวัติของ Strands Agent หลังจบแต่ละ invocation ตาม ``ContextPolicy``
+    1) ``max_turns == 0`` -> stateless ล้างประวัติทั้งหมด
+    2) tool output ที่เก่ากว่า ``full_tool_turns`` turn ถูกย่อเหลือบรรทัดสรุป (คำถาม/คำตอบของ LLM ยังอยู่ครบ)
+    3) เก็บ ``max_turns`` turn ล่าสุด แล้วตัด turn เก่าสุดต่อจนประวัติไม่เกิน ``max_tokens`` (turn ล่าสุดอยู่เสมอ)
+    ตัดที่จุดเริ่ม turn เท่านั้น จึงไม่มี toolUse/toolResult ที่ขาดคู่
+    """
+
+    def __init__(self, policy: ContextPolicy) -> None:
+        super().__init__()
+        self.policy = policy
+        self.summarized_results = 0
+        self.last_history_tokens = 0
+
+    def apply_management(self, agent: Any, **kwargs: Any) -> None:
+        messages = agent.messages
+        if self.policy.max_turns <= 0:
+            self.removed_message_count += len(messages)
+            messages.clear()
+            self.last_history_tokens = 0
+            return
+        self._summarize_tool_results(messages, keep_turns=self.policy.full_tool_turns)
+        starts = _turn_starts(messages)
+        if len(starts) > self.policy.max_turns:
+            self._drop_before(messages, starts[-self.policy.max_turns])
+        tokens = history_tokens(messages)
+        while tokens > self.policy.max_tokens:
+            starts = _turn_starts(messages)
+            if len(starts) < 2:
+                break
+            self._drop_before(messages, starts[1])
+            tokens = history_tokens(messages)
+        self.last_history_tokens = tokens
+
+    def reduce_context(self, agent: Any, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        """เกิน context window ระหว่าง turn: ย่อ tool output ทุกตัวก่อน ถ้ายังย่อไม่ได้ค่อยตัด turn เก่าสุด"""
+        messages = agent.messages
+        if self._summarize_tool_results(messages, keep_turns=0):
+            return
+        starts = _turn_starts(messages)
+        if len(starts) >= 2:
+            self._drop_before(messages, starts[1])
+            return
+        if e is not None:
+            raise ContextWindowOverflowException("Unable to reduce conversation context") from e
+
+    def _drop_before(self, messages: List[Message], index: int) -> None:
+        self.removed_message_count += index
+        del messages[:index]
+
+    def _summarize_tool_results(self, messages: List[Message], keep_turns: int) -> int:
+        if keep_turns <= 0:
+            end = len(messages)
+        else:
+            starts = _turn_starts(messages)
+            end = starts[-keep_turns] if len(starts) >= keep_turns else 0
+        changed = 0
+        for message in messages[:end]:
+            for block in message.get("content", []):
+                result = block.get("toolResult")
+                if result is None:
+                    continue
+                text = _tool_text(result)
+                if len(text) <= self.policy.summary_chars or text.startswith(SUMMARY_PREFIX):
+                    continue
+                result["content"] = [{"text": summarize_tool_output(text, self.policy.summary_chars)}]
+                changed += 1
+        self.summarized_results += changed
+        return changed
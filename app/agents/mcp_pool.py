@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import atexit
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence
+
+from mcp.client.streamable_http import streamablehttp_client
+from strands.tools.mcp.mcp_client import MCPClient
+
+from app.config import MCP_HEALTH_CHECK_SECONDS
+
+
+class MCPConnection:
+    """
+    Connection เดียวต่อ MCP server URL ที่ทุก Runtime/DomainAgent ใช้ร่วมกัน
+    เก็บ tool catalogue ไว้ (list_tools ครั้งเดียว) และ reconnect เองเมื่อ health check ล้มเหลว
+    """
+
+    def __init__(self, url: str, health_check_interval: float = MCP_HEALTH_CHECK_SECONDS) -> None:
+        self.url = url
+        self.health_check_interval = health_check_interval
+        self.client = MCPClient(lambda: streamablehttp_client(url))
+        self._lock = Lock()
+        self._connected = False
+        self._tools: List[Any] = []
+        self._last_ok = 0.0
+
+    def tools(self, allowed: Optional[Sequence[str]] = None) -> List[Any]:
+        """Return the cached tool catalogue, optionally restricted to ``allowed`` tool names."""
+        self.ensure_healthy()
+        if not allowed:
+            return list(self._tools)
+        names = set(allowed)
+        return [t for t in self._tools if t.tool_name in names]
+
+    def ensure_healthy(self) -> None:
+        with self._lock:
+            if self._connected and time.monotonic() - self._last_ok < self.health_check_interval:
+                return
+            if not self._connected:
+                self._connect()
+                return
+            try:
+                self._refresh_tools()
+            except Exception as e:
+                # Session หลุด (เช่น server restart) -> ใช้ MCPClient ตัวเดิม start ใหม่ ให้ tool ที่ agent ถืออยู่ยังใช้ได้
+                print(f"Warning: MCP health check failed for {self.url}, reconnecting: {e}")
+                self._disconnect()
+                self._connect()
+
+    def _connect(self) -> None:
+        self.client.start()
+        self._connected = True
+        try:
+            self._refresh_tools()
+        except Exception as e:
+            # ไม่เก็บ catalogue ว่างไว้: agent ที่สร้างช่วงนี้จะไม่มี tool ไปตลอด session -> ให้ผู้เรียกลองใหม่รอบหน้า
+            print(f"Warning: Could not list tools at {self.url}: {e}")
+            self._disconnect()
+            raise
+
+    def _refresh_tools(self) -> None:
+        self._tools = list(self.client.list_tools_sync())
+        self._last_ok = time.monotonic()
+
+    def _disconnect(self) -> None:
+        try:
+            self.client.stop(None, None, None)
+        except Exception:
+            pass
+        self._connected = False
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connected:
+                self._disconnect()
+
+
+class MCPConnectionPool:
+    def __init__(self, health_check_interval: float = MCP_HEALTH_CHECK_SECONDS) -> None:
+        self.health_check_interval = health_check_interval
+        self._connections: Dict[str, MCPConnection] = {}
+        self._lock = Lock()
+
+    def get(self, url: str) -> MCPConnection:
+        with self._lock:
+            connection = self._connections.get(url)
+            if connection is None:
+                connection = MCPConnection(url, self.health_check_interval)
+                self._connections[url] = connection
+        return connection
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+
+_default_pool: Optional[MCPConnectionPool] = None
+_default_pool_lock = Lock()
+
+
+def get_pool() -> MCPConnectionPool:
+    """Process-wide pool (ปิด connection ทั้งหมดตอนจบ process)"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = MCPConnectionPool()
+            atexit.register(_default_pool.close_all)
+        return _default_pool
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import (
+    AGENT_SETTINGS,
+    AgentSettings,
+    ROUTER_ENABLED,
+    ROUTER_MIN_CHARS,
+    ROUTER_MIN_CONFIDENCE,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_MODEL_PATH,
+)
+from app.data.text import normalize_text
+
+# ตัวเลข/จำนวนเงินไม่บอก intent ("ค่าแท็กซี่ 350 บาท" กับ "ค่าแท็กซี่ 120 บาท" เป็นเรื่องเดียวกัน)
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_SPACE_RE = re.compile(r"\s+")
+NGRAM_RANGE = (2, 3)
+
+
+@dataclass
+class RouteDecision:
+    """ผลการเลือก agent: ``agent_key`` = None แปลว่าให้ Orchestrator (LLM) ตัดสินใจเอง"""
+
+    agent_key: Optional[str]
+    method: str  # "rule" | "model" | "llm"
+    confidence: float
+    reason: str
+
+    @property
+    def fast_path(self) -> bool:
+        return self.agent_key is not None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _features(text: str) -> Dict[str, int]:
+    text = _SPACE_RE.sub(" ", _NUMBER_RE.sub(" ", normalize_text(text))).strip()
+    counts: Dict[str, int] = defaultdict(int)
+    padded = f" {text} "
+    for size in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(padded) - size + 1):
+            gram = padded[i : i + size]
+            if gram.strip():
+                counts[gram] += 1
+    return counts
+
+
+class NGramIntentModel:
+    """
+    Multinomial Naive Bayes บน character n-gram (ภาษาไทยไม่เว้นวรรคระหว่างคำ จึงไม่ตัดคำ)
+    เทรนจากข้อความผู้ใช้ใน log ที่ Orchestrator (LLM) ส่งต่อให้ agent เดียว -> ป้ายกำกับมาจาก LLM เอง
+    """
+
+    def __init__(self) -> None:
+        self.class_counts: Dict[str, int] = {}
+        self.gram_counts: Dict[str, Dict[str, int]] = {}
+        self.gram_totals: Dict[str, int] = {}
+        self.vocabulary: set[str] = set()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.class_counts.values())
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "NGramIntentModel":
+        for text, label in samples:
+            self.class_counts[label] = self.class_counts.get(label, 0) + 1
+            grams = self.gram_counts.setdefault(label, {})
+            for gram, count in _features(text).items():
+                grams[gram] = grams.get(gram, 0) + count
+                self.gram_totals[label] = self.gram_totals.get(label, 0) + count
+                self.vocabulary.add(gram)
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(label, posterior probability) ของ class ที่น่าจะเป็นที่สุด"""
+        if not self.class_counts:
+            return None, 0.0
+        features = _features(text)
+        vocab = len(self.vocabulary) + 1
+        total = self.samples
+        scores: Dict[str, float] = {}
+        for label, class_count in self.class_counts.items():
+            grams = self.gram_counts.get(label, {})
+            denominator = math.log(self.gram_totals.get(label, 0) + vocab)
+            score = math.log(class_count / total)
+            for gram, count in features.items():
+                # n-gram ที่ไม่เคยเห็นเลยไม่ช่วยแยก class -> ข้าม
+                if gram in self.vocabulary:
+                    score += count * (math.log(grams.get(gram, 0) + 1) - denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        normalizer = sum(math.exp(s - peak) for s in scores.values())
+        return best, 1.0 / normalizer
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"class_counts": self.class_counts, "gram_counts": self.gram_counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NGramIntentModel":
+        model = cls()
+        model.class_counts = {k: int(v) for k, v in data.get("class_counts", {}).items()}
+        model.gram_counts = {k: dict(v) for k, v in data.get("gram_counts", {}).items()}
+        model.gram_totals = {k: sum(v.values()) for k, v in model.gram_counts.items()}
+        model.vocabulary = {g for grams in model.gram_counts.values() for g in grams}
+        return model
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["NGramIntentModel"]:
+        try:
+            return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+        except (OSError, ValueError) as e:
+            if Path(path).exists():
+                print(f"Warning: Could not load router model {path}: {e}")
+            return None
+
+
+class IntentRouter:
+    """
+    เลือก DomainAgent ในเครื่องก่อนถึง Orchestrator LLM
+    1) regex ของแต่ละ agent (``AgentSettings.route_patterns``): ตรง agent เดียว = มั่นใจ, ตรงหลายตัว = ส่ง LLM
+    2) ไม่ตรงกฎ -> n-gram model (ถ้ามีและเทรนมาพอ) ต้องมั่นใจ >= ``min_confidence``
+    3) นอกนั้นให้ LLM ตัดสิน
+    เก็บค่าเฉลี่ยเวลาที่ Orchestrator LLM ใช้ตัดสินใจ ไว้ประเมินเวลาที่ประหยัดได้จาก fast path
+    """
+
+    def __init__(
+        self,
+        settings: Dict[str, AgentSettings] = AGENT_SETTINGS,
+        model: Optional[NGramIntentModel] = None,
+        min_confidence: float = ROUTER_MIN_CONFIDENCE,
+        min_samples: int = ROUTER_MIN_SAMPLES,
+        min_chars: int = ROUTER_MIN_CHARS,
+        enabled: bool = ROUTER_ENABLED,
+    ) -> None:
+        self.rules = {
+            key: [re.compile(p, re.IGNORECASE) for p in config.route_patterns]
+            for key, config in settings.items()
+            if config.route_patterns
+        }
+        # agent ที่คำตอบต้องผ่าน Orchestrator ก่อน (เช่น OF ตอบเป็น JSON) ไม่ใช้ fast path
+        self.direct = {key for key, config in settings.items() if config.direct_answer}
+        self.model = model if model is not None and model.samples >= min_samples else None
+        self.min_confidence = min_confidence
+        self.min_chars = min_chars
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # EWMA ของ overhead ฝั่ง Orchestrator ต่อ turn (เวลา turn - เวลาที่ DomainAgent ทำงาน)
+        self._overhead_ms: Optional[float] = None
+
+    def route(self, text: str) -> RouteDecision:
+        decision = self._classify(text)
+        if decision.fast_path and decision.agent_key not in self.direct:
+            return RouteDecision(None, "llm", decision.confidence, f"{decision.agent_key} answer needs the orchestrator")
+        return decision
+
+    def _classify(self, text: str) -> RouteDecision:
+        if not self.enabled:
+            return RouteDecision(None, "llm", 0.0, "router disabled")
+        if len(text.strip()) < self.min_chars:
+            # ข้อความสั้นมักอ้างถึงบทสนทนาก่อนหน้า ("แล้วคลัง 002 ล่ะ") ต้องใช้ context ของ LLM
+            return RouteDecision(None, "llm", 0.0, "message too short")
+
+        matched = {key for key, patterns in self.rules.items() if any(p.search(text) for p in patterns)}
+        if len(matched) == 1:
+            key = matched.pop()
+            return RouteDecision(key, "rule", 1.0, "keyword rule")
+        if len(matched) > 1:
+            return RouteDecision(None, "llm", 0.0, f"rules matched {sorted(matched)}")
+
+        if self.model is not None:
+            label, probability = self.model.predict(text)
+            if label is not None and probability >= self.min_confidence:
+                return RouteDecision(label, "model", round(probability, 4), "n-gram model")
+            return RouteDecision(None, "llm", round(probability, 4), f"model unsure ({label})")
+        return RouteDecision(None, "llm", 0.0, "no rule matched")
+
+    def observe_llm_overhead(self, overhead_ms: float, alpha: float = 0.2) -> None:
+        with self._lock:
+            if self._overhead_ms is None:
+                self._overhead_ms = overhead_ms
+            else:
+                self._overhead_ms += alpha * (overhead_ms - self._overhead_ms)
+
+    @property
+    def expected_saving_ms(self) -> Optional[float]:
+        return self._overhead_ms
+
+
+# --- Training from logs ---
+
+
+def training_samples(records: Sequence[Dict[str, Any]], settings: Dict[str, AgentSettings] = AGENT_SETTINGS) -> List[Tuple[str, str]]:
+    """
+    ดึง (ข้อความผู้ใช้, agent key) จาก log ของ sink: turn ที่ Orchestrator LLM เรียก DomainAgent ตัวเดียว
+    turn ที่ถูกส่งผ่าน fast path ไม่นับ (ไม่งั้น model จะเรียนจากผลของตัวเอง)
+    """
+    key_by_name = {config.name: key for key, config in settings.items()}
+    samples: List[Tuple[str, str]] = []
+    pending: Dict[str, Tuple[str, set]] = {}
+    for record in sorted(records, key=lambda r: r["ts"]):
+        session, stage, payload = record.get("session", ""), record.get("stage"), record.get("payload") or {}
+        if stage == "input" and record.get("agent") == "User":
+            pending[session] = (record.get("message", ""), set())
+        elif stage == "span" and session in pending:
+            text, agents = pending[session]
+            if payload.get("kind") == "agent" and payload.get("agent") in key_by_name:
+                agents.add(key_by_name[payload["agent"]])
+            elif payload.get("kind") == "turn":
+                route = (payload.get("attributes") or {}).get("route", "llm")
+                if route == "llm" and len(agents) == 1 and payload.get("status") == "ok":
+                    samples.append((text, next(iter(agents))))
+                del pending[session]
+    return samples
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> IntentRouter:
+    """Router ตัวเดียวทั้ง process (โหลด n-gram model จาก ROUTER_MODEL_PATH ถ้ามี)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = IntentRouter(model=NGramIntentModel.load(ROUTER_MODEL_PATH))
+        return _router
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the fast-path router's n-gram model from logged traffic.")
+    parser.add_argument("--days", type=float, default=30, help="ใช้ log ย้อนหลังกี่วัน")
+    parser.add_argument("--output", type=Path, default=ROUTER_MODEL_PATH)
+    args = parser.parse_args()
+
+    from app.telemetry.sink import get_log_sink
+
+    sink = get_log_sink()
+    if sink is None:
+        raise SystemExit("LOG_SINK is disabled; no logged traffic to train from.")
+    records = sink.read(start=datetime.now().astimezone() - timedelta(days=args.days))
+    samples = training_samples(records)
+    model = NGramIntentModel().fit(samples)
+    model.save(args.output)
+    per_class = ", ".join(f"{k}={v}" for k, v in sorted(model.class_counts.items())) or "none"
+    print(f"Trained on {len(samples)} routed turns ({per_class}) -> {args.output}")
+    if model.samples < ROUTER_MIN_SAMPLES:
+        print(f"Note: the router ignores the model until it has at least {ROUTER_MIN_SAMPLES} samples.")
+
+
+if __name__ == "__main__":
+    main()
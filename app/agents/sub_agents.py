@@ -1,69 +1,121 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+import uuid
+from concurrent.futures import CancelledError
+from threading import Event, Lock
+from typing import Callable, Dict, Optional
 
-from mcp.client.streamable_http import streamablehttp_client
 from strands import Agent
-from strands.tools.mcp.mcp_client import MCPClient
 
+from app.agents.context import BoundedContextManager
+from app.agents.mcp_pool import MCPConnectionPool, get_pool
 from app.agents.message_utils import render_message
-from app.config import AGENT_SETTINGS, AgentSettings, build_default_model
-from app.telemetry.callbacks import build_agent_callback
+from app.agents.traced_tool import TracedMCPTool
+from app.config import AGENT_SETTINGS, AgentSettings, get_shared_model
+from app.telemetry.callbacks import StreamRelay, build_agent_callback
 from app.telemetry.log_store import AgentLogStore
+from app.telemetry.spans import start_span, track_usage
 
 
 class DomainAgent:
-    def __init__(self, key: str, config: AgentSettings, log_store: AgentLogStore) -> None:
+    def __init__(
+        self,
+        key: str,
+        config: AgentSettings,
+        log_store: AgentLogStore,
+        pool: Optional[MCPConnectionPool] = None,
+        relay: Optional[StreamRelay] = None,
+    ) -> None:
         self.key = key
         self.config = config
         self.log_store = log_store
-        
-        # Initialize MCP Client
-        # เราเปิด connection แบบ Explicit แต่ลบ atexit ออกเพื่อให้ Runtime เป็นผู้จัดการ
-        self._client = MCPClient(lambda: streamablehttp_client(config.server_url))
-        self._client.__enter__()
-        
-        # ดึง Tools แบบ Synchronous (เพิ่ม Error Handling เพื่อความปลอดภัย)
-        try:
-            tools = self._client.list_tools_sync()
-        except Exception as e:
-            print(f"Warning: Could not list tools for {key} at {config.server_url}: {e}")
-            tools = []
+        # Strands Agent รับได้ทีละ invocation จึงต้อง serialize การเรียกซ้อนจาก Orchestrator
+        self._run_lock = Lock()
+        # cancel_signal ของ invocation ที่กำลังรันอยู่ (แต่ละ call มี Event ของตัวเอง ไม่ใช้ signal ของทั้ง agent)
+        self._active_cancel: Optional[Event] = None
+
+        # ยืม MCP session + tool catalogue จาก pool ที่ใช้ร่วมกันทั้ง process
+        # และเห็นเฉพาะ tool ที่อยู่ใน allow-list ของ agent นี้
+        self._connection = (pool or get_pool()).get(config.server_url)
+        # ห่อแต่ละ tool ให้บันทึก span (เวลา + trace id) ลง log ของ session นี้
+        tools = [TracedMCPTool(t, log_store, config.name) for t in self._connection.tools(config.allowed_tools)]
 
         self.agent = Agent(
             system_prompt=config.system_prompt,
             tools=tools,
-            model=build_default_model(),
-            callback_handler=build_agent_callback(config.name, log_store),
+            model=get_shared_model(),
+            callback_handler=build_agent_callback(config.name, log_store, relay),
+            # ประวัติสนทนาตามนโยบายของ agent (เช่น OF ไม่จำ, Reporter จำไม่กี่ turn) ไม่ให้ prompt โตตามอายุ session
+            conversation_manager=BoundedContextManager(config.context),
         )
 
     def close(self) -> None:
         """
-        สั่งปิด MCP Client Connection อย่างถูกวิธี
+        คืน resource ของ agent นี้ (MCP connection เป็นของ pool กลาง จึงไม่ปิดที่นี่)
         Runtime ควรเรียกใช้ฟังก์ชันนี้เมื่อจบการทำงาน
         """
-        try:
-            self._client.__exit__(None, None, None)
-        except Exception:
-            pass
+        self.cancel()
+
+    def cancel(self) -> None:
+        """ขอให้ invocation ที่กำลังรันอยู่ (ถ้ามี) หยุดที่จุดปลอดภัยถัดไป call ที่ยังรอคิวไม่ได้รับผล"""
+        cancel_signal = self._active_cancel
+        if cancel_signal is not None:
+            cancel_signal.set()
 
-    def run(self, query: str, context: Optional[str] = None) -> str:
+    def run(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        cancel_signal: Optional[Event] = None,
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> str:
+        """
+        cancel_signal: Event ของ call นี้ (set = หยุด invocation นี้ หรือไม่ต้องเริ่มถ้ายังรอคิวอยู่)
+        on_start: เรียกเมื่อได้ lock ของ agent แล้ว (ผู้เรียกเริ่มจับเวลา timeout จากจุดนี้)
+        """
         payload = query if not context else f"{query}\n\nContext: {context}"
-        
-        # บันทึก Input (Process Log)
-        self.log_store.add(self.config.name, "input", payload)
-        
-        try:
-            # ใช้ render_message ตัวใหม่ที่แก้ไปแล้ว
-            result = self.agent(payload)
-            content = render_message(result)
-            
-            # บันทึก Output
-            self.log_store.add(self.config.name, "output", content)
-            return content
-        except Exception as exc:
-            self.log_store.add(self.config.name, "error", str(exc))
-            raise
-
-def build_domain_agents(log_store: AgentLogStore) -> Dict[str, DomainAgent]:
-    return {key: DomainAgent(key, config, log_store) for key, config in AGENT_SETTINGS.items()}
\ No newline at end of file
+        # run_id ใช้จับคู่ input/output ของแต่ละรอบ เมื่อหลาย agent ทำงานสลับกัน
+        run_meta = {"run_id": uuid.uuid4().hex[:12]}
+        cancel_signal = cancel_signal or Event()
+
+        with self._run_lock:
+            if cancel_signal.is_set():
+                # ผู้เรียกเลิกรอไประหว่างต่อคิว: ไม่รันคำถามที่ไม่มีใครรอผลแล้ว
+                raise CancelledError(f"{self.config.name} call was cancelled before it started")
+            if on_start is not None:
+                on_start()
+            self._active_cancel = cancel_signal
+            try:
+                return self._invoke(payload, run_meta, cancel_signal)
+            finally:
+                self._active_cancel = None
+
+    def _invoke(self, payload: str, run_meta: Dict[str, str], cancel_signal: Event) -> str:
+        with start_span(self.log_store, self.config.name, "agent", self.config.name) as span:
+            run_meta["trace_id"] = span.trace_id
+            # เช็ค session กับ MCP server (reconnect ถ้าหลุด) ก่อนเริ่มงาน
+            self._connection.ensure_healthy()
+
+            # บันทึก Input (Process Log)
+            self.log_store.add(self.config.name, "input", payload, payload=run_meta)
+
+            try:
+                # ใช้ render_message ตัวใหม่ที่แก้ไปแล้ว
+                with track_usage(span, self.agent):
+                    result = self.agent(payload, cancel_signal=cancel_signal)
+                content = render_message(result)
+
+                # บันทึก Output
+                self.log_store.add(self.config.name, "output", content, payload=run_meta)
+                return content
+            except Exception as exc:
+                self.log_store.add(self.config.name, "error", str(exc), payload=run_meta)
+                raise
+
+
+def build_domain_agents(
+    log_store: AgentLogStore,
+    pool: Optional[MCPConnectionPool] = None,
+    relay: Optional[StreamRelay] = None,
+) -> Dict[str, DomainAgent]:
+    return {key: DomainAgent(key, config, log_store, pool, relay) for key, config in AGENT_SETTINGS.items()}
\ No newline at end of file
@@ -1,20 +1,51 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Event, Lock
+from typing import Dict, Optional
 
 from strands import Agent, tool
 
+from app.agents.context import BoundedContextManager
+from app.agents.router import IntentRouter, RouteDecision, get_router
 from app.agents.sub_agents import DomainAgent
 from app.agents.message_utils import render_message
-from app.config import COORDINATOR_PROMPT, build_default_model
-from app.telemetry.callbacks import build_agent_callback
+from app.config import COORDINATOR_PROMPT, ORCHESTRATOR_CONTEXT, get_shared_model
+from app.telemetry.callbacks import StreamRelay, build_agent_callback
 from app.telemetry.log_store import AgentLogStore
+from app.telemetry.spans import start_span, track_usage
+
+
+class DomainAgentTimeout(TimeoutError):
+    """Raised by Orchestrator.dispatch when a domain agent does not start or finish within its timeout."""
 
 
 class Orchestrator:
-    def __init__(self, domain_agents: Dict[str, DomainAgent], log_store: AgentLogStore) -> None:
+    def __init__(
+        self,
+        domain_agents: Dict[str, DomainAgent],
+        log_store: AgentLogStore,
+        relay: Optional[StreamRelay] = None,
+        router: Optional[IntentRouter] = None,
+    ) -> None:
         self.log_store = log_store
-        
+        self.domain_agents = domain_agents
+        # ข้อความที่ชัดเจนส่งตรงไป DomainAgent โดยไม่ผ่าน Orchestrator LLM (ประหยัด 1 round-trip)
+        self.router = router or get_router()
+        # agent ที่เป็นคนตอบผู้ใช้ใน turn นี้ (Orchestrator หรือ DomainAgent ที่ถูกส่งตรงผ่าน fast path)
+        self.speaker = "Orchestrator"
+        # ช่วงเวลาที่ DomainAgent ทำงานใน turn ปัจจุบัน ใช้หา overhead ของ Orchestrator LLM
+        self._agent_window: Optional[list] = None
+        self._window_lock = Lock()
+
+        # Worker pool สำหรับรัน DomainAgent พร้อมกัน เมื่อโมเดลเรียกหลาย agent ใน turn เดียว
+        # (Strands รัน tool ใน turn เดียวกันแบบ concurrent อยู่แล้ว เราคุม timeout/cancel ที่ชั้นนี้)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(2 * len(domain_agents), 1), thread_name_prefix="domain-agent"
+        )
+
         # Refactor 1: แปลง Agent เป็น Tool ด้วยวิธีที่อ่านง่ายขึ้น
         # เราเปลี่ยนจากการเรียกฟังก์ชันซ้อนๆ กันมาใช้ List Comprehension ที่ชัดเจน
         tools = [self._as_tool(agent) for agent in domain_agents.values()]
@@ -22,8 +53,9 @@ class Orchestrator:
         self.agent = Agent(
             system_prompt=COORDINATOR_PROMPT,
             tools=tools,
-            model=build_default_model(),
-            callback_handler=build_agent_callback("Orchestrator", log_store),
+            model=get_shared_model(),
+            callback_handler=build_agent_callback("Orchestrator", log_store, relay),
+            conversation_manager=BoundedContextManager(ORCHESTRATOR_CONTEXT),
         )
 
     def _as_tool(self, domain_agent: DomainAgent):
@@ -33,22 +65,125 @@ class Orchestrator:
         """
         @tool(name=domain_agent.config.tool_name, description=domain_agent.config.tool_description)
         def agent_wrapper(query: str, context: str | None = None) -> str:
-            # Delegate การทำงานไปที่ DomainAgent.run โดยตรง
-            return domain_agent.run(query, context)
-        
+            # Delegate การทำงานไปที่ DomainAgent.run ผ่าน worker pool (มี timeout ต่อ agent)
+            try:
+                return self.dispatch(domain_agent, query, context)
+            except DomainAgentTimeout as exc:
+                # ให้ Orchestrator LLM รู้ว่า agent ไม่ตอบ แล้วตัดสินใจเองว่าจะบอกผู้ใช้อย่างไร
+                return str(exc)
+
         return agent_wrapper
 
+    def dispatch(self, domain_agent: DomainAgent, query: str, context: Optional[str] = None) -> str:
+        """
+        Run one domain agent with its configured timeout; cancel only this call and raise DomainAgentTimeout
+        if the deadline passes.
+        The deadline starts once the agent is free (waiting behind another call to it is bounded by the same timeout).
+        """
+        timeout = domain_agent.config.timeout_seconds
+        name = domain_agent.config.name
+        # Event ต่อ call: timeout ของ call นี้ไม่ไปยกเลิก call อื่นหรือค้างไปถึง turn ถัดไป
+        cancel_signal = Event()
+        started = Event()
+        began = time.perf_counter()
+        # copy context เพื่อให้ span ของ DomainAgent เป็นลูกของ turn ปัจจุบัน
+        future = self._pool.submit(
+            contextvars.copy_context().run, domain_agent.run, query, context, cancel_signal, started.set
+        )
+        # จบก่อนได้เริ่ม (เช่น error) ก็ไม่ต้องรอคิวต่อ
+        future.add_done_callback(lambda _: started.set())
+        try:
+            if started.wait(timeout):
+                return future.result(timeout=timeout)
+            message = f"{name} was busy for more than {timeout:g}s; the request was dropped."
+        except FutureTimeoutError:
+            message = f"{name} did not respond within {timeout:g}s and was cancelled."
+        finally:
+            with self._window_lock:
+                if self._agent_window is not None:
+                    window = self._agent_window
+                    window[0] = min(window[0], began)
+                    window[1] = max(window[1], time.perf_counter())
+        # รอคิวอยู่ = ไม่เริ่มเลย, กำลังรัน = หยุดที่จุดปลอดภัยถัดไป
+        cancel_signal.set()
+        self.log_store.add(name, "error", message)
+        raise DomainAgentTimeout(message)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
     def run(self, user_message: str) -> str:
         # บันทึก Input (ในอนาคตเราสามารถย้ายไปทำใน Callback ได้เพื่อให้โค้ดส่วนนี้ Clean ขึ้น)
         self.log_store.add("User", "input", user_message)
-        
-        # เรียกใช้งาน Agent หลัก
-        result = self.agent(user_message)
-        
-        # แปลงผลลัพธ์ให้อยู่ในรูปแบบข้อความ (String)
-        content = render_message(result)
-        
+
+        decision = self.router.route(user_message)
+        domain_agent = self.domain_agents.get(decision.agent_key) if decision.fast_path else None
+
+        # เรียกใช้งาน Agent หลัก (1 turn = 1 trace ครอบทุก DomainAgent/tool ที่ถูกเรียก)
+        with start_span(self.log_store, "Orchestrator", "turn", "Orchestrator", route="llm") as span:
+            content = None
+            if domain_agent is not None:
+                content = self._run_fast_path(domain_agent, user_message, span)
+            if content is None:
+                content = self._run_llm(user_message, span)
+        self._log_route(decision, domain_agent if span.attributes["route"] == "fast" else None, span)
+
         # บันทึก Output
         self.log_store.add("Orchestrator", "output", content)
-        
-        return content
\ No newline at end of file
+
+        return content
+
+    def _run_llm(self, user_message: str, span) -> str:
+        with self._window_lock:
+            self._agent_window = [float("inf"), float("-inf")]
+        started = time.perf_counter()
+        try:
+            with track_usage(span, self.agent):
+                result = self.agent(user_message)
+        finally:
+            with self._window_lock:
+                window, self._agent_window = self._agent_window, None
+        # overhead = เวลาที่ LLM ใช้เลือก agent + สรุปคำตอบ (ไม่นับช่วงที่ DomainAgent ทำงาน)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        agent_ms = max(window[1] - window[0], 0.0) * 1000 if window[1] >= window[0] else 0.0
+        span.attributes["llm_overhead_ms"] = round(elapsed_ms - agent_ms, 1)
+        if agent_ms:
+            self.router.observe_llm_overhead(elapsed_ms - agent_ms)
+
+        # แปลงผลลัพธ์ให้อยู่ในรูปแบบข้อความ (String)
+        return render_message(result)
+
+    def _run_fast_path(self, domain_agent: DomainAgent, user_message: str, span) -> Optional[str]:
+        """ส่งข้อความตรงไป DomainAgent; ถ้า agent ล้มเหลวคืน None ให้ Orchestrator LLM ทำต่อตามปกติ"""
+        span.attributes.update(route="fast", routed_to=domain_agent.config.name)
+        self.speaker = domain_agent.config.name
+        try:
+            content = self.dispatch(domain_agent, user_message)
+        except Exception as exc:
+            self.log_store.add("Router", "error", f"fast path to {domain_agent.config.name} failed, falling back: {exc}")
+            span.attributes["route"] = "llm"
+            return None
+        finally:
+            self.speaker = "Orchestrator"
+        # ใส่ turn นี้ลง memory ของ Orchestrator ด้วย เพื่อให้คำถามต่อเนื่องที่ผ่าน LLM ยังเห็นบริบท
+        self.agent.messages.extend(
+            [
+                {"role": "user", "content": [{"text": user_message}]},
+                {"role": "assistant", "content": [{"text": content}]},
+            ]
+        )
+        self.agent.conversation_manager.apply_management(self.agent)
+        return content
+
+    def _log_route(self, decision: RouteDecision, domain_agent: Optional[DomainAgent], span) -> None:
+        payload = {**decision.as_dict(), "trace_id": span.trace_id, "route": span.attributes["route"]}
+        if domain_agent is not None:
+            saved = self.router.expected_saving_ms
+            payload.update(agent=domain_agent.config.name, saved_ms=round(saved, 1) if saved is not None else None)
+            message = f"fast path ({decision.method}, {decision.confidence:.2f}) -> {domain_agent.config.name}"
+            if saved is not None:
+                message += f", ~{saved:.0f} ms saved"
+        else:
+            payload.update(agent="Orchestrator", llm_overhead_ms=span.attributes.get("llm_overhead_ms"))
+            message = f"LLM router ({decision.reason})"
+        self.log_store.add("Router", "route", message, payload=payload)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any
+
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+from strands.types._events import ToolResultEvent
+from strands.types.tools import AgentTool, ToolGenerator, ToolSpec, ToolUse
+
+from app.telemetry.log_store import AgentLogStore
+from app.telemetry.spans import start_span
+
+
+class TracedMCPTool(AgentTool):
+    """
+    ห่อ MCP tool จาก pool กลางเพื่อบันทึก span ต่อ call และส่ง trace id ไปกับ ``_meta`` ของ request
+    server ตอบเวลาคิว/เวลาทำงานฝั่ง server กลับมาใน metadata ของผลลัพธ์ ซึ่งเก็บเป็น attribute ของ span
+    """
+
+    def __init__(self, inner: MCPAgentTool, log_store: AgentLogStore, agent_name: str) -> None:
+        super().__init__()
+        self._inner = inner
+        self._log_store = log_store
+        self._agent_name = agent_name
+
+    @property
+    def tool_name(self) -> str:
+        return self._inner.tool_name
+
+    @property
+    def tool_spec(self) -> ToolSpec:
+        return self._inner.tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return self._inner.tool_type
+
+    async def stream(self, tool_use: ToolUse, invocation_state: dict[str, Any], **kwargs: Any) -> ToolGenerator:
+        with start_span(self._log_store, self.tool_name, "tool", self._agent_name) as span:
+            result = await self._inner.mcp_client.call_tool_async(
+                tool_use_id=tool_use["toolUseId"],
+                name=self._inner.mcp_tool.name,
+                arguments=tool_use["input"],
+                read_timeout_seconds=self._inner.timeout,
+                meta=span.mcp_meta(),
+                cancel_signal=getattr(invocation_state.get("agent"), "_cancel_signal", None),
+            )
+            if result.get("status") == "error":
+                span.status = "error"
+            server_timing = (result.get("metadata") or {}).get("server_timing")
+            if server_timing:
+                span.attributes.update(server_timing)
+        yield ToolResultEvent(result)
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
 import os
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, Tuple
 
 from dotenv import load_dotenv
-from strands.models import BedrockModel
+
+if TYPE_CHECKING:
+    from strands.models import BedrockModel
 
 BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 load_dotenv(PROJECT_ROOT / ".env")
 
+# module นี้มีแค่ค่าคงที่: ไม่สร้างโฟลเดอร์/ไม่ import library หนัก (ผู้เขียนไฟล์แต่ละตัว mkdir เอง)
 DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
 
 # CSV File Paths 
 AGING_REPORT_PATH = DATA_DIR / "Aging Stock Balance by Material.csv"
@@ -21,16 +24,144 @@ ACTUAL_COST_PATH = DATA_DIR / "Export Actual Cost.xlsx - Excel Worksheet.csv"
 EXPENSE_CODE_PATH = DATA_DIR / "ap_expensother.csv"
 PPN_DATA_PATH = DATA_DIR / "ppn_data.csv"
 
+# CSV parser: auto = ใช้ pyarrow ถ้าติดตั้งไว้, หรือระบุ "c" / "pyarrow"
+CSV_ENGINE = os.getenv("CSV_ENGINE", "auto").lower()
+
+# Frame Cache: DataFrame ที่ clean แล้วเก็บเป็น Feather/Parquet (ต้องมี pyarrow) เพื่อให้ start server เร็วขึ้น
+FRAME_CACHE_ENABLED = os.getenv("FRAME_CACHE_ENABLED", "1") not in ("0", "false", "False")
+FRAME_CACHE_DIR = Path(os.getenv("FRAME_CACHE_DIR", str(DATA_DIR / "frame_cache")))
+FRAME_CACHE_FORMAT = os.getenv("FRAME_CACHE_FORMAT", "feather").lower()
+
+# โหลดข้อมูลล่วงหน้าตอน start server: none = โหลดแต่ละชุดตอน tool ใช้ครั้งแรก, background = โหลดทุกชุดใน thread
+# หลัง server เริ่มรับ request, eager = โหลดทุกชุดให้เสร็จก่อนเปิด port
+DATA_WARM_UP = os.getenv("DATA_WARM_UP", "none").lower()
+
+# Hot Reload: MCP server poll ไฟล์ข้อมูลทุก N วินาที แล้วโหลดชุดที่เปลี่ยนใหม่โดยไม่ต้อง restart (0 = ปิด)
+DATA_RELOAD_INTERVAL_SECONDS = float(os.getenv("DATA_RELOAD_INTERVAL_SECONDS", "10"))
+# จำนวนรอบ poll ที่ไฟล์ต้องไม่เปลี่ยนก่อน reload (กันอ่านไฟล์ที่ export ยังเขียนไม่เสร็จ)
+DATA_RELOAD_SETTLE_POLLS = int(os.getenv("DATA_RELOAD_SETTLE_POLLS", "1"))
+
+# ช่วงอายุสต็อก (วัน) สำหรับสรุป aging bucket เช่น 30,90,180,365 -> 0-30, 31-90, 91-180, 181-365, >365
+AGING_BUCKET_DAYS = tuple(int(d) for d in os.getenv("AGING_BUCKET_DAYS", "30,90,180,365").split(","))
+
+# query_report: จำนวนแถวสูงสุดต่อหน้า (กันผลลัพธ์ใหญ่เกิน context ของ LLM)
+REPORT_QUERY_MAX_LIMIT = int(os.getenv("REPORT_QUERY_MAX_LIMIT", "200"))
+
+# รูปแบบผลลัพธ์ของ tool ที่คืนตาราง (read_report/query_report/get_plan): columnar | csv | records (แบบเดิม)
+TOOL_RESULT_FORMAT = os.getenv("TOOL_RESULT_FORMAT", "columnar").lower()
+# งบ token โดยประมาณต่อผลลัพธ์ (ตัดแถวท้ายออกถ้าเกิน, 0 = ไม่จำกัด) และความยาวข้อความสูงสุดต่อช่อง
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "2000"))
+TOOL_RESULT_MAX_TEXT = int(os.getenv("TOOL_RESULT_MAX_TEXT", "120"))
+
+# Memoization ของ tool อ่านอย่างเดียว (ผลลัพธ์ที่ serialize แล้ว ผูกกับเวอร์ชันข้อมูล; จำกัดขนาดรวมเป็น byte, LRU)
+TOOL_MEMO_ENABLED = os.getenv("TOOL_MEMO_ENABLED", "1") not in ("0", "false", "False")
+TOOL_MEMO_MAX_BYTES = int(os.getenv("TOOL_MEMO_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Expense Code Cache (ผลจัดหมวดจาก LLM เก็บลง SQLite)
+EXPENSE_CACHE_PATH = DATA_DIR / "expense_code_cache.sqlite"
+EXPENSE_CACHE_MAX_ENTRIES = int(os.getenv("EXPENSE_CACHE_MAX_ENTRIES", "5000"))
+EXPENSE_CACHE_TTL_SECONDS = float(os.getenv("EXPENSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+EXPENSE_CACHE_SIMILARITY = float(os.getenv("EXPENSE_CACHE_SIMILARITY", "0.85"))
+
+# Expense Code Retrieval (คัด candidate ในเครื่องก่อนเรียก LLM)
+EXPENSE_CANDIDATE_K = int(os.getenv("EXPENSE_CANDIDATE_K", "30"))
+EXPENSE_RETRIEVAL_MIN_SCORE = float(os.getenv("EXPENSE_RETRIEVAL_MIN_SCORE", "0.3"))
+EXPENSE_LOCAL_ACCEPT_SCORE = float(os.getenv("EXPENSE_LOCAL_ACCEPT_SCORE", "0.8"))
+EXPENSE_LOCAL_ACCEPT_MARGIN = float(os.getenv("EXPENSE_LOCAL_ACCEPT_MARGIN", "0.15"))
+# รหัสหมวดทั่วไป (ชื่อตรง regex นี้) ต่อท้าย candidate ทุกครั้ง: "รถไฟฟ้า" มี n-gram ตรง "ค่าไฟฟ้า" มากกว่า "ค่าเดินทาง"
+EXPENSE_ALWAYS_INCLUDE_PATTERN = os.getenv("EXPENSE_ALWAYS_INCLUDE_PATTERN", "ค่าเดินทาง|ค่าใช้จ่ายอื่น|เบ็ดเตล็ด")
+
+# Batch Classification (get_expense_codes)
+EXPENSE_BATCH_SIZE = int(os.getenv("EXPENSE_BATCH_SIZE", "20"))
+EXPENSE_BATCH_CONCURRENCY = int(os.getenv("EXPENSE_BATCH_CONCURRENCY", "4"))
+
 # Server Configuration
 MAIN_SERVER_PORT = 8101
 
+# Tool Execution (worker pool ของ MCP server)
+TOOL_CPU_WORKERS = int(os.getenv("TOOL_CPU_WORKERS", str(min(os.cpu_count() or 4, 8))))
+TOOL_IO_WORKERS = int(os.getenv("TOOL_IO_WORKERS", "16"))
+TOOL_DEFAULT_CONCURRENCY = int(os.getenv("TOOL_DEFAULT_CONCURRENCY", "8"))
+TOOL_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "read_report": 4,
+    "get_plan": 4,
+    "get_material_use": 4,
+    "get_expense_code": 8,
+    "get_expense_codes": 2,
+}
+
 DEFAULT_MODEL_ID = os.getenv("STRANDS_MODEL_ID", "anthropic.claude-sonnet-4-20250514-v1:0")
 DEFAULT_REGION = os.getenv("BEDROCK_REGION") or os.getenv("AWS_REGION", "us-west-2")
 DEFAULT_TEMPERATURE = float(os.getenv("STRANDS_MODEL_TEMPERATURE", "0.2"))
 
+# โมเดลที่ DataRepository ใช้จัดหมวดค่าใช้จ่าย (invoke_model)
+EXPENSE_MODEL_ID = os.getenv("EXPENSE_MODEL_ID", "us.anthropic.claude-3-7-sonnet-20250219-v1:0")
+EXPENSE_MODEL_REGION = os.getenv("BEDROCK_REGION", "us-east-1")
+
+# LLM Gateway: ทุก call ไป Bedrock ผ่าน client กลาง + adaptive concurrency (AIMD) + retry เมื่อโดน throttle
+# LLM_ENDPOINT_URL ใช้ชี้ไป endpoint อื่น เช่น VPC endpoint หรือ fake endpoint ในเครื่อง (benchmarks/fake_bedrock.py)
+LLM_ENDPOINT_URL = os.getenv("LLM_ENDPOINT_URL") or None
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# โดน throttle -> limit คูณค่านี้
+LLM_DECREASE_FACTOR = float(os.getenv("LLM_DECREASE_FACTOR", "0.5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "120"))
+# ทำเครื่องหมายส่วนคงที่ของ prompt (system prompt, tool spec, รายการรหัสค่าใช้จ่ายเต็ม) ให้ Bedrock cache
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "1") not in ("0", "false", "False")
+
+# MCP Connection Pool (ใช้ session ร่วมกันทุก Runtime/Agent)
+MCP_HEALTH_CHECK_SECONDS = float(os.getenv("MCP_HEALTH_CHECK_SECONDS", "30"))
+
+# Domain Agent Dispatch (Orchestrator เรียก agent หลายตัวพร้อมกัน)
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "120"))
+
+# Shared Runtime (dashboard ใช้ runtime เดียวทั้ง process)
+RUNTIME_MAX_IN_FLIGHT = int(os.getenv("RUNTIME_MAX_IN_FLIGHT", "8"))
+RUNTIME_QUEUE_TIMEOUT_SECONDS = float(os.getenv("RUNTIME_QUEUE_TIMEOUT_SECONDS", "120"))
+
+# Persistent Log Sink (เขียน log ทุก session ลงไฟล์ JSONL แบบ append-only, ตั้ง LOG_SINK=none เพื่อปิด)
+LOG_SINK = os.getenv("LOG_SINK", "jsonl").lower()
+LOG_DIR = Path(os.getenv("LOG_DIR", str(DATA_DIR / "logs")))
+LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "3600"))
+LOG_MAX_FILES = int(os.getenv("LOG_MAX_FILES", "168"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "1.0"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_MAX_PENDING = int(os.getenv("LOG_MAX_PENDING", "100000"))
+
+# Fast-path Router: เลือก DomainAgent ในเครื่อง (regex + n-gram model) ก่อนใช้ Orchestrator LLM
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") not in ("0", "false", "False")
+ROUTER_MODEL_PATH = Path(os.getenv("ROUTER_MODEL_PATH", str(DATA_DIR / "router_model.json")))
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.9"))
+# n-gram model ต้องเทรนจาก turn อย่างน้อยเท่านี้ก่อนถูกใช้
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "30"))
+ROUTER_MIN_CHARS = int(os.getenv("ROUTER_MIN_CHARS", "6"))
+
 def mcp_url(port: int) -> str:
     return f"http://127.0.0.1:{port}/mcp/"
 
+@dataclass(frozen=True)
+class ContextPolicy:
+    """ประวัติสนทนาที่ agent ส่งกลับไปให้โมเดลในทุก call (1 turn = ข้อความผู้ใช้ 1 ข้อความ + tool call/คำตอบที่ตามมา)"""
+    # จำนวน turn ล่าสุดที่เก็บไว้ (0 = stateless: ล้างประวัติหลังตอบทุกครั้ง)
+    max_turns: int = 10
+    # งบ token โดยประมาณของประวัติ (ตัด turn เก่าสุดทิ้งจนไม่เกิน แต่เก็บ turn ล่าสุดไว้เสมอ)
+    max_tokens: int = 8000
+    # tool output ใน n turn ล่าสุดเก็บเต็ม ที่เก่ากว่านั้นเหลือแค่สรุปสั้น ๆ
+    full_tool_turns: int = 1
+    summary_chars: int = 240
+
+# Orchestrator ต้องจำบทสนทนาเพื่อตอบคำถามต่อเนื่อง แต่ผลจาก DomainAgent เก่า ๆ สรุปได้
+ORCHESTRATOR_CONTEXT = ContextPolicy(
+    max_turns=int(os.getenv("ORCHESTRATOR_CONTEXT_TURNS", "12")),
+    max_tokens=int(os.getenv("ORCHESTRATOR_CONTEXT_MAX_TOKENS", "8000")),
+    full_tool_turns=2,
+)
+
 @dataclass(frozen=True)
 class AgentSettings:
     name: str
@@ -38,6 +169,14 @@ class AgentSettings:
     tool_description: str
     system_prompt: str
     server_port: int
+    # ชื่อ tool บน MCP server ที่ agent นี้มองเห็น (ว่าง = ทุก tool)
+    allowed_tools: Tuple[str, ...] = ()
+    # regex ที่บอกชัดว่าเป็นงานของ agent นี้ (fast-path router ข้าม Orchestrator LLM ถ้าตรง agent เดียว)
+    route_patterns: Tuple[str, ...] = ()
+    # คำตอบของ agent ส่งถึงผู้ใช้ได้เลย (False = เป็นข้อมูลดิบ เช่น JSON ต้องให้ Orchestrator สรุปก่อน จึงไม่ใช้ fast path)
+    direct_answer: bool = True
+    timeout_seconds: float = AGENT_TIMEOUT_SECONDS
+    context: ContextPolicy = ContextPolicy()
 
     @property
     def server_url(self) -> str:
@@ -57,9 +196,13 @@ AGENT_SETTINGS: Dict[str, AgentSettings] = {
             1. **Identify Report**: Decide which report is relevant (Aging Stock or Actual Cost).
             2. **Inspect Structure**: Call 'get_report_columns' for that report to understand available fields.
                (DO NOT guess column names. Always check first.)
-            3. **Fetch Data**: Call 'read_report'.
-               - If the user asks for specific fields, pass them in the 'columns' argument.
-               - If general, fetch default columns.
+            3. **Fetch Data**:
+               - For stock age questions ("how much stock is over 365 days", per warehouse/material) call
+                 'get_aging_buckets'; for budget vs actual per cost group call 'get_cost_totals'. These are precomputed.
+               - If the question has conditions, rankings or totals (e.g. "items older than 180 days in warehouse 001",
+                 "top 10 by qtybal", "total per whcode"), call 'query_report' with filters / sort / group_by + aggregates
+                 so the server returns only the matching rows. Use 'next_cursor' only if more rows are really needed.
+               - Otherwise call 'read_report'. If the user asks for specific fields, pass them in the 'columns' argument.
             4. **Analyze**: Summarize the returned data in Thai. Highlight key figures like Total Quantity or High Cost items.
             
             OUTPUT RULES:
@@ -67,6 +210,28 @@ AGENT_SETTINGS: Dict[str, AgentSettings] = {
             - If data is empty, state clearly that no records were found.
         """),
         server_port=MAIN_SERVER_PORT,
+        allowed_tools=(
+            "today",
+            "get_report",
+            "get_report_columns",
+            "read_report",
+            "query_report",
+            "get_aging_buckets",
+            "get_cost_totals",
+        ),
+        route_patterns=(
+            r"aging",
+            r"\bstock\b",
+            r"สต[็๊]?อก",
+            r"คงคลัง",
+            r"ยอดคงเหลือ",
+            r"actual\s*cost",
+            r"ต้นทุนจริง",
+            r"งบประมาณ",
+            r"\bbudget\b",
+        ),
+        # คำถามต่อเนื่องสั้น ๆ ("แล้วคลัง 002 ล่ะ") ต้องเห็นคำถามก่อนหน้า แต่ไม่ต้องเห็นแถวข้อมูลเก่าทั้งหมด
+        context=ContextPolicy(max_turns=3, max_tokens=4000),
     ),
 
     # 2. PPN Agent (ปรับ Prompt ให้เลือก Tool ให้ถูกระหว่าง Search กับ Summary)
@@ -93,6 +258,18 @@ AGENT_SETTINGS: Dict[str, AgentSettings] = {
             - Format lists clearly (e.g., bullet points).
         """),
         server_port=MAIN_SERVER_PORT,
+        allowed_tools=("today", "get_plan_columns", "get_plan", "get_material_use"),
+        route_patterns=(
+            r"แผนงาน",
+            r"แผนการ",
+            r"\bplans?\b",
+            r"\bppn\b",
+            r"material\s*(use|usage)",
+            r"การใช้วัสดุ",
+            r"ปริมาณวัสดุ",
+            r"วัสดุที่ต้องใช้",
+        ),
+        context=ContextPolicy(max_turns=4, max_tokens=4000),
     ),
 
     # 3. OF Agent (อันเดิมที่ดีอยู่แล้ว)
@@ -110,6 +287,9 @@ AGENT_SETTINGS: Dict[str, AgentSettings] = {
                (The 'expense_code' field will initially contain an instruction text).
             3. Call tool 'get_expense_code' using the description to find the matching code (e.g., 'A0111').
             4. **CRITICAL STEP**: UPDATE the JSON from Step 2 by replacing the 'expense_code' value with the actual code found in Step 3.
+            5. **MULTIPLE LINES**: If the input contains several expense lines, call 'get_expense_codes' ONCE with
+               all descriptions (one per line) instead of repeating Steps 2-3. Each item already has 'amount',
+               so build one object per line from it and return a JSON array.
             
             OUTPUT RULES:
             - DO NOT explain the steps.
@@ -117,6 +297,17 @@ AGENT_SETTINGS: Dict[str, AgentSettings] = {
             - YOUR FINAL ANSWER MUST BE ONLY THE COMPLETE JSON OBJECT.
         """),
         server_port=MAIN_SERVER_PORT,
+        allowed_tools=("today", "phase_structure", "get_expense_code", "get_expense_codes"),
+        route_patterns=(
+            r"เบิก",
+            r"ค่า\S*\s*[\d,]+(\.\d+)?\s*(บาท|฿|thb)",
+            r"รหัสค่าใช้จ่าย",
+            r"expense\s*codes?",
+        ),
+        # คำตอบเป็น JSON ล้วน: ผู้ใช้ต้องได้คำตอบภาษาไทยผ่าน Orchestrator
+        direct_answer=False,
+        # แต่ละรายการเบิกเป็นงานอิสระ -> ไม่ต้องจำประวัติ
+        context=ContextPolicy(max_turns=0),
     ),
 }
 
@@ -127,12 +318,30 @@ COORDINATOR_PROMPT = ("""
     - PPN: For project plans and material usage.
     - OF: For processing expenses and finding expense codes.
     
+    If a request needs more than one specialist and their parts are independent,
+    call all of those specialists in the SAME turn so they run in parallel.
+
     Coordinate the results and answer in Thai.
 """)
 
 def build_default_model() -> BedrockModel:
-    return BedrockModel(
+    # import ตอนเรียก: gateway import ค่าคงที่จาก module นี้
+    from app.llm.gateway import get_gateway
+
+    return get_gateway().bedrock_model(
         model_id=DEFAULT_MODEL_ID,
         region_name=DEFAULT_REGION,
         temperature=DEFAULT_TEMPERATURE,
-    )
\ No newline at end of file
+    )
+
+_shared_model: BedrockModel | None = None
+_shared_model_lock = threading.Lock()
+
+
+def get_shared_model() -> BedrockModel:
+    """BedrockModel ตัวเดียวทั้ง process (ไม่มี state ต่อการสนทนา จึงใช้ร่วมกันระหว่าง agent ได้)"""
+    global _shared_model
+    with _shared_model_lock:
+        if _shared_model is None:
+            _shared_model = build_default_model()
+        return _shared_model
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.data.schemas import to_records
+from app.data.text import normalize_text
+
+Records = List[Dict[str, Any]]
+
+# จำนวนแถวที่ get_material_use คืน (เท่าเดิม)
+MATERIAL_USE_LIMIT = 50
+# จำนวนชื่อวัสดุที่คืนให้เลือก เมื่อคำค้นตรงกับหลายวัสดุ
+MATERIAL_MATCH_LIMIT = 20
+
+
+def bucket_labels(edges: Sequence[int]) -> Tuple[str, ...]:
+    """(30, 90, 180, 365) -> ("0-30", "31-90", "91-180", "181-365", ">365")"""
+    labels, low = [], 0
+    for high in edges:
+        labels.append(f"{low}-{high}")
+        low = high + 1
+    labels.append(f">{edges[-1]}")
+    return tuple(labels)
+
+
+def _group_records(df: pd.DataFrame, key: str) -> Dict[str, Records]:
+    """แยก DataFrame ที่เรียงแล้วเป็น dict: ค่าคีย์ -> records (ไม่รวมคอลัมน์คีย์)"""
+    if df.empty:
+        return {}
+    rest = [c for c in df.columns if c != key]
+    return {str(k): to_records(g[rest]) for k, g in df.groupby(key, observed=True, sort=False)}
+
+
+def _find_keys(index: Dict[str, Records], normalized: Dict[str, str], value: str) -> List[str]:
+    """หา key แบบตรงตัว -> ไม่สนตัวพิมพ์ -> เป็นส่วนหนึ่งของชื่อ (คืนทุก key ที่ตรง ให้ผู้เรียกตัดสินเองถ้ามีหลายตัว)"""
+    if value in index:
+        return [value]
+    needle = normalize_text(value)
+    if not needle:
+        return []
+    exact = [key for key, norm in normalized.items() if norm == needle]
+    if exact:
+        return exact[:1]
+    return [key for key, norm in normalized.items() if needle in norm]
+
+
+@dataclass(frozen=True)
+class MaterialUsageView:
+    """ยอดรวม required_qty ต่อวัสดุ (ทั้งหมด และแยกตามโครงการถ้ามีคอลัมน์ pre_event)"""
+
+    overall: Records
+    by_project: Dict[str, Records] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, ppn_df: pd.DataFrame) -> "MaterialUsageView":
+        if "c_des1" not in ppn_df.columns or "required_qty" not in ppn_df.columns:
+            # ไม่มีคอลัมน์ให้สรุป -> คืนตัวอย่างข้อมูลดิบเหมือน get_material_use เดิม
+            return cls(overall=to_records(ppn_df.head(20)))
+        keys = ["c_des1"] + (["unit"] if "unit" in ppn_df.columns else [])
+        overall = (
+            ppn_df.groupby(keys, observed=True)["required_qty"].sum().reset_index()
+            .sort_values("required_qty", ascending=False, kind="stable")
+        )
+        by_project: Dict[str, Records] = {}
+        if "pre_event" in ppn_df.columns:
+            per_project = (
+                ppn_df.groupby(["pre_event"] + keys, observed=True)["required_qty"].sum().reset_index()
+                .sort_values(["pre_event", "required_qty"], ascending=[True, False], kind="stable")
+            )
+            by_project = {k: v[:MATERIAL_USE_LIMIT] for k, v in _group_records(per_project, "pre_event").items()}
+        return cls(overall=to_records(overall.head(MATERIAL_USE_LIMIT)), by_project=by_project)
+
+    def lookup(self, project: Optional[str] = None) -> Records:
+        if not project:
+            return self.overall
+        return self.by_project.get(str(project).strip(), [])
+
+
+@dataclass(frozen=True)
+class AgingBucketView:
+    """
+    จำนวนรายการ/ยอดคงเหลือ (qtybal) ต่อช่วงอายุสต็อก (diff_day) คำนวณครั้งเดียวต่อ snapshot
+    แยกตามคลัง (whcode), วัสดุ (c_des1) และคู่คลัง+วัสดุ ให้ tool ตอบได้ด้วยการเปิด dict
+    """
+
+    labels: Tuple[str, ...]
+    overall: Records
+    by_warehouse: Dict[str, Records]
+    by_material: Dict[str, Records]
+    by_warehouse_material: Dict[Tuple[str, str], Records]
+    _material_names: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, aging_df: pd.DataFrame, edges: Sequence[int]) -> "AgingBucketView":
+        labels = bucket_labels(edges)
+        if "diff_day" not in aging_df.columns:
+            return cls(labels, [], {}, {}, {})
+        qty = aging_df["qtybal"] if "qtybal" in aging_df.columns else pd.Series(0, index=aging_df.index)
+        # bucket เป็น category เรียงตามช่วงอายุ -> groupby คืนผลเรียงจากใหม่ไปเก่าเสมอ
+        codes = np.searchsorted(np.asarray(edges), aging_df["diff_day"].to_numpy(), side="left")
+        frame = pd.DataFrame({
+            "whcode": aging_df["whcode"].astype(str) if "whcode" in aging_df.columns else "",
+            "c_des1": aging_df["c_des1"].astype(str) if "c_des1" in aging_df.columns else "",
+            "bucket": pd.Categorical.from_codes(codes, categories=list(labels)),
+            "qtybal": qty.to_numpy(),
+        })
+
+        def summarize(keys: List[str]) -> pd.DataFrame:
+            out = frame.groupby(keys + ["bucket"], observed=True).agg(items=("qtybal", "size"), qtybal=("qtybal", "sum"))
+            out = out.reset_index()
+            out["qtybal"] = out["qtybal"].round(4)
+            return out
+
+        pairs = summarize(["whcode", "c_des1"])
+        pair_records: Dict[Tuple[str, str], Records] = {}
+        for (whcode, material), group in pairs.groupby(["whcode", "c_des1"], sort=False):
+            pair_records[(str(whcode), str(material))] = to_records(group[["bucket", "items", "qtybal"]])
+        by_material = _group_records(summarize(["c_des1"]), "c_des1")
+        return cls(
+            labels=labels,
+            overall=to_records(summarize([])),
+            by_warehouse=_group_records(summarize(["whcode"]), "whcode"),
+            by_material=by_material,
+            by_warehouse_material=pair_records,
+            _material_names={name: normalize_text(name) for name in by_material},
+        )
+
+    def lookup(self, warehouse: Optional[str] = None, material: Optional[str] = None) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"buckets": list(self.labels), "warehouse": warehouse or None, "material": None}
+        material_keys = _find_keys(self.by_material, self._material_names, material) if material else []
+        if material and len(material_keys) != 1:
+            result["rows"] = []
+            if material_keys:
+                # คำค้นเป็นส่วนหนึ่งของหลายวัสดุ: ไม่เดาเอง คืนชื่อเต็มให้เลือกแล้วถามใหม่
+                result["matches"] = material_keys[:MATERIAL_MATCH_LIMIT]
+                result["match_count"] = len(material_keys)
+            return result
+        material_key = material_keys[0] if material_keys else None
+        result["material"] = material_key
+        if warehouse and material_key:
+            result["rows"] = self.by_warehouse_material.get((str(warehouse).strip(), material_key), [])
+        elif warehouse:
+            result["rows"] = self.by_warehouse.get(str(warehouse).strip(), [])
+        elif material_key:
+            result["rows"] = self.by_material[material_key]
+        else:
+            result["rows"] = self.overall
+        return result
+
+
+@dataclass(frozen=True)
+class CostTotalsView:
+    """
+    งบประมาณ/ต้นทุนจริงต่อหมวดงาน (แถวที่มี G-Code ในไฟล์ Actual Cost คือยอดรวมของหมวดนั้นอยู่แล้ว)
+    ไฟล์ export มีครั้งละ 1 โครงการ จึงเป็นยอดรวมของโครงการแยกตามหมวด
+    """
+
+    groups: Records
+
+    @classmethod
+    def build(cls, cost_df: pd.DataFrame) -> "CostTotalsView":
+        if "G-Code" not in cost_df.columns:
+            return cls(groups=[])
+        rows = cost_df[cost_df["G-Code"].astype(str).str.strip() != ""]
+        wanted = {
+            "G-Code": "g_code",
+            "Description": "description",
+            "To": "parent",
+            "Total Budget": "total_budget",
+            "Total Actual": "total_actual",
+            "BG Balance": "bg_balance",
+        }
+        present = [c for c in wanted if c in rows.columns]
+        out = rows[present].rename(columns=wanted)
+        if "total_budget" in out.columns and "total_actual" in out.columns:
+            budget = out["total_budget"].astype(float)
+            out["actual_pct"] = (out["total_actual"].astype(float) / budget.where(budget != 0) * 100).round(2).fillna(0.0)
+        return cls(groups=to_records(out))
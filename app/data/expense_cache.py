@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.data.text import char_ngrams, normalize_text
+
+# ตัดจำนวนเงิน/หน่วยเงินออกจาก key เพื่อให้ "ค่าแท็กซี่ 350 บาท" กับ "ค่าแท็กซี่ 120 บาท" ใช้ผลเดียวกัน
+_AMOUNT_RE = re.compile(r"(?<![a-z])\d[\d,]*(?:\.\d+)?")
+_CURRENCY_RE = re.compile(r"บาท|thb|฿")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_description(description: str) -> str:
+    text = normalize_text(description or "")
+    text = _AMOUNT_RE.sub(" ", text)
+    text = _CURRENCY_RE.sub(" ", text)
+    # ลบเครื่องหมายวรรคตอน/สัญลักษณ์ แต่คงสระและวรรณยุกต์ไทย (category Mn) ไว้
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass
+class CacheHit:
+    code: str
+    kind: str  # "exact" | "similar"
+    score: float
+
+
+class ExpenseCodeCache:
+    """
+    LRU + TTL cache ของผลจัดหมวดค่าใช้จ่ายจาก LLM (description -> expense code)
+    เก็บลง SQLite เพื่อให้ยังใช้ได้หลัง restart และล้างทิ้งอัตโนมัติเมื่อไฟล์ expense master เปลี่ยน
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        source_path: Path,
+        max_entries: int = 5000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        similarity_threshold: float = 0.85,
+        touch_flush_every: int = 64,
+    ) -> None:
+        self.source_path = Path(source_path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.touch_flush_every = touch_flush_every
+
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._grams: Dict[str, Set[str]] = {}
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self._source_stat: Optional[Tuple[float, int]] = None
+        # last_used ของ hit เก็บในหน่วยความจำก่อน (key -> เวลา) แล้วเขียนลง SQLite เป็นชุด
+        # ไม่ต้อง UPDATE + commit ทุก hit ภายใต้ lock; ลำดับ LRU ในหน่วยความจำอัปเดตทันทีอยู่แล้ว
+        self._touched: Dict[str, float] = {}
+        self._closed = False
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, code TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        with self._lock:
+            self._check_source()
+            now = time.time()
+            rows = self._conn.execute("SELECT key, code, created FROM entries ORDER BY last_used").fetchall()
+            for key, code, created in rows:
+                if now - created <= self.ttl_seconds:
+                    self._insert(key, code, created)
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+            self._conn.commit()
+            self._evict()
+        atexit.register(self.close)
+
+    # --- Public API ---
+    def get(self, description: str) -> Optional[CacheHit]:
+        key = normalize_description(description)
+        if not key:
+            return None
+        with self._lock:
+            self._check_source()
+            hit = self._lookup_exact(key) or self._lookup_similar(key)
+            if hit is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats[f"{hit.kind}_hits"] += 1
+            return hit
+
+    def put(self, description: str, code: str) -> None:
+        key = normalize_description(description)
+        if not key or not code:
+            return
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            self._insert(key, code, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, code, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, code, now, now),
+            )
+            self._evict()
+            # commit อยู่แล้ว -> เขียน last_used ที่ค้างไปพร้อมกัน
+            self._flush_touched()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._grams.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["similar_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "llm_calls_saved": hits,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def flush(self) -> None:
+        """เขียน last_used ที่ค้างในหน่วยความจำลง SQLite"""
+        with self._lock:
+            if not self._closed:
+                self._flush_touched()
+                self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+            self._closed = True
+
+    # --- Internals (เรียกภายใต้ lock เท่านั้น) ---
+    def _lookup_exact(self, key: str) -> Optional[CacheHit]:
+        entry = self._entries.get(key)
+        if entry is None or self._expire_if_stale(key, entry[1]):
+            return None
+        self._touch(key)
+        return CacheHit(code=entry[0], kind="exact", score=1.0)
+
+    def _lookup_similar(self, key: str) -> Optional[CacheHit]:
+        grams = char_ngrams(key)
+        if not grams:
+            return None
+        candidates: Set[str] = set()
+        for gram in grams:
+            candidates.update(self._grams.get(gram, ()))
+
+        best_key, best_score = None, 0.0
+        for candidate in candidates:
+            score = _dice(grams, char_ngrams(candidate))
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+        code, created = self._entries[best_key]
+        if self._expire_if_stale(best_key, created):
+            return None
+        self._touch(best_key)
+        return CacheHit(code=code, kind="similar", score=round(best_score, 4))
+
+    def _insert(self, key: str, code: str, created: float) -> None:
+        self._entries[key] = (code, created)
+        for gram in char_ngrams(key):
+            self._grams.setdefault(gram, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        self._touched.pop(key, None)
+        if self._entries.pop(key, None) is None:
+            return
+        for gram in char_ngrams(key):
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+    def _touch(self, key: str) -> None:
+        self._entries.move_to_end(key)
+        self._touched[key] = time.time()
+        if len(self._touched) >= self.touch_flush_every:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        """UPDATE last_used ที่ค้างทั้งหมดในคำสั่งเดียว (ผู้เรียก commit เอง)"""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE entries SET last_used = ? WHERE key = ?", [(t, key) for key, t in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _expire_if_stale(self, key: str, created: float) -> bool:
+        if time.time() - created <= self.ttl_seconds:
+            return False
+        self._remove(key)
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.commit()
+        self._stats["expirations"] += 1
+        return True
+
+    def _evict(self) -> None:
+        evicted = len(self._entries) > self.max_entries
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._stats["evictions"] += 1
+        if evicted:
+            # ลำดับ LRU ใน SQLite ต้องตรงกับหน่วยความจำ ไม่งั้น restart แล้วจะไล่ผิดตัว
+            self._flush_touched()
+
+    def _check_source(self) -> None:
+        """ล้าง cache เมื่อเนื้อหาไฟล์ expense master เปลี่ยน (เช็ค mtime/size ก่อนเพื่อไม่ต้อง hash ทุกครั้ง)"""
+        try:
+            st = os.stat(self.source_path)
+        except OSError:
+            return
+        stat_key = (st.st_mtime, st.st_size)
+        if stat_key == self._source_stat:
+            return
+        self._source_stat = stat_key
+
+        fingerprint = hashlib.sha1(self.source_path.read_bytes()).hexdigest()
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'source_fingerprint'").fetchone()
+        if row is not None and row[0] == fingerprint:
+            return
+        if row is not None:
+            self._entries.clear()
+            self._grams.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._stats["invalidations"] += 1
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('source_fingerprint', ?)", (fingerprint,)
+        )
+        self._conn.commit()
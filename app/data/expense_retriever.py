@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.data.expense_cache import normalize_description
+
+# ใช้ทั้ง bigram และ trigram ของตัวอักษร เพื่อให้จับคำไทยสั้น ๆ (เช่น "ค่าน้ำ") ได้
+NGRAM_RANGE = (2, 3)
+
+
+def _grams(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    padded = f" {text} "
+    for size in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(padded) - size + 1):
+            gram = padded[i : i + size]
+            if gram.strip():
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+@dataclass
+class ExpenseCandidate:
+    expens_code: str
+    expens_name: str
+    score: float
+
+
+class ExpenseRetriever:
+    """
+    Character n-gram TF-IDF index over the expense master list (built once at init).
+    Used to pick top-K candidate codes so the LLM prompt only carries relevant lines.
+    ``general`` holds the codes whose names match ``always_include`` (regex); they are sent with every top-K list.
+    """
+
+    def __init__(self, expense_df: pd.DataFrame, always_include: str = "") -> None:
+        if {"expens_code", "expens_name"} - set(expense_df.columns):
+            expense_df = pd.DataFrame(columns=["expens_code", "expens_name"])
+        self.codes: List[str] = expense_df["expens_code"].astype(str).tolist()
+        self.names: List[str] = expense_df["expens_name"].astype(str).tolist()
+        pattern = re.compile(always_include) if always_include else None
+        self.general: List[ExpenseCandidate] = [
+            ExpenseCandidate(code, name, 0.0) for code, name in zip(self.codes, self.names) if pattern and pattern.search(name)
+        ]
+
+        doc_grams = [_grams(normalize_description(name)) for name in self.names]
+        doc_freq: Dict[str, int] = {}
+        for grams in doc_grams:
+            for gram in grams:
+                doc_freq[gram] = doc_freq.get(gram, 0) + 1
+
+        n_docs = len(doc_grams)
+        self._idf = {gram: math.log((1 + n_docs) / (1 + df)) + 1 for gram, df in doc_freq.items()}
+
+        # postings: gram -> (doc ids, normalized tf-idf weights)
+        postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        for doc_id, grams in enumerate(doc_grams):
+            weights = self._weigh(grams)
+            for gram, weight in weights.items():
+                ids, values = postings.setdefault(gram, ([], []))
+                ids.append(doc_id)
+                values.append(weight)
+        self._postings = {
+            gram: (np.asarray(ids, dtype=np.int32), np.asarray(values)) for gram, (ids, values) in postings.items()
+        }
+
+    def _weigh(self, grams: Dict[str, int]) -> Dict[str, float]:
+        weights = {
+            gram: (1 + math.log(tf)) * self._idf[gram] for gram, tf in grams.items() if gram in self._idf
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {gram: w / norm for gram, w in weights.items()} if norm else {}
+
+    def top_k(self, description: str, k: int = 20) -> List[ExpenseCandidate]:
+        """Return up to ``k`` candidates ranked by cosine similarity (0..1)."""
+        if not self.codes:
+            return []
+        scores = np.zeros(len(self.codes))
+        for gram, weight in self._weigh(_grams(normalize_description(description))).items():
+            ids, values = self._postings[gram]
+            scores[ids] += weight * values
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            ExpenseCandidate(self.codes[i], self.names[i], round(float(scores[i]), 4))
+            for i in top
+            if scores[i] > 0
+        ]
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+# เปลี่ยนเลขนี้เมื่อรูปแบบไฟล์ cache หรือขั้นตอน clean ข้อมูลเปลี่ยน (cache เดิมจะถูกสร้างใหม่)
+CACHE_VERSION = 1
+
+Loader = Callable[[], pd.DataFrame]
+OnRefresh = Callable[[str, pd.DataFrame], None]
+
+
+@dataclass
+class SourceState:
+    mtime_ns: int
+    size: int
+    sha1: str
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["SourceState"]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return cls(st.st_mtime_ns, st.st_size, "")
+
+
+def file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """
+    เก็บ DataFrame ที่ clean + กำหนดชนิดแล้วเป็น Feather/Parquet ข้างไฟล์ต้นทาง
+    - start ครั้งถัดไปโหลดจาก cache (Feather อ่านแบบ memory-map) ถ้าไฟล์ต้นทางไม่เปลี่ยน
+      (เช็ค mtime/size ก่อน ถ้าต่างค่อยเทียบ sha1 ของเนื้อหา)
+    - ถ้าต้นทางเปลี่ยนแต่มี cache เก่า: คืน cache เก่าไปก่อน แล้ว re-ingest ใน background thread
+      เสร็จแล้วเรียก ``on_refresh(name, df)`` ให้ผู้ใช้สลับข้อมูลใหม่เข้าไป
+    ต้องมี pyarrow (ถ้าไม่มี ``enabled`` เป็น False และ ``load`` จะเรียก loader ตรง ๆ)
+    """
+
+    def __init__(self, directory: Path, fmt: str = "feather", enabled: bool = True) -> None:
+        self.directory = Path(directory)
+        self.fmt = fmt
+        self.enabled = enabled and importlib.util.find_spec("pyarrow") is not None
+        self._lock = threading.Lock()
+        self._refreshing: Dict[str, threading.Thread] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale_served": 0, "refreshes": 0}
+
+    def _paths(self, name: str) -> tuple[Path, Path]:
+        return self.directory / f"{name}.{self.fmt}", self.directory / f"{name}.meta.json"
+
+    def load(
+        self,
+        name: str,
+        source_path: Path,
+        loader: Loader,
+        fingerprint: str = "",
+        on_refresh: Optional[OnRefresh] = None,
+    ) -> pd.DataFrame:
+        """
+        Return the frame for ``source_path``, from cache when valid.
+        ``fingerprint`` identifies the cleaning rules (e.g. the schema); a different value invalidates the cache.
+        """
+        if not self.enabled:
+            return loader()
+        state = SourceState.read(source_path)
+        if state is None:
+            # ไม่มีไฟล์ต้นทาง -> ให้ loader จัดการ (คืน DataFrame ว่าง) และไม่เขียน cache
+            return loader()
+
+        data_path, meta_path = self._paths(name)
+        meta = self._read_meta(meta_path)
+        cached_ok = meta is not None and data_path.exists() and meta.get("fingerprint") == self._fingerprint(fingerprint)
+        if cached_ok and meta["mtime_ns"] == state.mtime_ns and meta["size"] == state.size:
+            self.stats["hits"] += 1
+            return self._read(data_path)
+
+        if cached_ok:
+            # mtime เปลี่ยนแต่เนื้อหาอาจเหมือนเดิม (เช่น copy ไฟล์ทับ) -> เทียบ hash ก่อน parse ใหม่
+            state.sha1 = file_sha1(source_path)
+            if state.sha1 == meta.get("sha1"):
+                self._write_meta(meta_path, state, fingerprint)
+                self.stats["hits"] += 1
+                return self._read(data_path)
+            if on_refresh is not None:
+                self.stats["stale_served"] += 1
+                self.refresh_async(name, source_path, loader, fingerprint, on_refresh)
+                return self._read(data_path)
+
+        self.stats["misses"] += 1
+        return self._ingest(name, source_path, loader, fingerprint, state)
+
+    def refresh_async(
+        self, name: str, source_path: Path, loader: Loader, fingerprint: str, on_refresh: OnRefresh
+    ) -> Optional[threading.Thread]:
+        """Re-ingest ``source_path`` in a background thread and hand the new frame to ``on_refresh``."""
+        with self._lock:
+            running = self._refreshing.get(name)
+            if running is not None and running.is_alive():
+                return running
+
+            def work() -> None:
+                try:
+                    df = self._ingest(name, source_path, loader, fingerprint, SourceState.read(source_path))
+                    self.stats["refreshes"] += 1
+                    on_refresh(name, df)
+                except Exception as e:
+                    print(f"Warning: Background re-ingest of {source_path} failed: {e}")
+                finally:
+                    with self._lock:
+                        self._refreshing.pop(name, None)
+
+            thread = threading.Thread(target=work, name=f"frame-cache-{name}", daemon=True)
+            self._refreshing[name] = thread
+            thread.start()
+            return thread
+
+    def _ingest(
+        self, name: str, source_path: Path, loader: Loader, fingerprint: str, state: Optional[SourceState]
+    ) -> pd.DataFrame:
+        # hash ก่อน parse: ถ้าไฟล์เปลี่ยนระหว่าง parse ครั้งถัดไปจะเห็นว่าไม่ตรงแล้ว ingest ใหม่
+        if state is not None and not state.sha1:
+            state.sha1 = file_sha1(source_path)
+        df = loader()
+        if state is None or df.empty:
+            return df
+        try:
+            self._write(name, df, state, fingerprint)
+        except Exception as e:
+            # cache เป็นแค่ตัวเร่ง เขียนไม่ได้ก็ยังใช้ข้อมูลที่ parse แล้วได้
+            print(f"Warning: Could not write frame cache for {name}: {e}")
+        return df
+
+    def _fingerprint(self, fingerprint: str) -> str:
+        return f"v{CACHE_VERSION}:{self.fmt}:{fingerprint}"
+
+    def _read(self, path: Path) -> pd.DataFrame:
+        if self.fmt == "parquet":
+            return pd.read_parquet(path)
+        from pyarrow import feather
+
+        # memory-map: คอลัมน์ตัวเลขอ่านจาก page cache ของ OS โดยไม่ copy
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def _write(self, name: str, df: pd.DataFrame, state: SourceState, fingerprint: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(name)
+        tmp_path = data_path.with_suffix(data_path.suffix + ".tmp")
+        frame = df.reset_index(drop=True)
+        if self.fmt == "parquet":
+            frame.to_parquet(tmp_path, index=False)
+        else:
+            # ไม่บีบอัด เพื่อให้ memory-map ได้โดยตรง
+            frame.to_feather(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, data_path)
+        self._write_meta(meta_path, state, fingerprint)
+
+    def _write_meta(self, meta_path: Path, state: SourceState, fingerprint: str) -> None:
+        meta: Dict[str, Any] = {
+            "mtime_ns": state.mtime_ns,
+            "size": state.size,
+            "sha1": state.sha1,
+            "fingerprint": self._fingerprint(fingerprint),
+        }
+        tmp_path = meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def _read_meta(meta_path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
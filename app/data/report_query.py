@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Literal, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from typing_extensions import NotRequired, TypedDict
+
+FilterOp = Literal["eq", "ne", "gt", "gte", "lt", "lte", "in", "not_in", "between", "contains", "startswith"]
+AggregateFunc = Literal["sum", "mean", "min", "max", "count", "nunique"]
+
+
+# docstring ของ TypedDict กลายเป็นคำอธิบายใน JSON schema ของ tool (LLM อ่าน) จึงเขียนเป็นภาษาอังกฤษ
+class FilterSpec(TypedDict):
+    """One condition, e.g. {"column": "diff_day", "op": "gt", "value": 180}. All filters are AND-ed.
+    'in'/'not_in' take a list of values, 'between' takes [low, high] (inclusive)."""
+
+    column: str
+    op: FilterOp
+    value: Any
+
+
+class SortSpec(TypedDict):
+    """Sort key; descending defaults to false."""
+
+    column: str
+    descending: NotRequired[bool]
+
+
+class AggregateSpec(TypedDict):
+    """Aggregate over each group; the output column is named '<column>_<func>'."""
+
+    column: str
+    func: AggregateFunc
+
+
+@dataclass
+class QueryResult:
+    rows: pd.DataFrame
+    total: int
+    next_offset: Optional[int]
+
+
+def _coerce(series: pd.Series, value: Any) -> Any:
+    """แปลงค่าที่ LLM ส่งมา (มักเป็น string) ให้ตรงชนิดคอลัมน์"""
+    if isinstance(value, (list, tuple)):
+        return [_coerce(series, v) for v in value]
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        number = pd.to_numeric(value, errors="coerce")
+        if pd.isna(number):
+            raise ValueError(f"value {value!r} is not a number (column is numeric)")
+        return number
+    return str(value)
+
+
+def _predicate(series: pd.Series, op: str, value: Any) -> np.ndarray:
+    if op in ("contains", "startswith"):
+        text = series.astype(str)
+        if op == "contains":
+            return text.str.contains(str(value), case=False, regex=False, na=False).to_numpy(dtype=bool)
+        return text.str.startswith(str(value), na=False).to_numpy(dtype=bool)
+
+    value = _coerce(series, value)
+    if op in ("in", "not_in"):
+        values = value if isinstance(value, list) else [value]
+        mask = series.isin(values).to_numpy(dtype=bool)
+        return mask if op == "in" else ~mask
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError("'between' needs a [low, high] pair")
+        op_series = series.astype(str) if isinstance(series.dtype, pd.CategoricalDtype) else series
+        return op_series.between(value[0], value[1]).to_numpy(dtype=bool, na_value=False)
+
+    # เทียบมาก/น้อยกับ category ไม่ได้ -> เทียบเป็น string
+    if op in ("gt", "gte", "lt", "lte") and isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(str)
+    compare = {
+        "eq": series.__eq__,
+        "ne": series.__ne__,
+        "gt": series.__gt__,
+        "gte": series.__ge__,
+        "lt": series.__lt__,
+        "lte": series.__le__,
+    }.get(op)
+    if compare is None:
+        raise ValueError(f"unknown filter op {op!r}")
+    return compare(value).to_numpy(dtype=bool, na_value=False)
+
+
+def _require_columns(df: pd.DataFrame, columns: Sequence[str], what: str) -> None:
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"unknown {what} column(s) {missing}; available: {list(df.columns)}")
+
+
+def run_query(
+    df: pd.DataFrame,
+    filters: Optional[Sequence[FilterSpec]] = None,
+    sort: Optional[Sequence[SortSpec]] = None,
+    group_by: Optional[Sequence[str]] = None,
+    aggregates: Optional[Sequence[AggregateSpec]] = None,
+    columns: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> QueryResult:
+    """
+    กรอง -> group/aggregate -> เรียง -> ตัดหน้า บน DataFrame แบบ vectorized (ไม่วนลูปทีละแถว)
+    - filter ทุกข้อรวมกันเป็น boolean mask เดียวก่อนเลือกแถว
+    - sort อ้างถึงคอลัมน์ผลลัพธ์ได้ (รวมคอลัมน์ aggregate เช่น ``qtybal_sum``)
+    - ถ้าเรียงด้วยคอลัมน์ตัวเลขคอลัมน์เดียว ใช้ nlargest/nsmallest (O(n)) แทนการ sort ทั้งตาราง
+    """
+    if filters:
+        _require_columns(df, [f["column"] for f in filters], "filter")
+        mask = np.ones(len(df), dtype=bool)
+        for spec in filters:
+            try:
+                mask &= _predicate(df[spec["column"]], spec.get("op", "eq"), spec.get("value"))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"filter on {spec['column']!r}: {e}") from e
+        df = df[mask]
+
+    if group_by or aggregates:
+        group_by = list(group_by or [])
+        _require_columns(df, group_by, "group_by")
+        _require_columns(df, [a["column"] for a in aggregates or []], "aggregate")
+        named = {f"{a['column']}_{a['func']}": (a["column"], a["func"]) for a in aggregates or []}
+        if group_by:
+            grouped = df.groupby(group_by, observed=True, sort=False)
+            df = grouped.agg(**named).reset_index() if named else grouped.size().reset_index(name="row_count")
+            if named:
+                df.insert(len(group_by), "row_count", grouped.size().to_numpy())
+        else:
+            df = pd.DataFrame({name: [df[column].agg(func)] for name, (column, func) in named.items()})
+        float_columns = df.select_dtypes("float").columns
+        if len(float_columns):
+            df[float_columns] = df[float_columns].round(4)
+    elif columns:
+        _require_columns(df, columns, "select")
+
+    total = len(df)
+    end = offset + limit
+    if sort:
+        _require_columns(df, [s["column"] for s in sort], "sort")
+        keys = [s["column"] for s in sort]
+        ascending = [not s.get("descending", False) for s in sort]
+        if len(keys) == 1 and pd.api.types.is_numeric_dtype(df[keys[0]]) and end < total // 4:
+            pick = df.nsmallest if ascending[0] else df.nlargest
+            picked = pick(end, keys[0])
+            # nlargest/nsmallest ตัดแถว NaN ทิ้ง แต่ sort_values วาง NaN ไว้ท้าย -> ต่อแถว NaN ให้ผลเหมือนกัน
+            if len(picked) < end:
+                picked = pd.concat([picked, df[df[keys[0]].isna()]])
+            df = picked
+        else:
+            df = df.sort_values(keys, ascending=ascending, kind="stable")
+
+    page = df.iloc[offset:end]
+    if columns and not (group_by or aggregates):
+        page = page[list(columns)]
+    return QueryResult(rows=page, total=total, next_offset=end if end < total else None)
+
+
+# --- Cursor ---
+# cursor ผูกกับ query + เวอร์ชันข้อมูล: ถ้าข้อมูลถูก reload ระหว่างเปิดหน้า ให้เริ่มใหม่แทนการได้หน้าที่เลื่อน
+
+
+def query_fingerprint(report: str, **query: Any) -> str:
+    raw = json.dumps([report, query], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(offset: int, version: int, fingerprint: str) -> str:
+    raw = json.dumps({"o": offset, "v": version, "q": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, version: int, fingerprint: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset, cursor_version, cursor_query = int(data["o"]), int(data["v"]), str(data["q"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+    if cursor_query != fingerprint:
+        raise ValueError("cursor belongs to a different query; pass the same filters/sort as the first page")
+    if cursor_version != version:
+        raise ValueError("report data was reloaded since this cursor was issued; run the query again without cursor")
+    return offset
@@ -1,58 +1,310 @@
 from __future__ import annotations
 
 import json
-import os
 import re
-from typing import Any, Dict, List, Optional
-import boto3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 import pandas as pd
 
 from app.config import (
+    AGING_BUCKET_DAYS,
     AGING_REPORT_PATH,
     ACTUAL_COST_PATH,
+    EXPENSE_CACHE_MAX_ENTRIES,
+    EXPENSE_CACHE_PATH,
+    EXPENSE_CACHE_SIMILARITY,
+    EXPENSE_BATCH_CONCURRENCY,
+    EXPENSE_BATCH_SIZE,
+    EXPENSE_CACHE_TTL_SECONDS,
+    EXPENSE_ALWAYS_INCLUDE_PATTERN,
+    EXPENSE_CANDIDATE_K,
+    EXPENSE_LOCAL_ACCEPT_MARGIN,
+    EXPENSE_LOCAL_ACCEPT_SCORE,
+    EXPENSE_RETRIEVAL_MIN_SCORE,
     EXPENSE_CODE_PATH,
-    PPN_DATA_PATH
+    EXPENSE_MODEL_ID,
+    EXPENSE_MODEL_REGION,
+    FRAME_CACHE_DIR,
+    FRAME_CACHE_ENABLED,
+    FRAME_CACHE_FORMAT,
+    PPN_DATA_PATH,
+    REPORT_QUERY_MAX_LIMIT,
 )
+from app.data.aggregates import AgingBucketView, CostTotalsView, MaterialUsageView
+from app.data.expense_cache import ExpenseCodeCache
+from app.data.expense_retriever import ExpenseCandidate, ExpenseRetriever
+from app.data.frame_cache import FrameCache
+from app.data.report_query import (
+    AggregateSpec,
+    FilterSpec,
+    SortSpec,
+    decode_cursor,
+    encode_cursor,
+    query_fingerprint,
+    run_query,
+)
+from app.data.schemas import AGING_SCHEMA, COST_SCHEMA, EXPENSE_SCHEMA, PPN_SCHEMA, ReportSchema, load_frame, to_records
+from app.data.search_index import PlanSearchIndex
+from app.data.snapshot import DataSnapshot, Lazy
+from app.data.watcher import SourceWatcher
+from app.llm.gateway import get_gateway
+
+UNKNOWN_EXPENSE_NAME = "AI Selected Code (Not in CSV List)"
+EXPENSE_CODE_HINT = "Call tool 'get_expense_code' with the description to get the AI-selected code."
+AMOUNT_PATTERN = r'[\d,]+(\.\d{2})?'
+
+
+# ไฟล์ต้นทางแต่ละชุด: name -> (path, schema, option ตอนโหลด)
+DataSources = Dict[str, Tuple[Path, ReportSchema, Dict[str, Any]]]
+
+DATA_SOURCES: DataSources = {
+    "aging": (AGING_REPORT_PATH, AGING_SCHEMA, {"sort_by": "diff_day"}),
+    "cost": (ACTUAL_COST_PATH, COST_SCHEMA, {"skiprows": 3}),
+    "expense": (EXPENSE_CODE_PATH, EXPENSE_SCHEMA, {}),
+    "ppn": (PPN_DATA_PATH, PPN_SCHEMA, {}),
+}
+
+
+@dataclass
+class ExpenseLookup:
+    """ผลค้นหาในเครื่องของคำอธิบายหนึ่ง ก่อนตัดสินใจว่าจะเรียก LLM หรือไม่"""
+
+    candidates: List[ExpenseCandidate]
+    # รหัสที่ตอบได้เลยโดยไม่เรียก LLM (None = ต้องถาม LLM)
+    local_code: Optional[str]
+    # รายการรหัสที่จะใส่ใน prompt (top-K + รหัสหมวดทั่วไป หรือรายการเต็มถ้าผลค้นหาอ่อน)
+    expense_list_str: str
+    full_list: bool
+
 
 class DataRepository:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        sources: Optional[DataSources] = None,
+        bedrock_client: Any = None,
+        frame_cache: Optional[FrameCache] = None,
+        expense_cache: Optional[ExpenseCodeCache] = None,
+        warm_up: bool = False,
+    ) -> None:
+        # ค่าเริ่มต้นคือไฟล์จริงใน app/data + Bedrock; benchmark ส่งชุดข้อมูล/client/cache ของตัวเองได้
+        self.sources: DataSources = dict(sources or DATA_SOURCES)
         # --- Load DataFrames ---
-        self.aging_df = self._load_csv(AGING_REPORT_PATH)
-        if "diff_day" in self.aging_df.columns:
-            self.aging_df["diff_day"] = pd.to_numeric(self.aging_df["diff_day"], errors="coerce").fillna(0)
-            self.aging_df = self.aging_df.sort_values(by="diff_day", ascending=False)
-
-        self.cost_df = self._load_csv(ACTUAL_COST_PATH, skiprows=3) 
-        self.expense_df = self._load_csv(EXPENSE_CODE_PATH)
-        self.ppn_df = self._load_csv(PPN_DATA_PATH)
-        if "required_qty" in self.ppn_df.columns:
-             self.ppn_df["required_qty"] = pd.to_numeric(self.ppn_df["required_qty"], errors='coerce').fillna(0)
+        # แต่ละไฟล์มี schema ของตัวเอง (ตัวเลข/category/วันที่) แทนการเก็บทุกคอลัมน์เป็น string
+        # DataFrame ที่ clean แล้วเก็บเป็น Feather ไว้ start ครั้งถัดไปไม่ต้อง parse CSV ใหม่
+        self.frame_cache = frame_cache or FrameCache(FRAME_CACHE_DIR, FRAME_CACHE_FORMAT, enabled=FRAME_CACHE_ENABLED)
+        # ข้อมูลทั้งหมดอยู่ใน snapshot เดียว: tool อ่าน self._snapshot ครั้งเดียวต่อ call
+        # ส่วน reload สร้าง snapshot ใหม่ใน background แล้วสลับ reference (atomic) ภายใต้ _swap_lock
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.watcher: Optional[SourceWatcher] = None
+        self.reload_count = 0
+        # แต่ละชุดข้อมูลโหลดตอน tool ใช้ครั้งแรก (import server / สร้าง repository จึงไม่อ่านไฟล์)
+        self._snapshot = self._build_snapshot({name: self._lazy_frame(name) for name in self.sources})
 
         # Initialize Bedrock Client
-        # ใช้ Region จาก Env หรือ Default เป็น us-east-1
-        self.bedrock = boto3.client(
-            'bedrock-runtime', 
-            region_name=os.getenv("BEDROCK_REGION", "us-east-1") 
+        # ใช้ client กลางของ LLM gateway (limiter + retry เมื่อโดน throttle ร่วมกับ agent อื่นใน process)
+        # สร้างตอนจัดหมวดค่าใช้จ่ายด้วย LLM ครั้งแรก
+        self._bedrock = bedrock_client
+
+        # Cache ผลจัดหมวดจาก LLM (ล้างอัตโนมัติเมื่อ ap_expensother.csv เปลี่ยน)
+        self.expense_cache = expense_cache or ExpenseCodeCache(
+            EXPENSE_CACHE_PATH,
+            source_path=EXPENSE_CODE_PATH,
+            max_entries=EXPENSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=EXPENSE_CACHE_TTL_SECONDS,
+            similarity_threshold=EXPENSE_CACHE_SIMILARITY,
         )
+        if warm_up:
+            self.warm_up()
 
-        # --- Pre-calculate Expense String ---
-        # เตรียมข้อมูลสำหรับ Prompt ไว้เลย จะได้ไม่ต้องวนลูปสร้างใหม่ทุกครั้งที่เรียก
-        if "expens_code" in self.expense_df.columns and "expens_name" in self.expense_df.columns:
-            self.expense_master_list_str = "\n".join(
-                self.expense_df.apply(
-                    lambda x: f"{x['expens_code']} - {x['expens_name']}", axis=1
-                ).tolist()
-            )
-        else:
-            self.expense_master_list_str = "No expense data available."
+    @property
+    def bedrock(self) -> Any:
+        if self._bedrock is None:
+            self._bedrock = get_gateway().client(EXPENSE_MODEL_REGION)
+        return self._bedrock
+
+    def warm_up(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        โหลดทุกชุดข้อมูลและ view ล่วงหน้า (ชุดละ thread) แทนการรอ tool call แรก
+        ``background=True`` คืน thread ที่กำลังโหลดทันที (server รับ request ได้ระหว่างนั้น)
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="data-warm-up", daemon=True)
+            thread.start()
+            return thread
+        snap = self._snapshot
+        with ThreadPoolExecutor(max_workers=len(snap.frame_cells), thread_name_prefix="warm-up") as pool:
+            list(pool.map(Lazy.get, snap.frame_cells.values()))
+            list(pool.map(Lazy.get, snap.view_cells.values()))
+        return None
+
+    # --- Snapshot ---
+    @property
+    def snapshot(self) -> DataSnapshot:
+        return self._snapshot
+
+    @property
+    def data_version(self) -> int:
+        """เวอร์ชันของ snapshot ปัจจุบัน (เพิ่มทุกครั้งที่ reload) ใช้เป็นส่วนหนึ่งของ cache key"""
+        return self._snapshot.version
+
+    # อ่านค่าจาก snapshot ปัจจุบัน (สำหรับโค้ดภายนอก/benchmark; tool method อ่าน snapshot ครั้งเดียวต่อ call)
+    # การอ่านครั้งแรกของแต่ละชุดจะโหลดไฟล์
+    @property
+    def aging_df(self) -> pd.DataFrame:
+        return self._snapshot.aging_df
+
+    @property
+    def cost_df(self) -> pd.DataFrame:
+        return self._snapshot.cost_df
+
+    @property
+    def expense_df(self) -> pd.DataFrame:
+        return self._snapshot.expense_df
+
+    @property
+    def ppn_df(self) -> pd.DataFrame:
+        return self._snapshot.ppn_df
+
+    @property
+    def plan_index(self) -> PlanSearchIndex:
+        return self._snapshot.plan_index
+
+    @property
+    def expense_master_list_str(self) -> str:
+        return self._snapshot.expense_master_list_str
 
-    def _load_csv(self, path, **kwargs) -> pd.DataFrame:
+    @property
+    def expense_retriever(self) -> ExpenseRetriever:
+        return self._snapshot.expense_retriever
+
+    def _views(self) -> Dict[str, Dict[str, Callable[[pd.DataFrame], Any]]]:
+        """ชุดข้อมูล -> view ที่คำนวณจาก frame ของชุดนั้น (คำนวณใหม่เฉพาะชุดที่เปลี่ยน)"""
+        return {
+            # Search Index ของแผนงาน แทนการสแกนทั้งตารางทุกครั้งที่ค้นหา
+            "ppn": {"plan_index": PlanSearchIndex, "material_usage": MaterialUsageView.build},
+            "aging": {"aging_buckets": lambda df: AgingBucketView.build(df, AGING_BUCKET_DAYS)},
+            "cost": {"cost_totals": CostTotalsView.build},
+            # ข้อมูลสำหรับ Prompt + index รหัสค่าใช้จ่ายสำหรับคัด candidate ก่อนส่งให้ LLM
+            "expense": {
+                "expense_master_list_str": self._build_expense_master_list,
+                "expense_retriever": lambda df: ExpenseRetriever(df, EXPENSE_ALWAYS_INCLUDE_PATTERN),
+            },
+        }
+
+    def _build_snapshot(
+        self, frames: Dict[str, Lazy[pd.DataFrame]], previous: Optional[DataSnapshot] = None
+    ) -> DataSnapshot:
+        """สร้าง snapshot ใหม่จาก frame ที่เปลี่ยน (frame ที่ไม่ได้ส่งมาใช้ของเดิม) และ view ที่ขึ้นกับ frame นั้นใหม่"""
+        frame_cells = dict(previous.frame_cells) if previous is not None else {}
+        view_cells = dict(previous.view_cells) if previous is not None else {}
+        views = self._views()
+        for name, cell in frames.items():
+            frame_cells[name] = cell
+            for view_name, build in views.get(name, {}).items():
+                view_cells[view_name] = Lazy(lambda build=build, cell=cell: build(cell.get()))
+        return DataSnapshot(
+            version=previous.version + 1 if previous is not None else 1,
+            frame_cells=frame_cells,
+            view_cells=view_cells,
+        )
+
+    def _swap(self, frames: Dict[str, Lazy[pd.DataFrame]]) -> DataSnapshot:
+        with self._swap_lock:
+            snapshot = self._build_snapshot(frames, self._snapshot)
+            self._snapshot = snapshot
+            self.reload_count += 1
+        print(f"Reloaded {', '.join(sorted(frames))} data (snapshot v{snapshot.version})")
+        return snapshot
+
+    def reload(self, names: Optional[Iterable[str]] = None) -> DataSnapshot:
+        """
+        โหลดไฟล์ต้นทางที่ระบุ (default = ทั้งหมด) ใหม่ แล้วสลับ snapshot
+        ทำงานบน thread ของผู้เรียก (เช่น SourceWatcher) โดยไม่บล็อก tool ที่กำลังอ่าน snapshot เดิม
+        """
+        names = sorted(set(names or self.sources))
+        with self._reload_lock:
+            current = self._snapshot.frame_cells
+            # ชุดที่ยังไม่เคยถูกใช้ไม่ต้องโหลดตอนนี้ แค่ให้ครั้งแรกที่ใช้อ่านไฟล์ใหม่
+            frames = {
+                name: Lazy.ready(self._load_frame(name, background_refresh=False))
+                if current[name].loaded
+                else self._lazy_frame(name)
+                for name in names
+            }
+            return self._swap(frames)
+
+    def start_watcher(self, interval: float, settle_polls: int = 1) -> SourceWatcher:
+        """เริ่ม poll ไฟล์ต้นทาง เมื่อไฟล์เปลี่ยน (และเขียนเสร็จแล้ว) จะ reload เฉพาะชุดที่เปลี่ยน"""
+        if self.watcher is None:
+            paths = {name: path for name, (path, _, _) in self.sources.items()}
+            self.watcher = SourceWatcher(paths, self.reload, interval=interval, settle_polls=settle_polls)
+        return self.watcher.start()
+
+    def stop_watcher(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def get_data_status(self) -> Dict[str, Any]:
+        return {
+            **self._snapshot.summary(),
+            "reloads": self.reload_count,
+            "watching": self.watcher is not None,
+            "last_reload_error": self.watcher.last_error if self.watcher else None,
+            "frame_cache": dict(self.frame_cache.stats),
+        }
+
+    # --- Loading ---
+    def _load_csv(self, path, schema: ReportSchema, sort_by: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        # error ส่งต่อให้ผู้เรียก: reload/refresh ต้องเก็บ snapshot เดิมไว้แทนการสลับ DataFrame ว่างเข้าไป
+        df = load_frame(path, schema, **kwargs)
+        missing = [c for c in schema.required if c not in df.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns {missing}")
+        if df.empty:
+            raise ValueError(f"{path} has no rows")
+        if sort_by and sort_by in df.columns:
+            df = df.sort_values(by=sort_by, ascending=False).reset_index(drop=True)
+        return df
+
+    def _lazy_frame(self, name: str) -> Lazy[pd.DataFrame]:
+        return Lazy(lambda: self._load_initial(name))
+
+    def _load_initial(self, name: str) -> pd.DataFrame:
+        """โหลดครั้งแรก: ไฟล์หาย/เสียยังเปิด server ได้ (tool ของชุดนั้นเห็นข้อมูลว่าง) จนกว่า reload จะสำเร็จ"""
         try:
-            return pd.read_csv(path, dtype=str, **kwargs).fillna("")
+            return self._load_frame(name)
         except Exception as e:
-            print(f"Error loading {path}: {e}")
+            print(f"Error loading {self.sources[name][0]}: {e}")
             return pd.DataFrame()
 
+    def _load_frame(self, name: str, background_refresh: bool = True) -> pd.DataFrame:
+        path, schema, options = self.sources[name]
+        # fingerprint = กฎการ clean ทั้งหมด ถ้า schema/option เปลี่ยน cache เดิมใช้ไม่ได้
+        fingerprint = repr((schema, sorted(options.items())))
+        return self.frame_cache.load(
+            name,
+            path,
+            lambda: self._load_csv(path, schema, **options),
+            fingerprint=fingerprint,
+            on_refresh=self._on_frame_refresh if background_refresh else None,
+        )
+
+    def _on_frame_refresh(self, name: str, df: pd.DataFrame) -> None:
+        """สลับ DataFrame ที่ re-ingest เสร็จใน background เข้าแทน cache เก่าตอน start"""
+        self._swap({name: Lazy.ready(df)})
+
+    @staticmethod
+    def _build_expense_master_list(expense_df: pd.DataFrame) -> str:
+        if "expens_code" in expense_df.columns and "expens_name" in expense_df.columns:
+            return "\n".join(
+                expense_df.apply(lambda x: f"{x['expens_code']} - {x['expens_name']}", axis=1).tolist()
+            )
+        return "No expense data available."
+
     # ... (ฟังก์ชัน Reporter และ PPN คงเดิม) ...
     def _normalize_report_name(self, name: str) -> str:
         if not name: return ""
@@ -68,36 +320,91 @@ class DataRepository:
 
     def get_report_columns(self, report_name: str) -> List[str]:
         std_name = self._normalize_report_name(report_name)
-        if std_name == "aging_stock_balance": return list(self.aging_df.columns)
-        elif std_name == "actual_cost": return list(self.cost_df.columns)
+        snap = self._snapshot
+        if std_name == "aging_stock_balance": return list(snap.aging_df.columns)
+        elif std_name == "actual_cost": return list(snap.cost_df.columns)
         return []
 
     def read_report(self, report_name: str, columns: Optional[List[str]] = None, limit: int = 20) -> List[Dict[str, Any]]:
         std_name = self._normalize_report_name(report_name)
-        df = self.aging_df if std_name == "aging_stock_balance" else self.cost_df
+        snap = self._snapshot
+        df = snap.aging_df if std_name == "aging_stock_balance" else snap.cost_df
         if columns:
             valid_cols = [c for c in columns if c in df.columns]
             if valid_cols: df = df[valid_cols]
-        return df.head(limit).to_dict("records")
+        return to_records(df.head(limit))
+
+    def query_report(
+        self,
+        report_name: str,
+        filters: Optional[List[FilterSpec]] = None,
+        sort: Optional[List[SortSpec]] = None,
+        group_by: Optional[List[str]] = None,
+        aggregates: Optional[List[AggregateSpec]] = None,
+        columns: Optional[List[str]] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        encode: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        กรอง/เรียง/สรุปผลรายงานฝั่ง server แล้วส่งกลับเฉพาะหน้าที่ต้องการ
+        ``next_cursor`` ใช้ขอหน้าถัดไปด้วย query เดิม (ใช้ไม่ได้ถ้าข้อมูลถูก reload ระหว่างนั้น)
+        ``encode`` แปลง rows ก่อนส่ง (เช่น encoding แบบประหยัด token) ถ้าตัดแถวออกเพราะงบ token
+        (คืน ``omitted_rows``) หน้าถัดไปจะเริ่มต่อจากแถวสุดท้ายที่ส่งจริง
+        """
+        std_name = self._normalize_report_name(report_name)
+        if std_name not in self.get_report_names():
+            raise ValueError(f"unknown report {report_name!r}; available: {self.get_report_names()}")
+        snap = self._snapshot
+        df = snap.aging_df if std_name == "aging_stock_balance" else snap.cost_df
+        limit = max(1, min(int(limit), REPORT_QUERY_MAX_LIMIT))
+        fingerprint = query_fingerprint(
+            std_name, filters=filters, sort=sort, group_by=group_by, aggregates=aggregates, columns=columns, limit=limit
+        )
+        offset = decode_cursor(cursor, snap.version, fingerprint) if cursor else 0
+        result = run_query(df, filters, sort, group_by, aggregates, columns, limit=limit, offset=offset)
+        rows: Any = to_records(result.rows)
+        next_offset = result.next_offset
+        if encode is not None:
+            rows = encode(rows)
+            if isinstance(rows, dict) and rows.get("omitted_rows"):
+                next_offset = offset + rows["row_count"]
+        payload: Dict[str, Any] = {"report": std_name, "total": result.total, "offset": offset}
+        if isinstance(rows, dict):
+            payload.update(rows)
+        else:
+            payload["rows"] = rows
+        payload["next_cursor"] = encode_cursor(next_offset, snap.version, fingerprint) if next_offset is not None else None
+        return payload
 
     def get_plan_columns(self) -> List[str]:
-        return list(self.ppn_df.columns)
+        return list(self._snapshot.ppn_df.columns)
+
+    def get_plan(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        if offset < 0:
+            raise ValueError(f"offset must be >= 0, got {offset}")
+        limit = max(1, min(int(limit), REPORT_QUERY_MAX_LIMIT))
+        snap = self._snapshot
+        df = snap.ppn_df
+        if not query or not query.strip():
+            return to_records(df.iloc[offset : offset + limit])
+        result = snap.plan_index.search(query, limit=limit, offset=offset)
+        return to_records(df.iloc[result.row_ids])
+
+    def get_material_use(self, project: Optional[str] = None) -> List[Dict[str, Any]]:
+        # ยอดรวมคำนวณไว้แล้วตอนโหลดข้อมูล (MaterialUsageView) ไม่ต้อง groupby ทุกครั้ง
+        return self._snapshot.material_usage.lookup(project)
 
-    def get_plan(self, query: str) -> List[Dict[str, Any]]:
-        df = self.ppn_df
-        mask = df.apply(lambda x: x.astype(str).str.contains(query, case=False, na=False)).any(axis=1)
-        return df[mask].head(20).to_dict("records")
+    # --- Materialized aggregates (Reporter) ---
+    def get_aging_buckets(self, warehouse: Optional[str] = None, material: Optional[str] = None) -> Dict[str, Any]:
+        return self._snapshot.aging_buckets.lookup(warehouse, material)
 
-    def get_material_use(self) -> List[Dict[str, Any]]:
-        if "c_des1" in self.ppn_df.columns and "required_qty" in self.ppn_df.columns:
-            grouped = self.ppn_df.groupby("c_des1")["required_qty"].sum().reset_index()
-            grouped = grouped.sort_values(by="required_qty", ascending=False)
-            return grouped.head(50).to_dict("records")
-        return self.ppn_df.head(20).to_dict("records")
+    def get_cost_totals(self) -> List[Dict[str, Any]]:
+        return self._snapshot.cost_totals.groups
 
     # --- OF Agent Tools (อัปเกรดใหม่ด้วย LLM) ---
     def phase_structure(self, text: str) -> Dict[str, Any]:
-        amount_match = re.search(r'[\d,]+(\.\d{2})?', text)
+        amount_match = re.search(AMOUNT_PATTERN, text)
         amount = 0.0
         if amount_match:
             try:
@@ -109,20 +416,193 @@ class DataRepository:
             "date": None,
             "amount": amount,
             "description": text.strip(),
-            "expense_code": "Call tool 'get_expense_code' with the description to get the AI-selected code."
+            "expense_code": EXPENSE_CODE_HINT
         }
 
+    def parse_amounts(self, texts: Sequence[str]) -> List[float]:
+        """ดึงจำนวนเงินแบบเดียวกับ phase_structure (ตัวเลขแรกในข้อความ) ทีละหลายรายการด้วย pandas"""
+        if not texts:
+            return []
+        matched = pd.Series(list(texts), dtype=object).astype(str).str.extract(f"({AMOUNT_PATTERN})", expand=True)[0]
+        amounts = pd.to_numeric(matched.str.replace(",", "", regex=False), errors="coerce")
+        return amounts.fillna(0.0).astype(float).tolist()
+
     def get_expense_code(self, description: str) -> List[Dict[str, str]]:
         """
         ใช้ LLM (Claude 3.7) หา expense code โดยตรงจากความหมาย
+        (เช็ค cache ก่อน ถ้าเคยจัดหมวดคำอธิบายเดียวกัน/ใกล้เคียงแล้วจะไม่เรียก LLM ซ้ำ)
+        ส่งเฉพาะรหัสที่ใกล้เคียงจาก ExpenseRetriever ไปใน prompt และข้าม LLM ถ้าผลค้นหาในเครื่องมั่นใจพอ
+        """
+        snap = self._snapshot
+        cached = self.expense_cache.get(description)
+        if cached is not None:
+            return self._expense_records(cached.code, snap)
+
+        lookup = self.lookup_expense(description, snap)
+        candidates = lookup.candidates
+        if lookup.local_code is not None:
+            return self._expense_records(lookup.local_code, snap)
+
+        try:
+            prompt = self.build_expense_prompt(description, lookup.expense_list_str)
+            ai_code = self.invoke_expense_llm(prompt)
+
+            # ค้นหาข้อมูลเต็มจากรหัสที่ AI เลือกมา (cache เฉพาะรหัสที่มีอยู่จริงใน CSV)
+            records = self._expense_records(ai_code, snap)
+            if records[0]["expens_name"] != UNKNOWN_EXPENSE_NAME:
+                self.expense_cache.put(description, ai_code)
+            return records
+
+        except Exception as e:
+            print(f"Error calling Bedrock LLM: {e}")
+            # Fallback ไปใช้ผลค้นหาในเครื่อง (หรือ Keyword Search แบบเดิมถ้าไม่มี candidate)
+            if candidates:
+                return [{"expens_code": c.expens_code, "expens_name": c.expens_name} for c in candidates[:5]]
+            mask = snap.expense_df["expens_name"].astype(str).str.contains(description, case=False, na=False, regex=False)
+            return snap.expense_df[mask][["expens_code", "expens_name"]].head(5).to_dict("records")
+
+    def get_expense_codes(self, descriptions: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        get_expense_code แบบหลายรายการ: คืนผล 1 รายการต่อ description ตามลำดับเดิม พร้อมจำนวนเงิน (parse_amounts)
+        รายการที่เจอใน cache/ค้นหาในเครื่องมั่นใจพอตอบเลย ที่เหลือแบ่งชุดละ EXPENSE_BATCH_SIZE
+        แล้วส่ง Bedrock พร้อมกันไม่เกิน EXPENSE_BATCH_CONCURRENCY request
         """
+        snap = self._snapshot
+        descriptions = [str(d) for d in descriptions]
+        codes: List[Optional[str]] = [None] * len(descriptions)
+
+        # description เดียวกันในชุดเดียวกันเรียก LLM ครั้งเดียว
+        pending: Dict[str, List[int]] = {}
+        candidates_by_desc: Dict[str, List[ExpenseCandidate]] = {}
+        for i, description in enumerate(descriptions):
+            cached = self.expense_cache.get(description)
+            if cached is not None:
+                codes[i] = cached.code
+                continue
+            if description not in candidates_by_desc:
+                candidates_by_desc[description] = snap.expense_retriever.top_k(description, EXPENSE_CANDIDATE_K)
+            candidates = candidates_by_desc[description]
+            if self._is_confident_match(candidates):
+                codes[i] = candidates[0].expens_code
+                continue
+            pending.setdefault(description, []).append(i)
+
+        unique_pending = list(pending)
+        chunks = [unique_pending[i : i + EXPENSE_BATCH_SIZE] for i in range(0, len(unique_pending), EXPENSE_BATCH_SIZE)]
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(EXPENSE_BATCH_CONCURRENCY, len(chunks))) as pool:
+                chunk_results = list(pool.map(lambda chunk: self._classify_chunk(chunk, candidates_by_desc, snap), chunks))
+            for chunk, chunk_codes in zip(chunks, chunk_results):
+                for description, code in zip(chunk, chunk_codes):
+                    for i in pending[description]:
+                        codes[i] = code
+
+        results = []
+        for description, code, amount in zip(descriptions, codes, self.parse_amounts(descriptions)):
+            record = self._expense_records(code, snap)[0] if code else {"expens_code": "", "expens_name": ""}
+            results.append({"description": description, "amount": amount, **record})
+        return results
+
+    def _classify_chunk(
+        self, chunk: List[str], candidates_by_desc: Dict[str, List[ExpenseCandidate]], snap: DataSnapshot
+    ) -> List[Optional[str]]:
+        """จัดหมวดหลาย description ใน Bedrock call เดียว ถ้าล้มเหลวถอยไปเรียกทีละรายการ"""
         try:
-            prompt = f"""
+            merged: Dict[str, ExpenseCandidate] = {}
+            use_full_list = False
+            for description in chunk:
+                candidates = candidates_by_desc.get(description, [])
+                if not candidates or candidates[0].score < EXPENSE_RETRIEVAL_MIN_SCORE:
+                    use_full_list = True
+                    break
+                for c in candidates:
+                    merged.setdefault(c.expens_code, c)
+            expense_list_str = (
+                snap.expense_master_list_str if use_full_list else self._candidate_list_str(list(merged.values()), snap)
+            )
+
+            raw = self.invoke_expense_llm(
+                self._build_expense_batch_prompt(chunk, expense_list_str), max_tokens=20 * len(chunk) + 50
+            )
+            chunk_codes = self._parse_code_list(raw)
+            if len(chunk_codes) != len(chunk):
+                raise ValueError(f"expected {len(chunk)} codes, got {len(chunk_codes)}")
+
+            for description, code in zip(chunk, chunk_codes):
+                if self._expense_records(code, snap)[0]["expens_name"] != UNKNOWN_EXPENSE_NAME:
+                    self.expense_cache.put(description, code)
+            return chunk_codes
+        except Exception as e:
+            print(f"Error in batch expense classification, falling back to single calls: {e}")
+            codes: List[Optional[str]] = []
+            for description in chunk:
+                records = self.get_expense_code(description)
+                codes.append(records[0]["expens_code"] if records else None)
+            return codes
+
+    def _build_expense_batch_prompt(self, descriptions: Sequence[str], expense_list_str: str) -> str:
+        numbered = "\n".join(f'{i}. "{d}"' for i, d in enumerate(descriptions, start=1))
+        return self._expense_prompt_prefix(expense_list_str) + f"""
+            คำอธิบาย ({len(descriptions)} รายการ):
+            {numbered}
+
+            ให้เลือกรหัสค่าใช้จ่ายที่เหมาะสมที่สุดของแต่ละรายการ โดยพิจารณาจากความหมายและบริบท
+
+            ตัวอย่าง:
+            - "รถไฟฟ้า" = ค่าเดินทาง (ไม่ใช่ค่าไฟฟ้า)
+            - "กิน" = ค่าอาหาร
+            - "ไฟฟ้า" = ค่าสาธารณูปโภค
+
+            ตอบเป็น JSON array ของรหัสเรียงตามลำดับรายการเท่านั้น ไม่ต้องอธิบายเพิ่มเติม เช่น ["F0036", "G0144"]:
+        """
+
+    @staticmethod
+    def _parse_code_list(raw: str) -> List[str]:
+        match = re.search(r"\[.*\]", raw, re.DOTALL)
+        if match:
+            try:
+                return [str(code).strip() for code in json.loads(match.group())]
+            except ValueError:
+                pass
+        return re.findall(r"\b[A-Z]?\d{4}\b", raw)
+
+    def lookup_expense(self, description: str, snap: Optional[DataSnapshot] = None) -> ExpenseLookup:
+        """ค้น candidate ในเครื่อง: รหัสที่ตอบได้เลย หรือรายการรหัสที่จะส่งให้ LLM (ใช้ทั้ง tool และชุด eval)"""
+        snap = snap or self._snapshot
+        candidates = snap.expense_retriever.top_k(description, EXPENSE_CANDIDATE_K)
+        local_code = candidates[0].expens_code if self._is_confident_match(candidates) else None
+        full_list = not candidates or candidates[0].score < EXPENSE_RETRIEVAL_MIN_SCORE
+        return ExpenseLookup(candidates, local_code, self._candidate_list_str(candidates, snap), full_list)
+
+    def _is_confident_match(self, candidates: List[ExpenseCandidate]) -> bool:
+        if not candidates or candidates[0].score < EXPENSE_LOCAL_ACCEPT_SCORE:
+            return False
+        runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+        return candidates[0].score - runner_up >= EXPENSE_LOCAL_ACCEPT_MARGIN
+
+    def _candidate_list_str(self, candidates: List[ExpenseCandidate], snap: DataSnapshot) -> str:
+        # ถ้าผลค้นหาในเครื่องอ่อนเกินไป (เช่นคำพ้องความหมาย) ให้ส่งรายการเต็มเหมือนเดิม
+        if not candidates or candidates[0].score < EXPENSE_RETRIEVAL_MIN_SCORE:
+            return snap.expense_master_list_str
+        # ต่อท้ายด้วยรหัสหมวดทั่วไปเสมอ: top-K อาจไม่มีคำตอบที่ถูกเมื่อคำพ้องรูปชนะ (รถไฟฟ้า vs ค่าไฟฟ้า)
+        merged = {c.expens_code: c for c in [*candidates, *snap.expense_retriever.general]}
+        return "\n".join(f"{c.expens_code} - {c.expens_name}" for c in merged.values())
+
+    @staticmethod
+    def _expense_prompt_prefix(expense_list_str: str) -> str:
+        # ส่วนต้นที่ prompt เดี่ยวและ batch ใช้ร่วมกัน (เมื่อเป็นรายการเต็มจะถูก cache ฝั่ง Bedrock)
+        return f"""
             คุณเป็นผู้เชี่ยวชาญด้านการจัดหมวดหมู่ค่าใช้จ่าย
 
             รายการค่าใช้จ่ายที่มี:
-            {self.expense_master_list_str}
+            {expense_list_str}
+"""
 
+    def build_expense_prompt(self, description: str, expense_list_str: Optional[str] = None) -> str:
+        """prompt จัดหมวดคำอธิบายเดียว (ไม่ส่ง expense_list_str = ใช้รายการรหัสเต็ม)"""
+        if expense_list_str is None:
+            expense_list_str = self._snapshot.expense_master_list_str
+        return self._expense_prompt_prefix(expense_list_str) + f"""
             คำอธิบาย: "{description}"
 
             ให้เลือกรหัสค่าใช้จ่ายที่เหมาะสมที่สุด โดยพิจารณาจากความหมายและบริบท
@@ -134,32 +614,28 @@ class DataRepository:
 
             ตอบเฉพาะรหัส 5 ตัวเท่านั้นไม่ต้องอธิบายเพิ่มเติม เช่น F0036 หรือ G0144:
         """
-            # เรียก Bedrock API
-            response = self.bedrock.invoke_model(
-                modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-                body=json.dumps({
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 50,
-                    "temperature": 0.0,
-                    "anthropic_version": "bedrock-2023-05-31"
-                })
-            )
-            
-            # แกะ Response
-            response_body = json.loads(response['body'].read())
-            ai_code = response_body['content'][0]['text'].strip()
-            
-            # ค้นหาข้อมูลเต็มจากรหัสที่ AI เลือกมา
-            matched_row = self.expense_df[self.expense_df['expens_code'] == ai_code]
-            
-            if not matched_row.empty:
-                return matched_row[['expens_code', 'expens_name']].to_dict('records')
-            else:
-                # กรณี AI ตอบมาแต่รหัสหาไม่เจอใน CSV (Rare case)
-                return [{"expens_code": ai_code, "expens_name": "AI Selected Code (Not in CSV List)"}]
 
-        except Exception as e:
-            print(f"Error calling Bedrock LLM: {e}")
-            # Fallback ไปใช้วิธีเดิม (Keyword Search) ถ้า LLM มีปัญหา
-            mask = self.expense_df["expens_name"].astype(str).str.contains(description, case=False, na=False)
-            return self.expense_df[mask][["expens_code", "expens_name"]].head(5).to_dict("records")
\ No newline at end of file
+    def invoke_expense_llm(self, prompt: str, max_tokens: int = 50) -> str:
+        # เรียก Bedrock API (prompt ที่ใช้รายการรหัสเต็มจะ mark ส่วนต้นให้ cache)
+        response = self.bedrock.invoke_model(
+            modelId=EXPENSE_MODEL_ID,
+            body=get_gateway().anthropic_body(
+                prompt,
+                max_tokens=max_tokens,
+                cached_prefix=self._expense_prompt_prefix(self._snapshot.expense_master_list_str),
+            ),
+        )
+
+        # แกะ Response
+        response_body = json.loads(response['body'].read())
+        return response_body['content'][0]['text'].strip()
+
+    def _expense_records(self, code: str, snap: DataSnapshot) -> List[Dict[str, str]]:
+        matched_row = snap.expense_df[snap.expense_df['expens_code'] == code]
+        if not matched_row.empty:
+            return matched_row[['expens_code', 'expens_name']].to_dict('records')
+        # กรณี AI ตอบมาแต่รหัสหาไม่เจอใน CSV (Rare case)
+        return [{"expens_code": code, "expens_name": UNKNOWN_EXPENSE_NAME}]
+
+    def get_expense_cache_stats(self) -> Dict[str, Any]:
+        return self.expense_cache.stats()
\ No newline at end of file
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from app.config import CSV_ENGINE
+
+
+@dataclass(frozen=True)
+class ReportSchema:
+    """
+    ชนิดข้อมูลของคอลัมน์ในแต่ละไฟล์ (คอลัมน์ที่ไม่ได้ระบุยังเป็น string เหมือนเดิม)
+    - numeric: แปลงเป็นตัวเลข (ตัด comma, ค่าว่าง = 0) และย่อเป็น int ขนาดเล็กสุดถ้าเป็นจำนวนเต็มทั้งคอลัมน์
+    - category: ค่าซ้ำเยอะ เช่น รหัสคลัง/หน่วย เก็บเป็น category (ค่าที่เป็นรหัส เช่น "001" ยังเป็น string)
+    - datetime: แปลงเป็น datetime64 (ค่าที่ parse ไม่ได้ = NaT)
+    - auto_category: คอลัมน์ string อื่นที่จำนวนค่าไม่ซ้ำ <= สัดส่วนนี้ของจำนวนแถว ก็เก็บเป็น category (0 = ปิด)
+    """
+
+    numeric: Tuple[str, ...] = ()
+    category: Tuple[str, ...] = ()
+    datetime: Tuple[str, ...] = ()
+    auto_category: float = 0.0
+    # คอลัมน์ที่ต้องมีเสมอ: reload ได้ไฟล์ที่ไม่มีคอลัมน์เหล่านี้ (หรือไม่มีแถว) ถือว่าไฟล์เสีย ใช้ข้อมูลเดิมต่อ
+    required: Tuple[str, ...] = ()
+
+
+AGING_SCHEMA = ReportSchema(
+    numeric=("diff_day", "qtybal", "qtyin", "qtyout"),
+    category=("whcode", "GSI_Whcode", "unitname", "maincode", "pre_event2", "GSI_PreEvent2", "c_des1", "c_des2"),
+    datetime=("first_recdate",),
+    auto_category=0.5,
+    required=("whcode", "c_des1", "diff_day", "qtybal"),
+)
+
+COST_SCHEMA = ReportSchema(
+    numeric=(
+        "BOQ",
+        "BG Overhead",
+        "BG Material",
+        "BG Labour",
+        "BG Subc.",
+        "Total Budget",
+        "AC Overhead",
+        "AC Material",
+        "AC Labour",
+        "AC Subc.",
+        "Total Actual",
+        "BG Balance",
+        "PG Submit",
+        "PG Certificate",
+        "PG Submit Bal",
+    ),
+    category=("G-Code",),
+    required=("G-Code",),
+)
+
+PPN_SCHEMA = ReportSchema(
+    numeric=("required_qty",),
+    category=("unit", "task_name", "c_des1", "c_des2"),
+    datetime=("start_date",),
+    auto_category=0.5,
+    required=("c_des1", "required_qty"),
+)
+
+# รหัสค่าใช้จ่ายไม่ซ้ำกันและต้องคงเลข 0 นำหน้า -> เป็น string ทั้งหมด
+EXPENSE_SCHEMA = ReportSchema(required=("expens_code", "expens_name"))
+
+
+def resolve_engine(engine: str = CSV_ENGINE) -> str:
+    """``auto`` = ใช้ pyarrow ถ้าติดตั้งไว้ (parse เร็วกว่าและใช้หน่วยความจำน้อยกว่า) ไม่งั้นใช้ C parser"""
+    if engine == "auto":
+        return "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+    return engine
+
+
+def load_frame(path: Path, schema: ReportSchema, engine: str = CSV_ENGINE, **kwargs: Any) -> pd.DataFrame:
+    """Read a CSV as strings, then apply the schema's numeric/category/datetime conversions."""
+    engine = resolve_engine(engine)
+    try:
+        df = pd.read_csv(path, dtype=str, engine=engine, **kwargs)
+    except ValueError:
+        if engine == "c":
+            raise
+        # option บางตัวไม่รองรับใน pyarrow engine -> กลับไปใช้ C parser
+        df = pd.read_csv(path, dtype=str, **kwargs)
+    return apply_schema(df, schema)
+
+
+def apply_schema(df: pd.DataFrame, schema: ReportSchema) -> pd.DataFrame:
+    df = df.fillna("")
+    for column in schema.numeric:
+        if column in df.columns:
+            values = pd.to_numeric(df[column].str.replace(",", "", regex=False), errors="coerce").fillna(0)
+            if (values % 1 == 0).all():
+                values = pd.to_numeric(values.astype("int64"), downcast="integer")
+            df[column] = values
+    for column in schema.datetime:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors="coerce", format="ISO8601")
+    category = set(schema.category)
+    if schema.auto_category and len(df):
+        converted = set(schema.numeric) | set(schema.datetime)
+        for column in df.columns:
+            if column not in converted and df[column].nunique() <= schema.auto_category * len(df):
+                category.add(column)
+    for column in category:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """``to_dict("records")`` ที่ส่งผ่าน JSON ได้: datetime -> "YYYY-MM-DD" (NaT -> ""), category -> string"""
+    datetime_columns = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    if datetime_columns:
+        df = df.copy()
+        for column in datetime_columns:
+            df[column] = df[column].dt.strftime("%Y-%m-%d").fillna("")
+    return df.to_dict("records")
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.config import REPORT_QUERY_MAX_LIMIT
+
+# normalize/n-gram อยู่ใน app.data.text (ไม่ต้อง import pandas) -> router/expense cache ใช้ได้โดยไม่โหลด pandas
+from app.data.text import char_ngrams, normalize_text
+
+# คะแนนการจับคู่ต่อคอลัมน์: ตรงทั้งค่า > ขึ้นต้นด้วยคำค้น/ตรงกับคำ > พบเป็นส่วนหนึ่งของข้อความ
+SCORE_EXACT = 3.0
+SCORE_PREFIX = 2.0
+SCORE_SUBSTRING = 1.0
+
+
+@dataclass
+class SearchResult:
+    total: int
+    row_ids: np.ndarray
+    scores: np.ndarray
+
+
+class _ColumnIndex:
+    """
+    Postings ของหนึ่งคอลัมน์: เก็บค่าที่ไม่ซ้ำ (dictionary encoding) + n-gram -> value ids
+    และ value id -> row ids เพื่อให้ค้นหาบนค่าที่ไม่ซ้ำแทนการสแกนทุกแถว
+    """
+
+    def __init__(self, values: pd.Series) -> None:
+        codes, uniques = pd.factorize(values.astype(str), sort=False)
+        self.values: List[str] = [normalize_text(v) for v in uniques]
+
+        # value id -> row ids (เรียงตามลำดับแถวเดิม)
+        self._row_order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(self.values))
+        self._row_starts = np.concatenate(([0], np.cumsum(counts)))
+
+        grams: Dict[str, List[int]] = {}
+        for value_id, value in enumerate(self.values):
+            for gram in char_ngrams(value):
+                grams.setdefault(gram, []).append(value_id)
+        self._grams = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in grams.items()}
+
+    def rows_for(self, value_id: int) -> np.ndarray:
+        return self._row_order[self._row_starts[value_id] : self._row_starts[value_id + 1]]
+
+    def match(self, query: str) -> List[int]:
+        """Return value ids whose text contains ``query`` (already normalized)."""
+        grams = char_ngrams(query)
+        if not grams:
+            # คำค้นสั้นกว่า n-gram: สแกนเฉพาะค่าที่ไม่ซ้ำ (เล็กกว่าจำนวนแถวมาก)
+            return [i for i, value in enumerate(self.values) if query in value]
+
+        postings = []
+        for gram in grams:
+            ids = self._grams.get(gram)
+            if ids is None:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if not len(candidates):
+                return []
+        # n-gram ครบไม่ได้แปลว่าเป็น substring เสมอ จึงตรวจซ้ำเฉพาะ candidate
+        return [int(i) for i in candidates if query in self.values[i]]
+
+    def score(self, value_id: int, query: str) -> float:
+        value = self.values[value_id]
+        if value == query:
+            return SCORE_EXACT
+        if value.startswith(query) or f" {query}" in value:
+            return SCORE_PREFIX
+        return SCORE_SUBSTRING
+
+
+class PlanSearchIndex:
+    """
+    Inverted n-gram index over a DataFrame, built once at load time.
+    Queries are literal, case-insensitive substring matches ranked by column match quality.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> None:
+        self.size = len(df)
+        self.columns: Dict[str, _ColumnIndex] = {
+            col: _ColumnIndex(df[col]) for col in (columns or df.columns)
+        }
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> SearchResult:
+        if offset < 0:
+            raise ValueError(f"offset must be >= 0, got {offset}")
+        # limit มาจาก LLM ได้ -> จำกัดเพดานเท่ากับ query_report
+        limit = max(1, min(int(limit), REPORT_QUERY_MAX_LIMIT))
+        q = normalize_text(query or "")
+        if not q or not self.size:
+            return SearchResult(0, np.empty(0, dtype=np.intp), np.empty(0))
+
+        hit_rows: List[np.ndarray] = []
+        hit_scores: List[np.ndarray] = []
+        for column in self.columns.values():
+            for value_id in column.match(q):
+                rows = column.rows_for(value_id)
+                hit_rows.append(rows)
+                hit_scores.append(np.full(len(rows), column.score(value_id, q)))
+
+        if not hit_rows:
+            return SearchResult(0, np.empty(0, dtype=np.intp), np.empty(0))
+
+        # รวมคะแนนของแต่ละแถวจากทุกคอลัมน์ที่ match
+        rows, inverse = np.unique(np.concatenate(hit_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+
+        # เรียงคะแนนมาก -> น้อย, ถ้าเท่ากันให้คงลำดับแถวเดิม
+        order = np.lexsort((rows, -scores))
+        page = order[offset : offset + limit]
+        return SearchResult(total=len(rows), row_ids=rows[page], scores=scores[page])
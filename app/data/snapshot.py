@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from app.data.aggregates import AgingBucketView, CostTotalsView, MaterialUsageView
+    from app.data.expense_retriever import ExpenseRetriever
+    from app.data.search_index import PlanSearchIndex
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """ค่าที่คำนวณครั้งแรกที่ถูกใช้ หลาย thread ขอพร้อมกันคำนวณครั้งเดียว (ถ้า factory error ครั้งถัดไปลองใหม่)"""
+
+    __slots__ = ("_factory", "_value", "_loaded", "_lock")
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory: Optional[Callable[[], T]] = factory
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def ready(cls, value: T) -> "Lazy[T]":
+        lazy = cls(lambda: value)
+        lazy.get()
+        return lazy
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+                    self._factory = None
+        return self._value
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """
+    ข้อมูลทั้งหมดที่ tool ใช้ ณ เวลาหนึ่ง (DataFrame + index/ข้อมูลที่คำนวณไว้ล่วงหน้า)
+    ไม่แก้ไขหลังสร้าง: reload จะสร้าง snapshot ใหม่แล้วสลับ reference ทีเดียว
+    tool ที่กำลังทำงานอยู่ถือ snapshot เดิมไว้จนจบ จึงไม่เห็นข้อมูลครึ่งเก่าครึ่งใหม่
+    แต่ละชุดข้อมูล (และ view ที่คำนวณจากชุดนั้น) โหลดตอนถูกใช้ครั้งแรก ไม่ใช่ตอนสร้าง snapshot
+    """
+
+    version: int
+    # ชื่อชุดข้อมูล (aging/cost/expense/ppn) -> DataFrame
+    frame_cells: Dict[str, Lazy[pd.DataFrame]]
+    # ชื่อ view (plan_index, material_usage, ...) -> ค่าที่คำนวณจาก frame ของชุดนั้น
+    view_cells: Dict[str, Lazy[Any]]
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def aging_df(self) -> pd.DataFrame:
+        return self.frame_cells["aging"].get()
+
+    @property
+    def cost_df(self) -> pd.DataFrame:
+        return self.frame_cells["cost"].get()
+
+    @property
+    def expense_df(self) -> pd.DataFrame:
+        return self.frame_cells["expense"].get()
+
+    @property
+    def ppn_df(self) -> pd.DataFrame:
+        return self.frame_cells["ppn"].get()
+
+    @property
+    def plan_index(self) -> PlanSearchIndex:
+        return self.view_cells["plan_index"].get()
+
+    @property
+    def expense_master_list_str(self) -> str:
+        return self.view_cells["expense_master_list_str"].get()
+
+    @property
+    def expense_retriever(self) -> ExpenseRetriever:
+        return self.view_cells["expense_retriever"].get()
+
+    # materialized view: ยอดสรุปที่คำนวณครั้งเดียวต่อเวอร์ชันของไฟล์ (คำนวณใหม่เฉพาะ view ของไฟล์ที่เปลี่ยน)
+    @property
+    def material_usage(self) -> MaterialUsageView:
+        return self.view_cells["material_usage"].get()
+
+    @property
+    def aging_buckets(self) -> AgingBucketView:
+        return self.view_cells["aging_buckets"].get()
+
+    @property
+    def cost_totals(self) -> CostTotalsView:
+        return self.view_cells["cost_totals"].get()
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        """DataFrame ทุกชุด (โหลดชุดที่ยังไม่ได้โหลด)"""
+        return {name: cell.get() for name, cell in self.frame_cells.items()}
+
+    def loaded(self) -> Dict[str, bool]:
+        return {name: cell.loaded for name, cell in self.frame_cells.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        # ไม่บังคับโหลด: ชุดที่ยังไม่ถูกใช้รายงานจำนวนแถวเป็น None
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": {name: len(cell.get()) if cell.loaded else None for name, cell in self.frame_cells.items()},
+            "loaded": sorted(name for name, cell in self.frame_cells.items() if cell.loaded),
+        }
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import unicodedata
+
+# ขนาด n-gram ของตัวอักษร (ภาษาไทยไม่มีการเว้นวรรคระหว่างคำ จึงใช้ n-gram แทนการตัดคำ)
+NGRAM_SIZE = 3
+
+
+def normalize_text(value: str) -> str:
+    """Normalize text for case-insensitive matching (Thai-safe: NFC + casefold)."""
+    return unicodedata.normalize("NFC", value).casefold().strip()
+
+
+def char_ngrams(text: str, size: int = NGRAM_SIZE) -> set[str]:
+    if len(text) < size:
+        return set()
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
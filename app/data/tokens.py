@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    ประมาณจำนวน token แบบไม่ต้องใช้ tokenizer จริง
+    ASCII ~4 ตัวอักษร/token, ภาษาไทยและอักษรอื่น ~1.5 ตัวอักษร/token
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    other_chars = len(text) - ascii_chars
+    return int(ascii_chars / 4 + other_chars / 1.5) + 1
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+StatKey = Optional[Tuple[int, int]]
+OnChange = Callable[[Set[str]], None]
+
+
+def _stat_key(path: Path) -> StatKey:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class SourceWatcher:
+    """
+    Poll ไฟล์ข้อมูลต้นทาง (ไม่ต้องพึ่ง inotify/watchdog) แล้วเรียก ``on_change(names)`` เมื่อไฟล์เปลี่ยน
+    - ไฟล์ต้อง "นิ่ง" (mtime/size เท่าเดิม) ติดกัน ``settle_polls`` รอบก่อน เพื่อไม่อ่านไฟล์ที่ export ยังเขียนไม่เสร็จ
+    - ไฟล์ที่เปลี่ยนในรอบเดียวกันถูกรวมเป็น callback เดียว
+    - ``on_change`` รันบน thread ของ watcher (ทีละครั้ง) ถ้า error จะลองใหม่ในรอบถัดไป
+    """
+
+    def __init__(
+        self,
+        paths: Dict[str, Path],
+        on_change: OnChange,
+        interval: float = 5.0,
+        settle_polls: int = 1,
+    ) -> None:
+        self.paths = {name: Path(path) for name, path in paths.items()}
+        self.on_change = on_change
+        self.interval = interval
+        self.settle_polls = settle_polls
+        self._seen: Dict[str, StatKey] = {name: _stat_key(path) for name, path in self.paths.items()}
+        # ไฟล์ที่เปลี่ยนแล้วแต่ยังไม่นิ่ง: name -> (stat ล่าสุด, จำนวนรอบที่นิ่ง)
+        self._pending: Dict[str, Tuple[StatKey, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> "SourceWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="data-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def poll(self) -> Dict[str, StatKey]:
+        """
+        ตรวจไฟล์ 1 รอบ คืนไฟล์ที่เปลี่ยนและนิ่งแล้ว: name -> stat ที่นิ่ง (เรียกตรง ๆ ได้โดยไม่ต้อง start thread)
+        ผู้เรียก commit stat นี้หลัง reload สำเร็จ ไม่ stat ใหม่ (ไฟล์ที่ถูกเขียนทับระหว่าง reload จะถูกเห็นรอบหน้า)
+        """
+        ready: Dict[str, StatKey] = {}
+        for name, path in self.paths.items():
+            current = _stat_key(path)
+            if name in self._pending:
+                previous, stable = self._pending[name]
+                stable = stable + 1 if current == previous else 0
+                if stable >= self.settle_polls:
+                    ready[name] = current
+                else:
+                    self._pending[name] = (current, stable)
+            elif current != self._seen.get(name):
+                if self.settle_polls <= 0:
+                    ready[name] = current
+                else:
+                    self._pending[name] = (current, 0)
+        return ready
+
+    def _commit(self, keys: Dict[str, StatKey]) -> None:
+        for name, key in keys.items():
+            self._pending.pop(name, None)
+            self._seen[name] = key
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            changed = self.poll()
+            if not changed:
+                continue
+            try:
+                self.on_change(set(changed))
+                self._commit(changed)
+                self.last_error = None
+            except Exception as e:
+                # เก็บไว้ใน pending ต่อ -> ลองใหม่รอบหน้า
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Warning: Reloading {sorted(changed)} failed: {e}")
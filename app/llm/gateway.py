@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.config import (
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_DECREASE_FACTOR,
+    LLM_ENDPOINT_URL,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MIN_CONCURRENCY,
+    LLM_PROMPT_CACHE,
+    LLM_READ_TIMEOUT_SECONDS,
+)
+
+if TYPE_CHECKING:
+    from botocore.config import Config
+    from strands.models import BedrockModel
+
+# error ที่แปลว่า Bedrock รับงานไม่ไหว (ชื่อ code ของ converse_stream ขึ้นต้นด้วยตัวเล็ก)
+THROTTLE_CODES = frozenset(
+    {"throttlingexception", "toomanyrequestsexception", "serviceunavailableexception", "modelnotreadyexception"}
+)
+# method ของ bedrock-runtime ที่ต้องผ่าน limiter (ที่เหลือ เช่น count_tokens / meta ส่งต่อตรง ๆ)
+GATED_METHODS = frozenset({"converse", "converse_stream", "invoke_model", "invoke_model_with_response_stream"})
+
+
+def is_throttle(error: BaseException) -> bool:
+    if not isinstance(error, ClientError):
+        return False
+    return str(error.response.get("Error", {}).get("Code", "")).lower() in THROTTLE_CODES
+
+
+class AdaptiveLimiter:
+    """
+    จำกัดจำนวน request ที่ค้างอยู่กับ Bedrock แบบ AIMD
+    สำเร็จตอนใช้ slot เต็ม -> limit += 1/limit (เพิ่มราว 1 ต่อหนึ่งรอบของ limit), โดน throttle -> limit *= decrease_factor
+    throttle หลายตัวจาก request ชุดเดียวกัน (เริ่มก่อนการลดครั้งล่าสุด) ลดได้ครั้งเดียว
+    """
+
+    def __init__(
+        self,
+        initial: float = LLM_INITIAL_CONCURRENCY,
+        min_limit: int = LLM_MIN_CONCURRENCY,
+        max_limit: int = LLM_MAX_CONCURRENCY,
+        decrease_factor: float = LLM_DECREASE_FACTOR,
+        window: int = 1024,
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._epoch = 0
+        self._waits: deque = deque(maxlen=window)
+        self.acquired = 0
+        self.throttles = 0
+        self.decreases = 0
+
+    def acquire(self) -> int:
+        """รอจนมี slot ว่าง คืน epoch ไว้ส่งกลับตอน release"""
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self.limit):
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+            self.acquired += 1
+            self._waits.append(time.perf_counter() - start)
+            return self._epoch
+
+    def release(self, epoch: int, throttled: Optional[bool]) -> None:
+        """throttled: True = โดน throttle, False = สำเร็จ, None = error อื่น (ไม่ปรับ limit)"""
+        with self._cond:
+            saturated = self._in_flight >= int(self.limit)
+            self._in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                if epoch == self._epoch:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                    self._epoch += 1
+                    self.decreases += 1
+            elif throttled is False and saturated:
+                # เพิ่มเฉพาะตอนใช้ slot เต็ม ไม่งั้น limit จะโตไปเรื่อย ๆ ตอนงานน้อย
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = sorted(self._waits)
+            in_flight, waiting, limit = self._in_flight, self._waiting, self.limit
+
+        def pct(q: float) -> float:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 2) if waits else 0.0
+
+        return {
+            "limit": round(limit, 2),
+            "in_flight": in_flight,
+            "waiting": waiting,
+            "acquired": self.acquired,
+            "throttles": self.throttles,
+            "decreases": self.decreases,
+            "queue_wait_ms": {
+                "mean": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
+
+
+class _GatedStream:
+    """ถือ slot ของ limiter ไว้จนกว่า event stream จะอ่านจบ/ถูก close (throttle กลาง stream ลด limit แล้วโยนต่อ)"""
+
+    def __init__(self, stream: Any, release: Callable[[Optional[bool]], None]) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def _done(self, throttled: Optional[bool]) -> None:
+        if not self._released:
+            self._released = True
+            self._release(throttled)
+
+    def __iter__(self) -> Iterator[Any]:
+        outcome: Optional[bool] = None
+        try:
+            for event in self._stream:
+                yield event
+            outcome = False
+        except ClientError as e:
+            outcome = True if is_throttle(e) else None
+            raise
+        finally:
+            self._done(outcome)
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._done(None)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def __del__(self) -> None:
+        self._done(None)
+
+
+class GatedClient:
+    """
+    ห่อ boto3 ``bedrock-runtime`` client: ทุก call ของ ``GATED_METHODS`` รอ slot จาก limiter
+    ถ้าโดน throttle คืน slot แล้ว retry แบบ exponential backoff + full jitter (นอน*นอก* slot)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        limiter: AdaptiveLimiter,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._client = client
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name in GATED_METHODS:
+            return lambda **kwargs: self._call(attr, kwargs)
+        return attr
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _call(self, method: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+        self._count("calls")
+        attempt = 0
+        while True:
+            epoch = self.limiter.acquire()
+            try:
+                response = method(**kwargs)
+            except ClientError as e:
+                throttled = is_throttle(e)
+                self.limiter.release(epoch, True if throttled else None)
+                if not throttled or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                self._sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.limiter.release(epoch, None)
+                self._count("failures")
+                raise
+
+            stream = response.get("stream") if isinstance(response, dict) else None
+            if stream is None:
+                self.limiter.release(epoch, False)
+                return response
+            return {**response, "stream": _GatedStream(stream, lambda throttled: self.limiter.release(epoch, throttled))}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "retries": self.retries, "failures": self.failures, **self.limiter.stats()}
+
+
+def anthropic_body(
+    prompt: str,
+    max_tokens: int,
+    cached_prefix: Optional[str] = None,
+    temperature: float = 0.0,
+    prompt_cache: bool = True,
+) -> str:
+    """
+    body ของ invoke_model (Anthropic Messages) ถ้า prompt ขึ้นต้นด้วย ``cached_prefix`` (ส่วนคงที่ เช่นรายการรหัสเต็ม)
+    แยกเป็น content block ที่มี cache_control ให้ Bedrock cache ส่วนนั้นไว้ ข้อความรวมที่โมเดลเห็นยังเหมือนเดิม
+    ``prompt_cache=False`` ส่ง prompt เป็นข้อความเดียว (ใช้ ``LLMGateway.anthropic_body`` เพื่อให้ตามค่าของ gateway)
+    """
+    if prompt_cache and cached_prefix and prompt.startswith(cached_prefix) and len(prompt) > len(cached_prefix):
+        content: Any = [
+            {"type": "text", "text": cached_prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt[len(cached_prefix):]},
+        ]
+    else:
+        content = prompt
+    return json.dumps({
+        "messages": [{"role": "user", "content": content}],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "anthropic_version": "bedrock-2023-05-31",
+    })
+
+
+class LLMGateway:
+    """
+    ทางเดียวที่ process ใช้เรียก Bedrock: client หนึ่งตัว (+ connection pool และ limiter ของตัวเอง) ต่อ region/endpoint
+    ใช้ร่วมกันทั้ง BedrockModel ของ agent และการจัดหมวดค่าใช้จ่ายของ DataRepository
+    ``endpoint_url`` ชี้ไป fake endpoint ในเครื่องได้ (ดู benchmarks/fake_bedrock.py)
+    """
+
+    def __init__(
+        self,
+        endpoint_url: Optional[str] = LLM_ENDPOINT_URL,
+        limiter_factory: Callable[[], AdaptiveLimiter] = AdaptiveLimiter,
+        max_retries: int = LLM_MAX_RETRIES,
+        prompt_cache: bool = LLM_PROMPT_CACHE,
+    ) -> None:
+        self.endpoint_url = endpoint_url or None
+        self.limiter_factory = limiter_factory
+        self.max_retries = max_retries
+        self.prompt_cache = prompt_cache
+        self._clients: Dict[Tuple[str, Optional[str]], GatedClient] = {}
+        self._lock = threading.Lock()
+
+    def anthropic_body(
+        self, prompt: str, max_tokens: int, cached_prefix: Optional[str] = None, temperature: float = 0.0
+    ) -> str:
+        return anthropic_body(prompt, max_tokens, cached_prefix, temperature, prompt_cache=self.prompt_cache)
+
+    @staticmethod
+    def client_config() -> Config:
+        from botocore.config import Config
+
+        # retry ของ botocore ปิดไว้ ให้ GatedClient retry เอง (ไม่งั้น retry ซ้อนกันและ limiter ไม่เห็น throttle)
+        return Config(
+            retries={"total_max_attempts": 1, "mode": "standard"},
+            max_pool_connections=LLM_MAX_CONCURRENCY,
+            read_timeout=LLM_READ_TIMEOUT_SECONDS,
+            user_agent_extra="strands-agents",
+        )
+
+    def client(self, region_name: str) -> GatedClient:
+        key = (region_name, self.endpoint_url)
+        with self._lock:
+            gated = self._clients.get(key)
+            if gated is None:
+                # boto3 import ช้า (~200 ms) จึง import ตอนสร้าง client ตัวแรก
+                import boto3
+
+                raw = boto3.client(
+                    "bedrock-runtime",
+                    region_name=region_name,
+                    endpoint_url=self.endpoint_url,
+                    config=self.client_config(),
+                )
+                gated = GatedClient(raw, self.limiter_factory(), max_retries=self.max_retries)
+                self._clients[key] = gated
+            return gated
+
+    def bedrock_model(self, model_id: str, region_name: str, **model_config: Any) -> BedrockModel:
+        """BedrockModel ของ Strands ที่ใช้ client กลาง + cache point อัตโนมัติที่ system prompt/tool spec"""
+        from strands.models import BedrockModel
+        from strands.models.model import CacheConfig
+
+        if self.prompt_cache:
+            model_config.setdefault("cache_config", CacheConfig(strategy="auto", tools_ttl=True))
+        model = BedrockModel(
+            model_id=model_id,
+            region_name=region_name,
+            endpoint_url=self.endpoint_url,
+            boto_client_config=self.client_config(),
+            **model_config,
+        )
+        model.client = self.client(region_name)
+        return model
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = dict(self._clients)
+        return {
+            "endpoint_url": self.endpoint_url,
+            "prompt_cache": self.prompt_cache,
+            "clients": {region: gated.stats() for (region, _), gated in clients.items()},
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Gateway ตัวเดียวทั้ง process"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
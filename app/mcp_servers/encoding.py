@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence
+
+from app.data.tokens import estimate_tokens
+
+ResultFormat = Literal["records", "columnar", "csv"]
+
+# คอลัมน์ composite key ที่ซ้ำกับคอลัมน์อื่นในแถวเดียวกัน (เช่น "MG5#2021004#I-2021004-00067#39#1#P2000...")
+# ยาวและไม่มีประโยชน์กับ LLM -> ตัดทิ้งถ้าผู้เรียกไม่ได้ขอคอลัมน์นั้นเอง
+DEFAULT_DROP_PATTERN = r"^(pk_|sort_key_|GSI_)"
+
+_ELLIPSIS = "…"
+TRIMMED_NOTE = "Result trimmed to fit the token budget; narrow the query or request fewer columns."
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _truncate(value: Any, max_text: int) -> Any:
+    if max_text and isinstance(value, str) and len(value) > max_text:
+        return value[: max_text - 1] + _ELLIPSIS
+    return value
+
+
+def encode_rows(
+    rows: Sequence[Dict[str, Any]],
+    fmt: ResultFormat = "columnar",
+    max_tokens: Optional[int] = None,
+    max_text: int = 0,
+    drop_pattern: Optional[str] = DEFAULT_DROP_PATTERN,
+    keep: Iterable[str] = (),
+) -> Dict[str, Any] | List[Dict[str, Any]]:
+    """
+    แปลงผล ``to_dict("records")`` ให้กิน token น้อยลงก่อนส่งให้ LLM
+    - ``columnar``: ชื่อคอลัมน์ครั้งเดียว + แถวเป็น list ของค่า, คอลัมน์ที่ค่าเหมือนกันทุกแถวย้ายไป ``constants``
+    - ``csv``: ชื่อคอลัมน์ + แถวเป็นข้อความ CSV ก้อนเดียว
+    - ``records``: รูปแบบเดิม (list ของ dict) แต่ยังตัดคอลัมน์/ข้อความยาวและคุม token ได้
+    ``max_tokens`` ตัดแถวท้าย ๆ ออกจนขนาดโดยประมาณไม่เกินงบ แล้วบอกจำนวนแถวที่ถูกตัดใน ``omitted_rows``
+    """
+    keep = set(keep)
+    columns: List[str] = list(rows[0].keys()) if rows else []
+    if drop_pattern:
+        pattern = re.compile(drop_pattern)
+        dropped = [c for c in columns if pattern.search(c) and c not in keep]
+        columns = [c for c in columns if c not in dropped]
+    else:
+        dropped = []
+
+    matrix = [[_truncate(row.get(c), max_text) for c in columns] for row in rows]
+
+    constants: Dict[str, Any] = {}
+    if fmt != "records" and len(matrix) > 1:
+        for i, column in enumerate(columns):
+            first = matrix[0][i]
+            if all(values[i] == first for values in matrix):
+                constants[column] = first
+        if constants:
+            positions = [i for i, c in enumerate(columns) if c not in constants]
+            columns = [columns[i] for i in positions]
+            matrix = [[values[i] for i in positions] for values in matrix]
+
+    if fmt == "csv":
+        lines = [_csv_line(values) for values in matrix]
+    elif fmt == "records":
+        lines = [dict(zip(columns, values)) for values in matrix]
+    else:
+        lines = matrix
+
+    kept = len(lines)
+    if max_tokens:
+        # ส่วนหัว (ชื่อคอลัมน์/ค่าคงที่/หมายเหตุ) + แถวทีละแถวจนเต็มงบ; อย่างน้อยคืน 1 แถวเสมอ
+        header = {
+            "format": fmt,
+            "row_count": len(lines),
+            "columns": columns,
+            "constants": constants,
+            "dropped_columns": dropped,
+            "omitted_rows": len(lines),
+            "note": TRIMMED_NOTE,
+        }
+        budget = max_tokens - estimate_tokens(_dumps(header))
+        used = 0
+        for i, line in enumerate(lines):
+            used += estimate_tokens(line if isinstance(line, str) else _dumps(line))
+            if used > budget and i > 0:
+                kept = i
+                break
+    omitted = len(lines) - kept
+    lines = lines[:kept]
+
+    if fmt == "records" and not omitted:
+        return lines
+    result: Dict[str, Any] = {"format": fmt, "row_count": kept}
+    if fmt == "csv":
+        result["columns"] = columns
+        result["csv"] = "\n".join(lines)
+    elif fmt == "records":
+        result["rows"] = lines
+    else:
+        result["columns"] = columns
+        result["rows"] = lines
+    if constants:
+        result["constants"] = constants
+    if dropped:
+        result["dropped_columns"] = dropped
+    if omitted:
+        result["omitted_rows"] = omitted
+        result["note"] = TRIMMED_NOTE
+    return result
+
+
+def _csv_line(values: Sequence[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(["" if v is None else v for v in values])
+    return buffer.getvalue()
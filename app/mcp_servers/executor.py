@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Literal, Optional, TypeVar
+
+T = TypeVar("T")
+PoolKind = Literal["cpu", "io"]
+
+# เวลาของ MCP request ปัจจุบัน (ตั้งโดย TracingMiddleware) ให้ executor บวกเวลารอคิว/เวลาทำงานเข้าไป
+call_timing: ContextVar[Optional[Dict[str, float]]] = ContextVar("call_timing", default=None)
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    queued: int = 0
+    in_flight: int = 0
+    max_queued: int = 0
+    total_wait_ms: float = 0.0
+    total_run_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = max(self.calls - self.queued - self.in_flight, 1)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "max_queued": self.max_queued,
+            "avg_wait_ms": round(self.total_wait_ms / done, 2),
+            "avg_run_ms": round(self.total_run_ms / done, 2),
+        }
+
+
+class ToolExecutor:
+    """
+    รัน tool ที่เป็น sync function นอก event loop ของ FastMCP
+    - งาน pandas (CPU) ใช้ worker pool ขนาดจำกัด, งานเรียก Bedrock (I/O) ใช้อีก pool หนึ่ง
+    - จำกัดจำนวน call พร้อมกันต่อ tool และเก็บ metric ความยาวคิว/เวลารอ
+    """
+
+    def __init__(
+        self,
+        cpu_workers: int,
+        io_workers: int,
+        limits: Optional[Dict[str, int]] = None,
+        default_limit: int = 8,
+    ) -> None:
+        self._pools: Dict[PoolKind, ThreadPoolExecutor] = {
+            "cpu": ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="mcp-cpu"),
+            "io": ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="mcp-io"),
+        }
+        self._pool_sizes = {"cpu": cpu_workers, "io": io_workers}
+        self._pool_pending: Dict[PoolKind, int] = {"cpu": 0, "io": 0}
+        self._limits = dict(limits or {})
+        self._default_limit = default_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._lock = Lock()
+
+    def _semaphore(self, tool_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._limits.get(tool_name, self._default_limit))
+            self._semaphores[tool_name] = semaphore
+        return semaphore
+
+    async def run(self, tool_name: str, kind: PoolKind, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        submitted = time.perf_counter()
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, ToolStats())
+            stats.calls += 1
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            self._pool_pending[kind] += 1
+
+        started: Dict[str, float] = {}
+
+        def call() -> T:
+            started["at"] = time.perf_counter()
+            with self._lock:
+                stats.queued -= 1
+                stats.in_flight += 1
+                stats.total_wait_ms += (started["at"] - submitted) * 1000
+                self._pool_pending[kind] -= 1
+            return fn(*args, **kwargs)
+
+        try:
+            async with self._semaphore(tool_name):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pools[kind], call)
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            timing = call_timing.get()
+            if timing is not None and "at" in started:
+                timing["wait_ms"] = timing.get("wait_ms", 0.0) + (started["at"] - submitted) * 1000
+                timing["run_ms"] = timing.get("run_ms", 0.0) + (finished - started["at"]) * 1000
+            with self._lock:
+                if "at" in started:
+                    stats.in_flight -= 1
+                    stats.total_run_ms += (finished - started["at"]) * 1000
+                else:
+                    # ถูกยกเลิกก่อนได้เริ่มทำงาน
+                    stats.queued -= 1
+                    self._pool_pending[kind] -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pools": {
+                    kind: {"workers": self._pool_sizes[kind], "pending": self._pool_pending[kind]}
+                    for kind in self._pools
+                },
+                "tools": {name: stats.as_dict() for name, stats in sorted(self._stats.items())},
+            }
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.base import ToolResult
+
+MemoKey = Tuple[str, str, int]
+
+
+@dataclass
+class _Entry:
+    content: List[Any]
+    structured_content: Optional[Dict[str, Any]]
+    meta: Optional[Dict[str, Any]]
+    size: int
+
+
+def _result_size(result: ToolResult) -> int:
+    # นับเป็น byte (UTF-8) ให้ตรงกับ TOOL_MEMO_MAX_BYTES: ข้อความไทย 1 ตัวอักษร = 3 byte
+    text = sum(len((getattr(block, "text", "") or "").encode("utf-8")) for block in result.content)
+    # fastmcp แปลงค่าที่ tool คืนเป็นทั้ง text (JSON) และ structured_content ที่มีข้อมูลชุดเดียวกัน -> นับสองเท่า
+    return text * 2 if result.structured_content is not None else text
+
+
+class ToolMemo(Middleware):
+    """
+    จำผลลัพธ์ของ tool ที่เป็น pure function ของ argument + ข้อมูลที่โหลดอยู่
+    key = (ชื่อ tool, argument ที่เติมค่า default แล้ว, เวอร์ชัน snapshot) เก็บ content ที่ serialize แล้ว
+    hit จึงข้ามทั้งงาน pandas และการแปลงเป็น JSON; ข้อมูลถูก reload -> เวอร์ชันเปลี่ยน -> ล้าง cache ทั้งหมด
+    จำกัดขนาดรวมเป็น byte และไล่รายการที่ใช้ล่าสุดนานที่สุดออกก่อน (LRU)
+    """
+
+    def __init__(self, version: Callable[[], int], max_bytes: int, enabled: bool = True) -> None:
+        self.version = version
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._defaults: Dict[str, Dict[str, Any]] = {}
+        self._entries: "OrderedDict[MemoKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[MemoKey, asyncio.Future] = {}
+        self._bytes = 0
+        self._cached_version: Optional[int] = None
+        self._tool_stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def cached(self, fn: Callable) -> Callable:
+        """ทำเครื่องหมายให้ tool (ชื่อ = ชื่อฟังก์ชัน) ถูก memoize; วางใต้ ``@mcp.tool``"""
+        self._defaults[fn.__name__] = {
+            name: p.default for name, p in inspect.signature(fn).parameters.items() if p.default is not p.empty
+        }
+        return fn
+
+    def _key(self, name: str, arguments: Optional[Dict[str, Any]], version: int) -> MemoKey:
+        # argument ที่ไม่ส่งมา กับที่ส่งค่า default มาตรง ๆ ต้องได้ key เดียวกัน
+        args = {**self._defaults[name], **(arguments or {})}
+        return name, json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str), version
+
+    def _stats_for(self, name: str) -> Dict[str, int]:
+        return self._tool_stats.setdefault(name, {"hits": 0, "misses": 0, "shared": 0, "uncached": 0})
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = context.message.name
+        if not self.enabled or name not in self._defaults:
+            return await call_next(context)
+
+        version = self.version()
+        if version != self._cached_version:
+            self._invalidate(version)
+        key = self._key(name, context.message.arguments, version)
+        stats = self._stats_for(name)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+            return self._replay(entry)
+
+        # call เดียวกันที่กำลังคำนวณอยู่ (เช่นหลาย agent เช็คคอลัมน์พร้อมกัน) -> รอผลตัวเดียวกัน
+        pending = self._inflight.get(key)
+        if pending is not None:
+            stats["shared"] += 1
+            entry = await asyncio.shield(pending)
+            if entry is not None:
+                return self._replay(entry)
+            return await call_next(context)
+
+        stats["misses"] += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        entry = None
+        try:
+            result = await call_next(context)
+            # ผล error และผลที่คำนวณคร่อมการ reload ไม่เก็บ
+            if isinstance(result, ToolResult) and not result.is_error and self.version() == version:
+                entry = _Entry(
+                    list(result.content), result.structured_content, dict(result.meta or {}), _result_size(result)
+                )
+                self._store(key, entry)
+            else:
+                stats["uncached"] += 1
+            return result
+        finally:
+            del self._inflight[key]
+            future.set_result(entry)
+
+    @staticmethod
+    def _replay(entry: _Entry) -> ToolResult:
+        # สร้าง ToolResult ใหม่ทุกครั้ง (middleware อื่นแก้ meta ได้โดยไม่กระทบ cache) โดยไม่ validate/serialize ซ้ำ
+        return ToolResult.model_construct(
+            content=entry.content,
+            structured_content=entry.structured_content,
+            meta=dict(entry.meta) or None,
+            is_error=False,
+        )
+
+    def _store(self, key: MemoKey, entry: _Entry) -> None:
+        if entry.size > self.max_bytes:
+            self._stats_for(key[0])["uncached"] += 1
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """ล้างผลที่จำไว้ทั้งหมด (เช่น เมื่อเปลี่ยน DataRepository ทั้งตัว ซึ่งเวอร์ชันเริ่มนับใหม่)"""
+        self._invalidate(self.version())
+
+    def _invalidate(self, version: int) -> None:
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._cached_version = version
+
+    def stats(self) -> Dict[str, Any]:
+        tools = {}
+        for name, counts in sorted(self._tool_stats.items()):
+            lookups = counts["hits"] + counts["misses"] + counts["shared"]
+            tools[name] = {**counts, "hit_rate": round((counts["hits"] + counts["shared"]) / lookups, 3) if lookups else 0.0}
+        return {
+            "enabled": self.enabled,
+            "data_version": self._cached_version,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "tools": tools,
+        }
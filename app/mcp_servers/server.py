@@ -1,16 +1,65 @@
 from __future__ import annotations
 from datetime import datetime
 from fastmcp import FastMCP
-from app.config import MAIN_SERVER_PORT
+from app.config import (
+    DATA_RELOAD_INTERVAL_SECONDS,
+    DATA_RELOAD_SETTLE_POLLS,
+    DATA_WARM_UP,
+    MAIN_SERVER_PORT,
+    TOOL_CONCURRENCY_LIMITS,
+    TOOL_CPU_WORKERS,
+    TOOL_DEFAULT_CONCURRENCY,
+    TOOL_IO_WORKERS,
+    TOOL_MEMO_ENABLED,
+    TOOL_MEMO_MAX_BYTES,
+    TOOL_RESULT_FORMAT,
+    TOOL_RESULT_MAX_TEXT,
+    TOOL_RESULT_MAX_TOKENS,
+)
+from app.data.report_query import AggregateSpec, FilterSpec, SortSpec
 from app.data.repository import DataRepository
+from app.llm.gateway import get_gateway
+from app.mcp_servers.encoding import ResultFormat, encode_rows
+from app.mcp_servers.executor import ToolExecutor
+from app.mcp_servers.memo import ToolMemo
+from app.mcp_servers.tracing import TracingMiddleware
 
-# Initialize Logic
+# Initialize Logic (ไม่อ่านไฟล์ตอน import: แต่ละชุดข้อมูลโหลดตอน tool ใช้ครั้งแรก หรือตาม DATA_WARM_UP ใน run())
 repo = DataRepository()
 
+# งาน pandas / Bedrock รันใน worker pool เพื่อไม่ให้ event loop ของ server ค้าง
+executor = ToolExecutor(
+    cpu_workers=TOOL_CPU_WORKERS,
+    io_workers=TOOL_IO_WORKERS,
+    limits=TOOL_CONCURRENCY_LIMITS,
+    default_limit=TOOL_DEFAULT_CONCURRENCY,
+)
+
 mcp = FastMCP(
     name="Mango Unified Server",
     instructions="Centralized server for Reporter, PPN, and OF tools.",
 )
+# แนบเวลาฝั่ง server + trace id ของ client ไปกับผลลัพธ์ของทุก tool call
+mcp.add_middleware(TracingMiddleware())
+# tool อ่านอย่างเดียวถูกเรียกซ้ำบ่อย (prompt สั่งให้เช็คคอลัมน์ก่อนทุกครั้ง) -> จำผลไว้ตามเวอร์ชันข้อมูล
+memo = ToolMemo(lambda: repo.data_version, max_bytes=TOOL_MEMO_MAX_BYTES, enabled=TOOL_MEMO_ENABLED)
+mcp.add_middleware(memo)
+
+FORMAT_HINT = (
+    " Rows come back compact by default: 'columns' once, 'rows' as value lists, values shared by every row in "
+    "'constants'. Long composite-key columns (pk_*, sort_key_*, GSI_*) are dropped unless requested in 'columns'. "
+    "max_tokens caps the result size (0 = no cap); 'omitted_rows' tells how many rows were cut."
+)
+
+def _encoder(fmt: ResultFormat, max_tokens: int, keep: list[str] | None = None):
+    def encode(rows: list[dict]):
+        return encode_rows(rows, fmt, max_tokens=max_tokens, max_text=TOOL_RESULT_MAX_TEXT, keep=keep or ())
+    return encode
+
+def _encoded(fn, fmt: ResultFormat, max_tokens: int, keep: list[str] | None = None):
+    """ห่อ repo method ที่คืน records ให้ encode ใน worker thread เดียวกัน"""
+    encode = _encoder(fmt, max_tokens, keep)
+    return lambda *args, **kwargs: encode(fn(*args, **kwargs))
 
 # --- Shared Tools ---
 @mcp.tool(name="today", description="Get current date and time.")
@@ -23,38 +72,159 @@ def get_report() -> list[str]:
     return repo.get_report_names()
 
 @mcp.tool(name="get_report_columns", description="Get column names for a specific report.")
-def get_report_columns(report_name: str) -> list[str]:
-    return repo.get_report_columns(report_name)
+@memo.cached
+async def get_report_columns(report_name: str) -> list[str]:
+    return await executor.run("get_report_columns", "cpu", repo.get_report_columns, report_name)
+
+@mcp.tool(name="read_report", description="Read data from a report. Optionally specify columns." + FORMAT_HINT)
+@memo.cached
+async def read_report(
+    report_name: str,
+    columns: list[str] | None = None,
+    format: ResultFormat = TOOL_RESULT_FORMAT,
+    max_tokens: int = TOOL_RESULT_MAX_TOKENS,
+) -> dict | list[dict]:
+    fn = _encoded(repo.read_report, format, max_tokens, keep=columns)
+    return await executor.run("read_report", "cpu", fn, report_name, columns)
 
-@mcp.tool(name="read_report", description="Read data from a report. Optionally specify columns.")
-def read_report(report_name: str, columns: list[str] | None = None) -> list[dict]:
-    return repo.read_report(report_name, columns)
+@mcp.tool(
+    name="query_report",
+    description=(
+        "Query a report on the server: filters (AND-ed; ops eq/ne/gt/gte/lt/lte/in/not_in/between/contains/startswith), "
+        "sort, group_by with aggregates (sum/mean/min/max/count/nunique), column selection and paging. "
+        "Aggregate columns are named '<column>_<func>' and can be used in sort. "
+        "Pass next_cursor from the previous result (with the same query) to get the next page."
+        + FORMAT_HINT
+    ),
+)
+@memo.cached
+async def query_report(
+    report_name: str,
+    filters: list[FilterSpec] | None = None,
+    sort: list[SortSpec] | None = None,
+    group_by: list[str] | None = None,
+    aggregates: list[AggregateSpec] | None = None,
+    columns: list[str] | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+    format: ResultFormat = TOOL_RESULT_FORMAT,
+    max_tokens: int = TOOL_RESULT_MAX_TOKENS,
+) -> dict:
+    return await executor.run(
+        "query_report",
+        "cpu",
+        repo.query_report,
+        report_name,
+        filters=filters,
+        sort=sort,
+        group_by=group_by,
+        aggregates=aggregates,
+        columns=columns,
+        limit=limit,
+        cursor=cursor,
+        encode=_encoder(format, max_tokens, keep=columns),
+    )
+
+@mcp.tool(
+    name="get_aging_buckets",
+    description=(
+        "Get precomputed aging-stock totals (item count and qtybal) per age bucket in days, "
+        "overall or for one warehouse (whcode) and/or material (c_des1). If 'material' is part of several "
+        "material names, rows is empty and 'matches' lists the full names to choose from."
+    ),
+)
+async def get_aging_buckets(warehouse: str | None = None, material: str | None = None) -> dict:
+    return await executor.run("get_aging_buckets", "cpu", repo.get_aging_buckets, warehouse, material)
+
+@mcp.tool(
+    name="get_cost_totals",
+    description="Get precomputed budget vs actual cost totals per cost group (G-Code) of the project.",
+)
+async def get_cost_totals() -> list[dict]:
+    return await executor.run("get_cost_totals", "cpu", repo.get_cost_totals)
 
 # --- PPN Tools ---
 @mcp.tool(name="get_plan_columns", description="Get column names for PPN plan data.")
-def get_plan_columns() -> list[str]:
-    return repo.get_plan_columns()
+@memo.cached
+async def get_plan_columns() -> list[str]:
+    return await executor.run("get_plan_columns", "cpu", repo.get_plan_columns)
 
-@mcp.tool(name="get_plan", description="Search for project plan details by keyword.")
-def get_plan(query: str) -> list[dict]:
-    return repo.get_plan(query)
+@mcp.tool(
+    name="get_plan",
+    description="Search for project plan details by keyword. Results are ranked by relevance; use offset to page."
+    + FORMAT_HINT,
+)
+@memo.cached
+async def get_plan(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    format: ResultFormat = TOOL_RESULT_FORMAT,
+    max_tokens: int = TOOL_RESULT_MAX_TOKENS,
+) -> dict | list[dict]:
+    fn = _encoded(repo.get_plan, format, max_tokens)
+    return await executor.run("get_plan", "cpu", fn, query, limit=limit, offset=offset)
 
-@mcp.tool(name="get_material_use", description="Get summary of material usage.")
-def get_material_use() -> list[dict]:
-    return repo.get_material_use()
+# ยอดสรุปคำนวณครั้งแรกที่ใช้แล้วเก็บใน snapshot (materialized view) แต่ครั้งแรก/หลัง reload ยังเป็นงาน pandas
+# จึงเข้า worker pool เหมือน tool อื่น ไม่บล็อก event loop
+@mcp.tool(
+    name="get_material_use",
+    description="Get summary of material usage (total required_qty per material). Optionally pass a project code.",
+)
+@memo.cached
+async def get_material_use(project: str | None = None) -> list[dict]:
+    return await executor.run("get_material_use", "cpu", repo.get_material_use, project)
 
 # --- OF Tools ---
 @mcp.tool(name="phase_structure", description="Parse expense text into JSON structure.")
-def phase_structure(text: str) -> dict:
-    return repo.phase_structure(text)
+async def phase_structure(text: str) -> dict:
+    return await executor.run("phase_structure", "cpu", repo.phase_structure, text)
 
 @mcp.tool(name="get_expense_code", description="Find expense code from description.")
-def get_expense_code(description: str) -> list[dict]:
-    return repo.get_expense_code(description)
+async def get_expense_code(description: str) -> list[dict]:
+    return await executor.run("get_expense_code", "io", repo.get_expense_code, description)
+
+@mcp.tool(
+    name="get_expense_codes",
+    description=(
+        "Find expense codes for many descriptions at once. Returns one item per description, in the same order, "
+        "with the amount parsed from the description."
+    ),
+)
+async def get_expense_codes(descriptions: list[str]) -> list[dict]:
+    return await executor.run("get_expense_codes", "io", repo.get_expense_codes, descriptions)
+
+@mcp.tool(name="get_expense_cache_stats", description="Get hit/miss statistics of the expense code cache.")
+async def get_expense_cache_stats() -> dict:
+    return await executor.run("get_expense_cache_stats", "cpu", repo.get_expense_cache_stats)
+
+# --- Diagnostics ---
+@mcp.tool(name="get_server_metrics", description="Get worker-pool queue depth, per-tool concurrency and LLM gateway metrics.")
+def get_server_metrics() -> dict:
+    return {**executor.metrics(), "llm": get_gateway().stats()}
+
+@mcp.tool(name="get_tool_cache_stats", description="Get per-tool hit/miss counters and size of the tool result cache.")
+def get_tool_cache_stats() -> dict:
+    return memo.stats()
+
+@mcp.tool(name="get_data_status", description="Get the loaded data snapshot version, row counts and reload status.")
+def get_data_status() -> dict:
+    return repo.get_data_status()
 
 def run() -> None:
     print(f"Starting Unified MCP Server on port {MAIN_SERVER_PORT}...")
-    mcp.run(transport="http", host="127.0.0.1", port=MAIN_SERVER_PORT)
+    if DATA_WARM_UP == "eager":
+        repo.warm_up()
+    elif DATA_WARM_UP == "background":
+        repo.warm_up(background=True)
+    # ไฟล์ export ใหม่ถูกโหลดเข้า snapshot ใหม่ใน background (session ของ agent ไม่หลุด)
+    if DATA_RELOAD_INTERVAL_SECONDS > 0:
+        repo.start_watcher(DATA_RELOAD_INTERVAL_SECONDS, settle_polls=DATA_RELOAD_SETTLE_POLLS)
+    try:
+        mcp.run(transport="http", host="127.0.0.1", port=MAIN_SERVER_PORT)
+    finally:
+        repo.stop_watcher()
+        executor.shutdown()
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from app.mcp_servers.executor import call_timing
+
+
+def _meta_dict(meta: Any) -> Dict[str, Any]:
+    # mcp 1.x ใช้ pydantic model, mcp 2.x ใช้ dict
+    if meta is None:
+        return {}
+    if isinstance(meta, dict):
+        return meta
+    dump = getattr(meta, "model_dump", None)
+    return dump() if dump is not None else {}
+
+
+class TracingMiddleware(Middleware):
+    """
+    อ่าน trace id จาก ``_meta`` ของ tool call แล้วแนบเวลาฝั่ง server (รวม/รอคิว/ทำงาน) กลับไปใน ``meta`` ของผลลัพธ์
+    ฝั่ง client (TracedMCPTool) นำค่าเหล่านี้ไปใส่ใน span ของ tool call
+    """
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        meta = _meta_dict(getattr(context.message, "meta", None))
+        if "trace_id" not in meta and context.fastmcp_context is not None:
+            # fastmcp บางรุ่นย้าย _meta ของ request ไปไว้ที่ request_context
+            request_context = context.fastmcp_context.request_context
+            meta = _meta_dict(getattr(request_context, "meta", None))
+        timing: Dict[str, float] = {}
+        token = call_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            result = await call_next(context)
+        finally:
+            call_timing.reset(token)
+        server_timing = {
+            "trace_id": meta.get("trace_id"),
+            "server_ms": round((time.perf_counter() - started) * 1000, 2),
+            "wait_ms": round(timing.get("wait_ms", 0.0), 2),
+            "run_ms": round(timing.get("run_ms", 0.0), 2),
+        }
+        result.meta = {**(result.meta or {}), "server_timing": server_timing}
+        return result
@@ -1,18 +1,114 @@
 from __future__ import annotations
 
-from app.agents.sub_agents import DomainAgent, build_domain_agents
-from app.agents.supervisor import Orchestrator
+import queue
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock, Thread
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import RUNTIME_MAX_IN_FLIGHT, RUNTIME_QUEUE_TIMEOUT_SECONDS
+from app.telemetry.callbacks import StreamEvent, StreamRelay
 from app.telemetry.log_store import AgentLogStore
+from app.telemetry.sink import LogSink, get_log_sink
 
+if TYPE_CHECKING:
+    from app.agents.mcp_pool import MCPConnectionPool
+    from app.agents.sub_agents import DomainAgent
+    from app.agents.supervisor import Orchestrator
 
-class AgentRuntime:
-    def __init__(self, log_store: AgentLogStore | None = None) -> None:
-        self.log_store = log_store or AgentLogStore()
-        self.domain_agents: dict[str, DomainAgent] = build_domain_agents(self.log_store)
-        self.orchestrator = Orchestrator(self.domain_agents, self.log_store)
+
+class RuntimeBusyError(RuntimeError):
+    """Raised when a request waits longer than RUNTIME_QUEUE_TIMEOUT_SECONDS for a free slot."""
+
+
+class AgentSession:
+    """
+    State ต่อผู้ใช้ 1 คน: ประวัติแชท, log และ conversation memory ของ agent แต่ละตัว
+    ตัว agent ใช้ model/MCP tools ร่วมกับทั้ง process จึงสร้างได้ในระดับมิลลิวินาที
+    """
+
+    def __init__(self, runtime: "AgentRuntime", log_store: AgentLogStore | None = None) -> None:
+        self.runtime = runtime
+        self.session_id = uuid.uuid4().hex[:12]
+        self.log_store = log_store or AgentLogStore(sink=runtime.log_sink, session_id=self.session_id)
+        self.chat_history: List[Dict[str, str]] = []
+        self._relay = StreamRelay()
+        # agent (model, MCP session, tool catalogue) สร้างตอนใช้ครั้งแรก: เปิดหน้า dashboard ได้โดยไม่รอ Bedrock/MCP
+        self._agents_lock = Lock()
+        self._agents: Optional[Tuple[Dict[str, DomainAgent], Orchestrator]] = None
+
+    @property
+    def domain_agents(self) -> Dict[str, DomainAgent]:
+        return self._ensure_agents()[0]
+
+    @property
+    def orchestrator(self) -> Orchestrator:
+        return self._ensure_agents()[1]
+
+    def _ensure_agents(self) -> Tuple[Dict[str, DomainAgent], Orchestrator]:
+        with self._agents_lock:
+            if self._agents is None:
+                self._agents = self._build_agents()
+            return self._agents
+
+    def _build_agents(self) -> Tuple[Dict[str, DomainAgent], Orchestrator]:
+        # strands / mcp ใช้เวลา import หลายร้อย ms จึง import ตอนสร้าง agent ชุดแรก
+        from app.agents.sub_agents import build_domain_agents
+        from app.agents.supervisor import Orchestrator
+
+        domain_agents = build_domain_agents(self.log_store, self.runtime.pool, self._relay)
+        return domain_agents, Orchestrator(domain_agents, self.log_store, self._relay)
 
     def handle(self, user_message: str) -> str:
-        return self.orchestrator.run(user_message)
+        with self.runtime.slot():
+            return self.orchestrator.run(user_message)
+
+    def stream(self, user_message: str) -> Iterator[StreamEvent]:
+        """
+        Run ``handle`` in the background and yield events as they arrive:
+        ``token`` (text of the agent answering the user), ``tool`` (any agent calling a tool), then ``done`` with the final answer.
+        Time-to-first-token is logged as a ``metric`` event.
+        """
+        events: "queue.Queue[StreamEvent]" = queue.Queue()
+        started = time.perf_counter()
+
+        def listener(event: StreamEvent) -> None:
+            # token ของ Domain Agent เป็นข้อมูลภายในที่ Orchestrator จะสรุปให้ จึงส่งเฉพาะ tool event
+            # (ยกเว้น turn ที่ router ส่งตรงไป DomainAgent -> agent นั้นเป็นคนตอบผู้ใช้)
+            if event.kind == "token" and event.agent != self.orchestrator.speaker:
+                return
+            events.put(event)
+
+        def worker() -> None:
+            try:
+                events.put(StreamEvent("done", "Orchestrator", self.handle(user_message)))
+            except Exception as exc:
+                events.put(StreamEvent("error", "Orchestrator", str(exc)))
+            finally:
+                self._relay.listener = None
+
+        self._relay.listener = listener
+        Thread(target=worker, name=f"stream-{self.session_id}", daemon=True).start()
+
+        first_token = True
+        while True:
+            event = events.get()
+            if event.kind == "token" and first_token:
+                first_token = False
+                ttft_ms = (time.perf_counter() - started) * 1000
+                self.log_store.add(
+                    "Orchestrator", "metric", f"time_to_first_token {ttft_ms:.0f} ms", payload={"ttft_ms": round(ttft_ms, 1)}
+                )
+            if event.kind == "done":
+                total_ms = (time.perf_counter() - started) * 1000
+                self.log_store.add(
+                    "Orchestrator", "metric", f"response_time {total_ms:.0f} ms", payload={"total_ms": round(total_ms, 1)}
+                )
+            yield event
+            if event.kind in ("done", "error"):
+                return
 
     def logs(self) -> list[dict[str, str]]:
         return self.log_store.as_dicts()
@@ -20,15 +116,96 @@ class AgentRuntime:
     def reset_logs(self) -> None:
         self.log_store.clear()
 
-    def shutdown(self) -> None:
-        """
-        สั่งปิด Connection ของ Domain Agents ทั้งหมดอย่างถูกวิธี
-        ควรเรียกใช้เมื่อต้องการ Restart Runtime หรือปิด Application
-        """
-        for name, agent in self.domain_agents.items():
+    def reset(self) -> None:
+        """ล้างบทสนทนา (ทั้งประวัติแชทและ memory ของ agent) และ log ของ session นี้"""
+        self.close()
+        self.chat_history.clear()
+        self.log_store.clear()
+
+    def close(self) -> None:
+        """ปิด agent ของ session (ถ้าสร้างไว้แล้ว) ใช้ต่อได้: ข้อความถัดไปจะสร้าง agent ชุดใหม่"""
+        with self._agents_lock:
+            agents, self._agents = self._agents, None
+        if agents is None:
+            return
+        domain_agents, orchestrator = agents
+        orchestrator.close()
+        for name, agent in domain_agents.items():
             try:
                 agent.close()
-                # Optional: Log การปิด Connection ถ้าต้องการ
-                # print(f"Closed connection for agent: {name}")
             except Exception as e:
-                print(f"Error closing agent {name}: {e}")
\ No newline at end of file
+                print(f"Error closing agent {name}: {e}")
+
+
+class AgentRuntime:
+    """
+    Runtime กลางของทั้ง process (เช่น สร้างครั้งเดียวผ่าน st.cache_resource)
+    แจก AgentSession ให้ผู้ใช้แต่ละคน และจำกัดจำนวน request ที่รันพร้อมกัน
+    """
+
+    def __init__(
+        self,
+        pool: MCPConnectionPool | None = None,
+        log_sink: LogSink | None = None,
+        max_in_flight: int = RUNTIME_MAX_IN_FLIGHT,
+        queue_timeout: float = RUNTIME_QUEUE_TIMEOUT_SECONDS,
+    ) -> None:
+        # MCP session มาจาก pool กลาง (ไม่ส่ง pool = ใช้ pool ระดับ process)
+        self.pool = pool
+        # log ทุก session เขียนลง sink เดียวกัน (ไม่ส่ง = ใช้ sink ระดับ process ตาม LOG_SINK)
+        self.log_sink = log_sink if log_sink is not None else get_log_sink()
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._slots = BoundedSemaphore(max_in_flight)
+        self._lock = Lock()
+        self._sessions: "weakref.WeakSet[AgentSession]" = weakref.WeakSet()
+        self._in_flight = 0
+        self._waiting = 0
+        self._served = 0
+
+    def create_session(self, log_store: AgentLogStore | None = None) -> AgentSession:
+        session = AgentSession(self, log_store)
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if acquired:
+                self._in_flight += 1
+        if not acquired:
+            raise RuntimeBusyError(
+                f"All {self.max_in_flight} request slots are busy; waited {self.queue_timeout:g}s."
+            )
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._served += 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "max_in_flight": self.max_in_flight,
+                "served": self._served,
+            }
+
+    def shutdown(self) -> None:
+        """
+        สั่งปิด Session ทั้งหมดอย่างถูกวิธี (MCP connection ยังอยู่ใน pool ของ process)
+        ควรเรียกใช้เมื่อต้องการปิด Application
+        """
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
@@ -1,25 +1,53 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Set
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Literal, Optional, Set
 
 from app.telemetry.log_store import AgentLogStore
 
 
-def build_agent_callback(agent_name: str, log_store: AgentLogStore):
+StreamKind = Literal["token", "tool", "done", "error"]
+
+
+@dataclass
+class StreamEvent:
+    kind: StreamKind
+    agent: str
+    text: str = ""
+
+
+class StreamRelay:
+    """ส่งต่อ token/tool event จาก callback ของทุก agent ใน session ไปยัง listener ที่กำลัง stream อยู่"""
+
+    def __init__(self) -> None:
+        self.listener: Optional[Callable[[StreamEvent], None]] = None
+
+    def emit(self, event: StreamEvent) -> None:
+        listener = self.listener
+        if listener is not None:
+            listener(event)
+
+
+def build_agent_callback(agent_name: str, log_store: AgentLogStore, relay: Optional[StreamRelay] = None):
     """Capture streaming events emitted by Strands agents."""
 
     seen_tools: Set[str] = set()
 
     def handler(**kwargs: Dict[str, Any]) -> None:
         if "data" in kwargs:
-            chunk = kwargs["data"].strip()
-            if chunk:
-                log_store.add(agent_name, "process", chunk)
+            data = kwargs["data"]
+            if relay is not None and data:
+                relay.emit(StreamEvent("token", agent_name, data))
+            if data:
+                # เก็บ chunk ตามจริง (ไม่ strip) เพื่อให้ข้อความที่ต่อกันตรงกับที่โมเดลตอบ
+                log_store.append_chunk(agent_name, data)
         elif "current_tool_use" in kwargs:
             tool = kwargs["current_tool_use"]
             tool_id = tool.get("toolUseId")
             if tool_id and tool_id not in seen_tools:
                 seen_tools.add(tool_id)
+                if relay is not None:
+                    relay.emit(StreamEvent("tool", agent_name, str(tool.get("name"))))
                 log_store.add(
                     agent_name,
                     "tool",
@@ -28,4 +56,3 @@ def build_agent_callback(agent_name: str, log_store: AgentLogStore):
                 )
 
     return handler
-
@@ -1,74 +1,287 @@
 from __future__ import annotations
 
-from collections import deque
-from dataclasses import dataclass, asdict
-from datetime import datetime
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from threading import Lock
-from typing import Any, Deque, Dict, List, Literal, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Literal, Optional, Sequence
 
+if TYPE_CHECKING:
+    from app.telemetry.sink import LogSink
 
-Stage = Literal["input", "process", "tool", "output", "error"]
+
+Stage = Literal["input", "process", "tool", "output", "error", "metric", "span", "route"]
+
+
+# เวลาที่ "แก้ไขล่าสุด" เก็บเป็น time.monotonic() (ไม่ย้อนกลับ) แล้วแปลงเป็นเวลาจริงตอนอ่าน
+_MONOTONIC_TO_EPOCH = time.time() - time.monotonic()
 
 
-@dataclass
 class LogEvent:
-    timestamp: str
-    agent: str
-    stage: Stage
-    message: str
-    payload: Optional[Dict[str, Any]] = None
+    """
+    Record ขนาดเล็ก (``__slots__``) ใน ring buffer
+    ``seq`` = ลำดับถาวรของ event, ``born``/``version`` = นาฬิกาของ store ตอนสร้าง/แก้ไขล่าสุด (ใช้กับ cursor)
+    เวลาเก็บเป็นตัวเลขและจัดรูปแบบเป็น ISO ตอนอ่านเท่านั้น
+    event stage ``process`` เก็บ token เป็น list ของ chunk และ join เมื่อมีคนอ่าน ``message``
+    """
+
+    __slots__ = ("seq", "born", "version", "created", "updated", "agent", "stage", "chunks", "payload")
+
+    def __init__(
+        self,
+        seq: int,
+        clock: int,
+        created: float,
+        agent: str,
+        stage: Stage,
+        message: str,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.seq = seq
+        self.born = clock
+        self.version = clock
+        self.created = created
+        self.updated = created - _MONOTONIC_TO_EPOCH
+        self.agent = agent
+        self.stage = stage
+        self.chunks = [message]
+        self.payload = payload
+
+    @property
+    def message(self) -> str:
+        chunks = self.chunks
+        if len(chunks) > 1:
+            # join ครั้งเดียวแล้วเก็บผลไว้ (append ต่อจากนี้ยังเป็น O(1))
+            chunks[:] = ["".join(chunks)]
+        return chunks[0].strip() if self.stage == "process" else chunks[0]
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.utcfromtimestamp(self.updated + _MONOTONIC_TO_EPOCH).isoformat()
 
     def as_dict(self) -> Dict[str, Any]:
-        data = asdict(self)
-        return data
+        # payload ส่งต่อแบบ reference (ไม่ deep copy) ผู้เรียกไม่ควรแก้ไข
+        return {
+            "seq": self.seq,
+            "timestamp": self.timestamp,
+            "agent": self.agent,
+            "stage": self.stage,
+            "message": self.message,
+            "payload": self.payload,
+        }
+
+    def __repr__(self) -> str:
+        return f"LogEvent(seq={self.seq}, agent={self.agent!r}, stage={self.stage!r}, message={self.message[:40]!r})"
+
+
+@dataclass
+class LogPage:
+    """ผลของ ``AgentLogStore.query``: ส่ง ``cursor`` กลับมาเป็น ``since`` ในครั้งถัดไปเพื่อเอาเฉพาะส่วนที่เปลี่ยน"""
+
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    cursor: int = 0
 
 
 class AgentLogStore:
-    def __init__(self, max_length: int = 2000) -> None:
-        self._events: Deque[LogEvent] = deque(maxlen=max_length)
+    """
+    Ring buffer ขนาดคงที่ + index ตาม agent/stage (รายการ seq เรียงจากน้อยไปมาก) และตามเวลา (``created`` เพิ่มขึ้นตาม seq)
+    Query ทุกแบบใช้ bisect บน index จึงไม่ต้อง copy ประวัติทั้งหมด
+    """
+
+    def __init__(self, max_length: int = 2000, sink: Optional["LogSink"] = None, session_id: str = "") -> None:
+        self.max_length = max_length
+        # sink (ถ้ามี) ได้รับทุก event รวมถึง process chunk แยกชิ้น เพื่อ replay/วิเคราะห์ย้อนหลัง
+        self.sink = sink
+        self.session_id = session_id
+        self._ring: List[Optional[LogEvent]] = [None] * max_length
+        self._next_seq = 0
+        self._floor = 0  # seq แรกหลัง clear()
+        self._clock = 0
+        self._last_created = 0.0
+        self._by_agent: Dict[str, List[int]] = {}
+        self._by_stage: Dict[str, List[int]] = {}
         self._lock = Lock()
         self._process_buffers: Dict[str, LogEvent] = {}
 
     def add(self, agent: str, stage: Stage, message: str, payload: Optional[Dict[str, Any]] = None) -> LogEvent:
         """Add a new event. Process-stage messages are consolidated per agent for readability."""
 
+        if stage == "process" and payload is None:
+            return self.append_chunk(agent, message if isinstance(message, str) else str(message))
         normalized_message = message.strip() if isinstance(message, str) else str(message)
-        event = LogEvent(
-            timestamp=datetime.utcnow().isoformat(),
-            agent=agent,
-            stage=stage,
-            message=normalized_message,
-            payload=payload,
-        )
+        return self._store(time.time(), agent, stage, normalized_message, payload)
+
+    def append_chunk(self, agent: str, chunk: str) -> LogEvent:
+        """
+        Append one streamed text chunk to the agent's open ``process`` event (created on first chunk).
+        Hot path ของ token streaming: ไม่สร้าง object ต่อ token, ไม่จัดรูปแบบเวลา, ไม่ต่อ string
+        """
+        now = time.monotonic()
         with self._lock:
+            self._clock += 1
+            buffer = self._process_buffers.get(agent)
+            if buffer is not None and buffer.seq >= self._oldest():
+                buffer.chunks.append(chunk)
+                buffer.updated = now
+                buffer.version = self._clock
+                return buffer
+        # chunk แรกของรอบ (หรือ buffer เดิมหลุดจาก ring) -> เปิด event ใหม่
+        return self._store(time.time(), agent, "process", chunk, None)
+
+    @classmethod
+    def replay(cls, records: Iterable[Dict[str, Any]], max_length: int = 2000) -> "AgentLogStore":
+        """Rebuild an in-memory store (original times kept) from sink records."""
+        store = cls(max_length=max_length)
+        # process event ถูกเขียนลง sink ตอนปิด จึงเรียงตามเวลาเริ่มก่อน
+        for record in sorted(records, key=lambda r: r["ts"]):
+            store._store(record["ts"], record["agent"], record["stage"], record["message"], record.get("payload"), persist=False)
+        return store
+
+    def _store(
+        self,
+        now: float,
+        agent: str,
+        stage: Stage,
+        normalized_message: str,
+        payload: Optional[Dict[str, Any]],
+        persist: bool = True,
+    ) -> LogEvent:
+        with self._lock:
+            self._clock += 1
+            # event ใหม่ของ agent เดียวกันปิด process buffer เดิม (process ที่ไม่มี payload จะเปิด buffer ใหม่)
+            closed = self._process_buffers.pop(agent, None)
+            event = self._append(now, agent, stage, normalized_message, payload)
             if stage == "process" and payload is None:
-                existing = self._process_buffers.get(agent)
-                if existing:
-                    existing.message = f"{existing.message} {event.message}".strip()
-                    existing.timestamp = event.timestamp
-                    return existing
-                self._events.append(event)
                 self._process_buffers[agent] = event
-                return event
+        if persist and self.sink is not None:
+            # process event ถูกส่งไป sink ครั้งเดียวตอนปิด (ข้อความครบแล้ว) แทนการส่งทุก token
+            if closed is not None:
+                self.sink.submit((closed.created, self.session_id, agent, "process", closed.message, None))
+            if stage != "process" or payload is not None:
+                self.sink.submit((now, self.session_id, agent, stage, normalized_message, payload))
+        return event
+
+    def _append(self, now: float, agent: str, stage: Stage, message: str, payload: Optional[Dict[str, Any]]) -> LogEvent:
+        # บังคับให้ created ไม่ลดลง เพื่อให้ bisect ตามเวลาได้
+        if now < self._last_created:
+            now = self._last_created
+        self._last_created = now
+        seq = self._next_seq
+        event = LogEvent(seq, self._clock, now, agent, stage, message, payload)
+        self._ring[seq % self.max_length] = event
+        self._next_seq = seq + 1
+        for index, key in ((self._by_agent, agent), (self._by_stage, stage)):
+            seqs = index.get(key)
+            if seqs is None:
+                index[key] = [seq]
+                continue
+            seqs.append(seq)
+            # ตัด seq ที่หลุดจาก ring ออกเป็นก้อน (amortized O(1))
+            if len(seqs) > 2 * self.max_length:
+                del seqs[: bisect_left(seqs, self._oldest())]
+        return event
+
+    def _oldest(self) -> int:
+        return max(self._floor, self._next_seq - self.max_length)
+
+    def _event(self, seq: int) -> LogEvent:
+        return self._ring[seq % self.max_length]  # type: ignore[return-value]
+
+    def query(
+        self,
+        agent: Optional[str] = None,
+        stage: Optional[Stage] = None,
+        since: int = 0,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> LogPage:
+        """
+        Events matching all filters, oldest first.
+        ``since`` is a cursor from a previous page: only events added after it, plus process events
+        whose text grew since then (same ``seq``, so callers can upsert), are returned.
+        ``start``/``end`` are naive UTC datetimes; ``limit`` keeps the newest N matches.
+        """
+        with self._lock:
+            oldest, stop = self._oldest(), self._next_seq
+            seqs: Sequence[int]
+            if agent is not None:
+                seqs = self._by_agent.get(agent, [])
+            elif stage is not None:
+                seqs = self._by_stage.get(stage, [])
+            else:
+                seqs = range(oldest, stop)
+
+            lo, hi = bisect_left(seqs, oldest), len(seqs)
+            if since:
+                lo = max(lo, bisect_right(seqs, since, lo, hi, key=lambda s: self._event(s).born))
+            if start is not None:
+                start_ts = _utc_epoch(start)
+                lo = max(lo, bisect_left(seqs, start_ts, lo, hi, key=lambda s: self._event(s).created))
+            if end is not None:
+                end_ts = _utc_epoch(end)
+                hi = min(hi, bisect_right(seqs, end_ts, lo, hi, key=lambda s: self._event(s).created))
 
-            # Non-process events should clear any buffered process text for that agent
-            self._process_buffers.pop(agent, None)
-            self._events.append(event)
-            return event
+            matched: List[LogEvent] = []
+            for i in range(hi - 1, lo - 1, -1):
+                event = self._event(seqs[i])
+                if stage is not None and event.stage != stage:
+                    continue
+                matched.append(event)
+                if limit is not None and len(matched) >= limit:
+                    break
+            matched.reverse()
+
+            if since:
+                # process buffer ที่ถูกต่อข้อความหลัง cursor (มีได้ไม่เกิน 1 ต่อ agent)
+                first_new = matched[0].seq if matched else stop
+                updated = [
+                    e
+                    for e in self._process_buffers.values()
+                    if e.version > since
+                    and e.born <= since
+                    and oldest <= e.seq < first_new
+                    and (agent is None or e.agent == agent)
+                    and (stage is None or e.stage == stage)
+                    and (start is None or e.created >= start_ts)
+                    and (end is None or e.created <= end_ts)
+                ]
+                if updated:
+                    matched = sorted(updated, key=lambda e: e.seq) + matched
+
+            return LogPage(events=[event.as_dict() for event in matched], cursor=self._clock)
 
     def dump(self) -> List[LogEvent]:
         with self._lock:
-            return list(self._events)
+            return [self._event(seq) for seq in range(self._oldest(), self._next_seq)]
 
     def clear(self) -> None:
+        # seq/clock ไม่ย้อนกลับ cursor เดิมจึงยังใช้ได้หลัง clear
         with self._lock:
-            self._events.clear()
+            open_buffers = list(self._process_buffers.values())
+            self._ring = [None] * self.max_length
+            self._floor = self._next_seq
+            self._by_agent.clear()
+            self._by_stage.clear()
             self._process_buffers.clear()
+        if self.sink is not None:
+            for event in open_buffers:
+                self.sink.submit((event.created, self.session_id, event.agent, "process", event.message, None))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._next_seq - self._oldest()
 
     def as_dicts(self) -> List[Dict[str, Any]]:
-        return [event.as_dict() for event in self.dump()]
+        return self.query().events
 
     def tail(self, limit: int = 200) -> List[Dict[str, Any]]:
-        with self._lock:
-            events = list(self._events)[-limit:]
-        return [event.as_dict() for event in events]
+        return self.query(limit=limit).events
+
+
+def _utc_epoch(value: datetime) -> float:
+    # timestamp ใน store เป็น UTC แบบ naive
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import atexit
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, IO, Iterator, List, Optional, Tuple
+
+from app.config import (
+    LOG_BATCH_SIZE,
+    LOG_DIR,
+    LOG_FLUSH_SECONDS,
+    LOG_MAX_FILES,
+    LOG_MAX_PENDING,
+    LOG_ROTATE_BYTES,
+    LOG_ROTATE_SECONDS,
+    LOG_SINK,
+)
+
+# (created epoch, session_id, agent, stage, message, payload)
+LogRecord = Tuple[float, str, str, str, str, Optional[Dict[str, Any]]]
+
+
+class LogSink(ABC):
+    """
+    ปลายทางถาวรของ ``AgentLogStore``: ``submit`` ถูกเรียกใน add-path จึงต้องไม่ block
+    (งานเขียนไฟล์ทำใน thread ของ sink เอง)
+    """
+
+    @abstractmethod
+    def submit(self, record: LogRecord) -> None:
+        ...
+
+    @abstractmethod
+    def read(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        session_id: Optional[str] = None,
+        agent: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        ...
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlLogSink(LogSink):
+    """
+    เขียน record เป็นไฟล์ JSONL แบบ append-only ด้วย background thread ทีละ batch
+    หมุนไฟล์ใหม่เมื่อเกิน ``rotate_bytes`` หรืออายุเกิน ``rotate_seconds`` และเก็บไว้ไม่เกิน ``max_files`` ไฟล์
+    ชื่อไฟล์มีเวลาเริ่ม (UTC) ทำให้ ``read`` ข้ามไฟล์ที่อยู่นอกช่วงเวลาได้
+    """
+
+    def __init__(
+        self,
+        directory: Path = LOG_DIR,
+        prefix: str = "agent_log",
+        rotate_bytes: int = LOG_ROTATE_BYTES,
+        rotate_seconds: float = LOG_ROTATE_SECONDS,
+        max_files: int = LOG_MAX_FILES,
+        flush_interval: float = LOG_FLUSH_SECONDS,
+        batch_size: int = LOG_BATCH_SIZE,
+        max_pending: int = LOG_MAX_PENDING,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        # deque.append/popleft thread-safe และเร็วกว่า queue.Queue (ไม่มี lock/condition ใน add-path)
+        self._pending: Deque[LogRecord] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._io_lock = threading.Lock()
+        # dropped ถูกเพิ่มทั้งจาก thread ผู้เรียก (คิวเต็ม) และ writer thread (เขียนไม่สำเร็จ)
+        self._dropped_lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        self._file_opened = 0.0
+        self._file_size = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: LogRecord) -> None:
+        pending = self._pending
+        if len(pending) >= self.max_pending:
+            # writer ตามไม่ทัน (เช่น disk ช้า) -> ทิ้ง record ใหม่แทนการ block agent
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+        pending.append(record)
+        if len(pending) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self) -> None:
+        with self._io_lock:
+            while self._pending:
+                first_ts = self._pending[0][0]
+                batch: List[str] = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(_encode(self._pending.popleft()))
+                try:
+                    self._write(batch, first_ts)
+                except Exception as e:
+                    with self._dropped_lock:
+                        self.dropped += len(batch)
+                    print(f"Warning: Could not write {len(batch)} log records to {self.directory}: {e}")
+
+    def _write(self, lines: List[str], first_ts: float) -> None:
+        if self._file is None or self._should_rotate():
+            self._rotate(first_ts)
+        data = "".join(lines)
+        self._file.write(data)  # type: ignore[union-attr]
+        self._file.flush()  # type: ignore[union-attr]
+        self._file_size += len(data.encode("utf-8"))
+        self.written += len(lines)
+
+    def _should_rotate(self) -> bool:
+        return self._file_size >= self.rotate_bytes or time.time() - self._file_opened >= self.rotate_seconds
+
+    def _rotate(self, first_ts: float) -> None:
+        if self._file is not None:
+            self._file.close()
+            self.rotations += 1
+        now = time.time()
+        # ตั้งชื่อตามเวลาของ record แรกในไฟล์ (record อาจรอใน queue ก่อนถูกเขียน)
+        stamp = datetime.fromtimestamp(min(first_ts, now), timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = self.directory / f"{self.prefix}-{stamp}.jsonl"
+        self._file = path.open("a", encoding="utf-8")
+        self._file_opened = now
+        self._file_size = path.stat().st_size
+        for old in self.files()[: -self.max_files]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def files(self) -> List[Path]:
+        """ไฟล์ log ทั้งหมด เรียงจากเก่าไปใหม่ (ชื่อไฟล์เรียงตามเวลาเริ่ม)"""
+        return sorted(self.directory.glob(f"{self.prefix}-*.jsonl"))
+
+    def _file_start(self, path: Path) -> float:
+        stamp = path.stem[len(self.prefix) + 1 :]
+        return datetime.strptime(stamp, "%Y%m%dT%H%M%S%f").replace(tzinfo=timezone.utc).timestamp()
+
+    def _iter_records(self, start_ts: float, end_ts: float) -> Iterator[Dict[str, Any]]:
+        files = self.files()
+        for i, path in enumerate(files):
+            # ไฟล์ถัดไปเริ่มหลังไฟล์นี้จบ -> ข้ามไฟล์ที่อยู่นอกช่วงได้ทั้งไฟล์
+            if self._file_start(path) > end_ts:
+                break
+            if i + 1 < len(files) and self._file_start(files[i + 1]) < start_ts:
+                continue
+            try:
+                with path.open(encoding="utf-8") as handle:
+                    for line in handle:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # บรรทัดสุดท้ายที่เขียนไม่ครบตอน process ตาย
+                        if start_ts <= record["ts"] <= end_ts:
+                            yield record
+            except FileNotFoundError:
+                continue  # ถูกลบโดย rotation ระหว่างอ่าน
+
+    def read(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        session_id: Optional[str] = None,
+        agent: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Records between ``start`` and ``end`` (naive datetimes are UTC), oldest first.
+        Pending records are flushed first so the window includes the latest events. ``limit`` keeps the newest N.
+        """
+        self.flush()
+        start_ts = _epoch(start) if start is not None else 0.0
+        end_ts = _epoch(end) if end is not None else float("inf")
+        matched: Deque[Dict[str, Any]] = deque(maxlen=limit)
+        for record in self._iter_records(start_ts, end_ts):
+            if session_id is not None and record["session"] != session_id:
+                continue
+            if agent is not None and record["agent"] != agent:
+                continue
+            matched.append(record)
+        return list(matched)
+
+    def flush(self) -> None:
+        self._drain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "files": len(self.files()),
+        }
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# สร้าง encoder ครั้งเดียว (json.dumps ที่มี kwargs จะสร้าง JSONEncoder ใหม่ทุกครั้ง)
+_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def _encode(record: LogRecord) -> str:
+    created, session_id, agent, stage, message, payload = record
+    data = {"ts": created, "session": session_id, "agent": agent, "stage": stage, "message": message, "payload": payload}
+    return _ENCODER.encode(data) + "\n"
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+_default_sink: Optional[LogSink] = None
+_default_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> Optional[LogSink]:
+    """Process-wide sink ตาม ``LOG_SINK`` (``none`` = ไม่เขียนไฟล์)"""
+    global _default_sink
+    if LOG_SINK in ("", "none", "off"):
+        return None
+    with _default_sink_lock:
+        if _default_sink is None:
+            if LOG_SINK != "jsonl":
+                raise ValueError(f"Unsupported LOG_SINK '{LOG_SINK}' (expected 'jsonl' or 'none')")
+            _default_sink = JsonlLogSink()
+            atexit.register(_default_sink.close)
+        return _default_sink
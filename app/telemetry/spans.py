@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Literal, Optional, Tuple
+
+from app.telemetry.log_store import AgentLogStore
+
+SpanKind = Literal["turn", "agent", "tool"]
+
+# span ที่กำลังทำงานใน context ปัจจุบัน (Strands copy context ข้าม thread/event loop ให้แล้ว)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@dataclass
+class Span:
+    """
+    ช่วงเวลาการทำงาน 1 ช่วง: Orchestrator turn -> DomainAgent run -> MCP tool call
+    ทุก span ใน request เดียวกันมี ``trace_id`` เดียวกัน และชี้ไปหา span แม่ด้วย ``parent_id``
+    """
+
+    trace_id: str
+    name: str
+    kind: SpanKind
+    agent: str
+    span_id: str = field(default_factory=_new_id)
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time()
+        return (end - self.start) * 1000
+
+    def mcp_meta(self) -> Dict[str, str]:
+        """ค่า ``_meta`` สำหรับส่ง trace ไปกับ MCP tool call"""
+        return {"trace_id": self.trace_id, "parent_span_id": self.span_id}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "agent": self.agent,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round(self.duration_ms, 2),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(
+    log_store: AgentLogStore,
+    name: str,
+    kind: SpanKind,
+    agent: str,
+    trace_id: Optional[str] = None,
+    **attributes: Any,
+) -> Iterator[Span]:
+    """
+    เปิด span ลูกของ span ปัจจุบัน (หรือเริ่ม trace ใหม่) แล้วบันทึกลง log เป็น stage ``span`` ตอนจบ
+    exception ถูกบันทึกเป็น status ``error`` แล้วส่งต่อตามปกติ
+    """
+    parent = _current_span.get()
+    span = Span(
+        trace_id=trace_id or (parent.trace_id if parent else uuid.uuid4().hex),
+        name=name,
+        kind=kind,
+        agent=agent,
+        parent_id=parent.span_id if parent else None,
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.status = "error"
+        span.attributes["error"] = str(exc) or type(exc).__name__
+        raise
+    finally:
+        span.end = time.time()
+        _current_span.reset(token)
+        tokens = f", {span.input_tokens}/{span.output_tokens} tokens" if span.input_tokens or span.output_tokens else ""
+        log_store.add(agent, "span", f"{kind} {name}: {span.duration_ms:.0f} ms{tokens}", payload=span.as_dict())
+
+
+def usage_snapshot(agent: Any) -> Tuple[int, int]:
+    """(input, output) tokens สะสมของ Strands Agent ใช้หาผลต่างก่อน/หลัง invocation"""
+    metrics = getattr(agent, "event_loop_metrics", None)
+    usage = getattr(metrics, "accumulated_usage", None) or {}
+    return int(usage.get("inputTokens", 0)), int(usage.get("outputTokens", 0))
+
+
+@contextmanager
+def track_usage(span: Span, agent: Any) -> Iterator[None]:
+    """บวก token ที่ Strands Agent ใช้ระหว่าง block นี้เข้า span"""
+    before_in, before_out = usage_snapshot(agent)
+    try:
+        yield
+    finally:
+        after_in, after_out = usage_snapshot(agent)
+        span.input_tokens += after_in - before_in
+        span.output_tokens += after_out - before_out
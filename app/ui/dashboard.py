@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import sys
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import pandas as pd
@@ -11,23 +12,27 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 from app.config import AGENT_SETTINGS
-from app.runtime.runtime import AgentRuntime
+from app.llm.gateway import get_gateway
+from app.runtime.runtime import AgentRuntime, AgentSession
 from app.telemetry.log_store import AgentLogStore
 
 st.set_page_config(page_title="Mango Agent Control Tower", layout="wide")
 
 
-# Initialize Session State
-if "agent_log_store" not in st.session_state:
-    st.session_state["agent_log_store"] = AgentLogStore()
+@st.cache_resource
+def get_runtime() -> AgentRuntime:
+    # Runtime เดียวทั้ง process (model, MCP session, tool catalogue ใช้ร่วมกันทุกผู้ใช้)
+    return AgentRuntime()
 
-if "runtime" not in st.session_state:
-    # สร้าง Runtime ใหม่เมื่อยังไม่มี หรือหลังจากถูกเคลียร์ทิ้ง
-    st.session_state["runtime"] = AgentRuntime(st.session_state["agent_log_store"])
-    st.session_state["chat_history"] = []
 
-runtime: AgentRuntime = st.session_state["runtime"]
-chat_history = st.session_state["chat_history"]
+runtime = get_runtime()
+
+# Initialize Session State (เก็บเฉพาะ state เบา ๆ ต่อผู้ใช้)
+if "agent_session" not in st.session_state:
+    st.session_state["agent_session"] = runtime.create_session()
+
+session: AgentSession = st.session_state["agent_session"]
+chat_history = session.chat_history
 
 st.title("Mango Multi-Agent Control Tower")
 st.caption("ควบคุม 3 เอเจนต์ (IC, PPN, OF) ด้วย Strands + FastMCP")
@@ -37,19 +42,23 @@ with st.sidebar:
     for key, settings in AGENT_SETTINGS.items():
         st.write(f"**{settings.name}** → `{settings.server_url}`")
     
-    # ปุ่ม Reset ที่ปรับปรุงใหม่
+    stats = runtime.stats()
+    st.caption(
+        f"Sessions: {stats['sessions']} · In-flight: {stats['in_flight']}/{stats['max_in_flight']} "
+        f"· Waiting: {stats['waiting']}"
+    )
+    # LLM gateway ของ process นี้ (Bedrock ที่ Orchestrator/DomainAgent เรียก)
+    for region, llm in get_gateway().stats()["clients"].items():
+        st.caption(
+            f"LLM {region}: {llm['in_flight']}/{llm['limit']:g} in-flight · Waiting: {llm['waiting']} "
+            f"· Queue wait p95: {llm['queue_wait_ms']['p95']:.0f} ms · Throttled: {llm['throttles']} "
+            f"· Retries: {llm['retries']}"
+        )
+
+    # ปุ่ม Reset: ล้างเฉพาะบทสนทนาและ log ของ session นี้ (runtime กลางยังอยู่)
     if st.button("Clear conversation & logs", type="primary"):
-        # 1. สั่งปิด Connection เดิมอย่างถูกต้อง (Graceful Shutdown)
-        runtime.shutdown()
-        
-        # 2. ลบ Runtime ออกจาก Session State เพื่อบังคับให้สร้างใหม่ในรอบหน้า
-        del st.session_state["runtime"]
-        
-        # 3. เคลียร์ประวัติแชทและ Log
-        st.session_state["chat_history"] = []
-        st.session_state["agent_log_store"].clear()
-        
-        # 4. สั่ง Rerun เพื่อเริ่มระบบใหม่ทันที
+        session.reset()
+        st.session_state.pop("log_view", None)
         st.rerun()
 
 st.divider()
@@ -66,19 +75,52 @@ if user_message:
     with st.chat_message("user"):
         st.markdown(user_message)
     with st.chat_message("assistant"):
-        with st.spinner("กำลังหาเอเจนต์ที่เหมาะสม..."):
-            try:
-                response_text = runtime.handle(user_message)
-                st.markdown(response_text)
-                chat_history.append({"role": "assistant", "content": response_text})
-            except Exception as e:
-                st.error(f"เกิดข้อผิดพลาด: {e}")
-                # กรณี Error ร้ายแรง อาจแนะนำให้ user กด Reset
-                st.info("ลองกดปุ่ม 'Clear conversation & logs' เพื่อรีเซ็ตระบบ")
+        status = st.status("กำลังหาเอเจนต์ที่เหมาะสม...", expanded=False)
+
+        answer = st.empty()
+        final = {}
+
+        def render_stream():
+            # ส่ง token ของ Orchestrator ให้ st.write_stream, tool event แสดงในกล่องสถานะ
+            for event in session.stream(user_message):
+                if event.kind == "token":
+                    yield event.text
+                elif event.kind == "tool":
+                    status.write(f"**{event.agent}** → `{event.text}`")
+                elif event.kind == "done":
+                    final["text"] = event.text
+                elif event.kind == "error":
+                    raise RuntimeError(event.text)
+
+        try:
+            with answer:
+                st.write_stream(render_stream())
+            # token ที่ stream มารวมข้อความก่อนเรียก tool ด้วย (และคำตอบบางแบบไม่ได้ stream เลย เช่น timeout)
+            # จึงแทนที่ด้วยคำตอบสุดท้ายจาก done และเก็บคำตอบนั้นลงประวัติ
+            response_text = final.get("text", "")
+            answer.markdown(response_text)
+            status.update(label="เสร็จสิ้น", state="complete")
+            chat_history.append({"role": "assistant", "content": response_text})
+        except Exception as e:
+            status.update(label="เกิดข้อผิดพลาด", state="error")
+            st.error(f"เกิดข้อผิดพลาด: {e}")
+            # กรณี Error ร้ายแรง อาจแนะนำให้ user กด Reset
+            st.info("ลองกดปุ่ม 'Clear conversation & logs' เพื่อรีเซ็ตระบบ")
 
 # Log Monitor
 st.subheader("Agent Log Monitor")
-logs = runtime.log_store.tail(300)
+LOG_VIEW_ROWS = 300
+# ดึงเฉพาะ event ที่เปลี่ยนหลัง render ครั้งก่อน (upsert ตาม seq เพราะข้อความ process ต่อท้ายใน event เดิม)
+log_view = st.session_state.setdefault("log_view", {"cursor": 0, "rows": {}})
+page = session.log_store.query(since=log_view["cursor"], limit=LOG_VIEW_ROWS)
+log_rows = log_view["rows"]
+for row in page.events:
+    log_rows[row["seq"]] = row
+# dict คงลำดับ seq อยู่แล้ว (upsert ไม่เปลี่ยนตำแหน่ง) ตัดแถวเก่าสุดทิ้งจากด้านหน้า
+while len(log_rows) > LOG_VIEW_ROWS:
+    del log_rows[next(iter(log_rows))]
+log_view["cursor"] = page.cursor
+logs = list(log_rows.values())
 if logs:
     df = pd.DataFrame(logs)
     st.dataframe(
@@ -86,6 +128,7 @@ if logs:
         use_container_width=True, 
         hide_index=True,
         column_config={
+            "seq": None,
             "timestamp": st.column_config.TextColumn("Time", width="medium"),
             "agent": st.column_config.TextColumn("Agent", width="small"),
             "stage": st.column_config.TextColumn("Stage", width="small"),
@@ -93,4 +136,104 @@ if logs:
         }
     )
 else:
-    st.info("ยังไม่มี log แสดงผล")
\ No newline at end of file
+    st.info("ยังไม่มี log แสดงผล")
+
+# Latency & Tokens: span ของ Orchestrator turn -> DomainAgent -> MCP tool
+st.subheader("Latency & Tokens")
+spans = [row["payload"] for row in session.log_store.query(stage="span").events if row.get("payload")]
+if spans:
+    span_df = pd.DataFrame(spans)
+    tab_waterfall, tab_percentiles = st.tabs(["Waterfall", "p50 / p95 / p99"])
+    with tab_waterfall:
+        turns = span_df[span_df["kind"] == "turn"].sort_values("start", ascending=False)
+        trace_labels = {
+            row.trace_id: f"{datetime.utcfromtimestamp(row.start):%H:%M:%S} · {row.duration_ms / 1000:.1f}s · {row.trace_id[:8]}"
+            for row in turns.itertuples()
+        }
+        if trace_labels:
+            trace_id = st.selectbox("Request", list(trace_labels), format_func=trace_labels.get)
+            trace = span_df[span_df["trace_id"] == trace_id].sort_values("start").copy()
+            origin = trace["start"].min()
+            trace["start_ms"] = (trace["start"] - origin) * 1000
+            trace["end_ms"] = trace["start_ms"] + trace["duration_ms"]
+            trace["label"] = trace["kind"] + " · " + trace["name"] + " #" + trace["span_id"].str[:4]
+            # altair ใช้เฉพาะกราฟนี้ (import ~300 ms) -> import ตอนมี span ให้วาดครั้งแรก
+            import altair as alt
+
+            chart = (
+                alt.Chart(trace)
+                .mark_bar()
+                .encode(
+                    x=alt.X("start_ms:Q", title="ms"),
+                    x2="end_ms:Q",
+                    y=alt.Y("label:N", sort=None, title=None),
+                    color=alt.Color("kind:N"),
+                    tooltip=["name", "agent", "duration_ms", "input_tokens", "output_tokens", "status"],
+                )
+            )
+            st.altair_chart(chart, use_container_width=True)
+            # token ของ Orchestrator กับ DomainAgent แยกกัน (tool span ไม่มี token) จึงรวมสองชนิดนี้
+            tokens = trace[trace["kind"].isin(["turn", "agent"])]
+            st.caption(f"Tokens: {int(tokens['input_tokens'].sum())} in · {int(tokens['output_tokens'].sum())} out")
+    with tab_percentiles:
+        grouped = span_df.groupby(["kind", "name"])
+        summary = grouped["duration_ms"].quantile([0.5, 0.95, 0.99]).unstack()
+        summary.columns = ["p50_ms", "p95_ms", "p99_ms"]
+        summary.insert(0, "calls", grouped.size())
+        summary["avg_input_tokens"] = grouped["input_tokens"].mean().round(1)
+        summary["avg_output_tokens"] = grouped["output_tokens"].mean().round(1)
+        summary["errors"] = grouped["status"].apply(lambda s: int((s == "error").sum()))
+        st.dataframe(summary.round(1).reset_index(), use_container_width=True, hide_index=True)
+else:
+    st.info("ยังไม่มี span (ส่งคำถามเพื่อเริ่มเก็บข้อมูล)")
+
+# Routing: turn ที่ router ส่งตรงไป DomainAgent (ข้าม Orchestrator LLM) เทียบกับ turn ที่ LLM เลือกเอง
+st.subheader("Routing")
+routes = [
+    {"timestamp": row["timestamp"], **row["payload"]}
+    for row in session.log_store.query(stage="route").events
+    if row.get("payload")
+]
+if routes:
+    route_df = pd.DataFrame(routes)
+    fast = route_df[route_df["route"] == "fast"]
+    saved = pd.to_numeric(fast.get("saved_ms"), errors="coerce") if not fast.empty else pd.Series(dtype=float)
+    col_share, col_total, col_avg = st.columns(3)
+    col_share.metric("Fast path", f"{len(fast)}/{len(route_df)}", f"{len(fast) / len(route_df):.0%}")
+    col_total.metric("Saved (est.)", f"{saved.sum() / 1000:.1f} s")
+    col_avg.metric("Saved / fast turn", f"{saved.mean():.0f} ms" if saved.notna().any() else "-")
+    st.dataframe(
+        route_df.reindex(columns=["timestamp", "route", "method", "agent", "confidence", "reason", "saved_ms"]),
+        use_container_width=True,
+        hide_index=True,
+    )
+else:
+    st.info("ยังไม่มีการ route")
+
+# Log Replay: โหลด log ย้อนหลังจาก sink (ข้าม restart ได้) ตามช่วงเวลา
+if runtime.log_sink is not None:
+    with st.expander("Log Replay (ย้อนหลังจากไฟล์)"):
+        now = datetime.now()
+        col_start, col_end, col_scope = st.columns(3)
+        start_day = col_start.date_input("ตั้งแต่วันที่", value=(now - timedelta(hours=1)).date())
+        start_time = col_start.time_input("เวลา", value=(now - timedelta(hours=1)).time(), key="replay_start_time")
+        end_day = col_end.date_input("ถึงวันที่", value=now.date())
+        end_time = col_end.time_input("เวลา", value=now.time(), key="replay_end_time")
+        only_session = col_scope.checkbox("เฉพาะ session นี้", value=True)
+        replay_agent = col_scope.selectbox(
+            "Agent", ["ทั้งหมด", "User", "Orchestrator", *[a.name for a in AGENT_SETTINGS.values()]]
+        )
+        if st.button("Replay"):
+            # เวลาที่เลือกเป็นเวลาท้องถิ่น -> แปลงเป็น UTC ให้ตรงกับ sink
+            start = datetime.combine(start_day, start_time).astimezone()
+            end = datetime.combine(end_day, end_time).astimezone()
+            records = runtime.log_sink.read(
+                start=start,
+                end=end,
+                session_id=session.session_id if only_session else None,
+                agent=None if replay_agent == "ทั้งหมด" else replay_agent,
+            )
+            replayed = AgentLogStore.replay(records, max_length=max(len(records), 1)).as_dicts()
+            st.caption(f"{len(replayed)} events ({len(records)} records)")
+            if replayed:
+                st.dataframe(pd.DataFrame(replayed).drop(columns=["seq"]), use_container_width=True, hide_index=True)
@@ -0,0 +1,105 @@
+"""
+Benchmark: ขนาด prompt (ประวัติสนทนาที่ส่งให้โมเดล ประมาณด้วย estimate_tokens) ตลอด session 50 turn
+เทียบ conversation manager ค่าเริ่มต้นของ Strands (sliding window 40 ข้อความ) กับ BoundedContextManager ตาม ContextPolicy
+ของแต่ละ agent (ใช้ stub model ไม่เรียก Bedrock; tool คืนผล read_report จริงจาก DataRepository)
+
+    python -m benchmarks.bench_context [--turns 50]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any, Callable, Dict, List
+
+from strands import Agent, tool
+from strands.agent.conversation_manager import ConversationManager, SlidingWindowConversationManager
+
+from app.agents.context import BoundedContextManager, history_tokens
+from app.config import AGENT_SETTINGS, ORCHESTRATOR_CONTEXT, TOOL_RESULT_MAX_TEXT, ContextPolicy
+from app.data.repository import DataRepository
+from app.mcp_servers.encoding import encode_rows
+from benchmarks.stubs import StubModel
+
+CHECKPOINTS = (1, 10, 25, 50)
+
+
+class RecordingModel(StubModel):
+    """StubModel ที่จดขนาดประวัติที่ได้รับในทุก model call"""
+
+    def __init__(self) -> None:
+        super().__init__(answer="สรุป: คลังนี้มีวัสดุค้างสต็อกเกิน 180 วัน 12 รายการ ควรตรวจสอบการเบิกใช้")
+        self.prompt_tokens: List[int] = []
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs: Any):
+        self.prompt_tokens.append(history_tokens(messages))
+        async for event in super().stream(messages, tool_specs, system_prompt, **kwargs):
+            yield event
+
+
+def _tool_outputs(repo: DataRepository) -> Dict[str, Callable[[int], Any]]:
+    aging = repo.read_report("aging_stock_balance")
+    return {
+        # Reporter: ตารางจาก read_report (columnar ตามค่าเริ่มต้นของ server)
+        "Reporter": lambda i: encode_rows(aging, "columnar", max_text=TOOL_RESULT_MAX_TEXT),
+        # OF: JSON ของรายการเบิกหนึ่งรายการ
+        "Operations Finance": lambda i: {"expense_code": "A0111", "description": f"ค่าแท็กซี่ {100 + i} บาท", "amount": 100 + i},
+        # Orchestrator: คำตอบข้อความจาก DomainAgent
+        "Orchestrator": lambda i: "รายงาน aging: " + json.dumps(aging[:5], ensure_ascii=False, default=str),
+    }
+
+
+def run_session(manager: ConversationManager, output: Callable[[int], Any], turns: int) -> List[int]:
+    model = RecordingModel()
+    counter = {"i": 0}
+
+    @tool(name="fetch", description="Fetch data for the question.")
+    def fetch() -> Any:
+        counter["i"] += 1
+        return output(counter["i"])
+
+    agent = Agent(model=model, tools=[fetch], conversation_manager=manager, callback_handler=None)
+    per_turn: List[int] = []
+    for i in range(turns):
+        before = len(model.prompt_tokens)
+        agent(f"aging stock คลัง {i % 7:03d} มีวัสดุค้างเกิน 180 วันกี่รายการ")
+        # turn หนึ่งมี 2 model call (เลือก tool, สรุป) -> นับ prompt ของทั้ง turn
+        per_turn.append(sum(model.prompt_tokens[before:]))
+    return per_turn
+
+
+def _row(label: str, per_turn: List[int]) -> str:
+    points = " | ".join(f"{per_turn[t - 1]:>7}" if t <= len(per_turn) else f"{'-':>7}" for t in CHECKPOINTS)
+    return f"{label:<48} | {points} | {sum(per_turn):>9}"
+
+
+def run(turns: int) -> None:
+    repo = DataRepository()
+    outputs = _tool_outputs(repo)
+    policies: Dict[str, ContextPolicy] = {
+        "Orchestrator": ORCHESTRATOR_CONTEXT,
+        **{config.name: config.context for config in AGENT_SETTINGS.values()},
+    }
+    header = f"{'agent / manager':<48} | " + " | ".join(f"{f'turn {t}':>7}" for t in CHECKPOINTS) + f" | {'total':>9}"
+    print("prompt tokens per turn (history sent to the model, summed over the turn's model calls)")
+    print(header)
+    print("-" * len(header))
+    for name in ("Orchestrator", "Reporter", "Operations Finance"):
+        policy = policies[name]
+        baseline = run_session(SlidingWindowConversationManager(), outputs[name], turns)
+        bounded = run_session(BoundedContextManager(policy), outputs[name], turns)
+        label = "stateless" if policy.max_turns == 0 else f"{policy.max_turns} turns / {policy.max_tokens} tok"
+        print(_row(f"{name}: strands default (40 msgs)", baseline))
+        print(_row(f"{name}: bounded ({label})", bounded))
+        print(f"{'':<48}   saved {1 - sum(bounded) / sum(baseline):.0%} of prompt tokens over {turns} turns")
+    print("-" * len(header))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+    run(args.turns)
+
+
+if __name__ == "__main__":
+    main()
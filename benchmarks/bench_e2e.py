@@ -0,0 +1,327 @@
+"""
+End-to-end benchmark แบบ offline: AgentSession.handle -> Orchestrator -> DomainAgent -> MCP tool (HTTP) -> DataRepository
+- model ของทุก agent เป็น ScriptedModel (หน่วงเวลาได้ และเรียก tool ตาม script ต่อ agent) แทน Bedrock
+- DataRepository ใช้ StubBedrockClient แทน boto3 และ Aging report สังเคราะห์ตามจำนวนแถวที่กำหนด (0 = ไฟล์ตัวอย่าง)
+- server.py รันใน process เดียวกันบน loopback port ว่าง (FastMCP + middleware + worker pool ตัวจริง)
+รายงาน throughput, p50/p99, เวลาแยกตามช่วง (orchestrator / domain agent / transport / คิว / tool) และ RSS
+แล้วบันทึกเป็น JSON ไว้เทียบกับรอบก่อนด้วย ``--compare``
+
+    python -m benchmarks.bench_e2e --rows 0 100000 --sessions 1 8 --turns 4 --latency 0.05
+    python -m benchmarks.bench_e2e --compare benchmarks/results/e2e_<before>.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import pandas as pd
+
+import app.config as config
+from app.agents.mcp_pool import MCPConnection, MCPConnectionPool
+from app.data.expense_cache import ExpenseCodeCache
+from app.data.frame_cache import FrameCache
+from app.data.repository import DATA_SOURCES, DataRepository
+from app.mcp_servers import server
+from app.runtime.runtime import AgentRuntime
+from app.telemetry.sink import JsonlLogSink
+from benchmarks.bench_frame_memory import build_csv
+from benchmarks.load_sessions import percentile, rss_mb
+from benchmarks.stubs import ScriptedModel, StubBedrockClient
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# ลำดับ tool ที่ DomainAgent แต่ละตัวเรียกต่อ 1 คำถาม (key = tool ที่บอกว่าเป็น agent ไหน)
+SCRIPTS = {
+    "get_report_columns": [
+        ("get_report_columns", {"report_name": "aging"}),
+        (
+            "query_report",
+            {
+                "report_name": "aging",
+                "filters": [{"column": "diff_day", "op": "gt", "value": 180}],
+                "sort": [{"column": "diff_day", "descending": True}],
+                "limit": 20,
+            },
+        ),
+        ("get_aging_buckets", {}),
+    ],
+    "get_plan": [("get_plan_columns", {}), ("get_plan", {"query": "{prompt}"})],
+    "phase_structure": [("phase_structure", {"text": "{prompt}"}), ("get_expense_code", {"description": "{prompt}"})],
+}
+
+# มีทั้งข้อความที่ router ส่งตรงไป agent และข้อความที่ต้องผ่าน Orchestrator LLM
+WORKLOAD = [
+    "aging stock เกิน 180 วัน",
+    "แผนงานฐานราก",
+    "เบิกค่าแท็กซี่ 350 บาท",
+    "ช่วยสรุปรายงานสต็อกที่ค้างนานให้หน่อย",
+    "ค่าอาหารทีมงานวันนี้",
+]
+
+
+class LoopbackPool(MCPConnectionPool):
+    """ส่งทุก MCP URL ไปที่ server ของ benchmark (port ที่สุ่มได้ แทน MAIN_SERVER_PORT)"""
+
+    def __init__(self, port: int) -> None:
+        super().__init__()
+        self.port = port
+
+    def get(self, url: str) -> MCPConnection:
+        parts = urlsplit(url)
+        return super().get(urlunsplit(parts._replace(netloc=f"127.0.0.1:{self.port}")))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, timeout: float = 30.0) -> None:
+    thread = threading.Thread(
+        target=lambda: asyncio.run(
+            server.mcp.run_http_async(show_banner=False, host="127.0.0.1", port=port, log_level="warning")
+        ),
+        name="bench-mcp-server",
+        daemon=True,
+    )
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"MCP server did not start on port {port}")
+
+
+def load_repository(rows: int, workdir: Path, bedrock_latency: float) -> DataRepository:
+    sources = dict(DATA_SOURCES)
+    if rows:
+        _, schema, options = sources["aging"]
+        sources["aging"] = (build_csv(rows, workdir), schema, options)
+    # cache ทั้งสองชนิดอยู่ใน workdir: ไม่ทับ cache จริงของ app และวัดการโหลดแบบ cold ทุกครั้ง
+    return DataRepository(
+        sources=sources,
+        bedrock_client=StubBedrockClient(bedrock_latency),
+        frame_cache=FrameCache(workdir / "frame_cache", enabled=False),
+        expense_cache=ExpenseCodeCache(workdir / f"expense_{rows}.sqlite", source_path=sources["expense"][0]),
+        # โหลดข้อมูลให้เสร็จก่อนวัด (ไม่งั้น request แรกรวมเวลาโหลดชุดข้อมูล)
+        warm_up=True,
+    )
+
+
+def _stage_breakdown(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """แยกเวลาเฉลี่ยต่อ request: turn = orchestrator + domain agent (model/framework) + tool (transport + คิว + run)"""
+    by_trace: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        by_trace[span["trace_id"]].append(span)
+    totals: Dict[str, List[float]] = defaultdict(list)
+    tools: Dict[str, List[float]] = defaultdict(list)
+    for trace in by_trace.values():
+        turns = [s for s in trace if s["kind"] == "turn"]
+        if not turns:
+            continue
+        agents = [s for s in trace if s["kind"] == "agent"]
+        tool_spans = [s for s in trace if s["kind"] == "tool"]
+        agent_ms = sum(s["duration_ms"] for s in agents)
+        tool_ms = sum(s["duration_ms"] for s in tool_spans)
+        server_ms = sum((s.get("attributes") or {}).get("server_ms", 0.0) for s in tool_spans)
+        wait_ms = sum((s.get("attributes") or {}).get("wait_ms", 0.0) for s in tool_spans)
+        run_ms = sum((s.get("attributes") or {}).get("run_ms", 0.0) for s in tool_spans)
+        totals["turn_ms"].append(turns[0]["duration_ms"])
+        totals["orchestrator_ms"].append(turns[0]["duration_ms"] - agent_ms)
+        totals["domain_agent_ms"].append(agent_ms - tool_ms)
+        totals["tool_transport_ms"].append(tool_ms - server_ms)
+        totals["tool_server_ms"].append(server_ms - wait_ms - run_ms)
+        totals["tool_queue_ms"].append(wait_ms)
+        totals["tool_run_ms"].append(run_ms)
+        for s in tool_spans:
+            tools[s["name"]].append(s["duration_ms"])
+    return {
+        "stages": {name: round(statistics.mean(values), 2) for name, values in totals.items()},
+        "tools": {
+            name: {"calls": len(values), "p50_ms": round(percentile(values, 50), 2), "p99_ms": round(percentile(values, 99), 2)}
+            for name, values in sorted(tools.items())
+        },
+    }
+
+
+def run_level(runtime: AgentRuntime, n_sessions: int, turns: int) -> Dict[str, Any]:
+    sessions = [runtime.create_session() for _ in range(n_sessions)]
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def user(index: int) -> None:
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                sessions[index].handle(WORKLOAD[(index + turn) % len(WORKLOAD)])
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    spans, routes = [], defaultdict(int)
+    for session in sessions:
+        events = session.log_store.query(limit=session.log_store.max_length).events
+        spans += [e["payload"] for e in events if e["stage"] == "span" and e.get("payload")]
+        for e in events:
+            if e["stage"] == "route" and e.get("payload"):
+                routes[e["payload"].get("route", "llm")] += 1
+        session.close()
+
+    return {
+        "sessions": n_sessions,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "routes": dict(routes),
+        **_stage_breakdown(spans),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_level(rows: int, result: Dict[str, Any]) -> None:
+    stages = result["stages"]
+    print(
+        f"{rows or 'sample':>8} | {result['sessions']:>8} | {result['requests']:>4} | {result['errors']:>3} | "
+        f"{result['rps']:>6.1f} | {result['p50_ms'] or 0:>7.0f} | {result['p99_ms'] or 0:>7.0f} | "
+        f"{stages.get('orchestrator_ms', 0):>6.0f} | {stages.get('domain_agent_ms', 0):>6.0f} | "
+        f"{stages.get('tool_transport_ms', 0):>6.1f} | {stages.get('tool_queue_ms', 0):>5.1f} | "
+        f"{stages.get('tool_run_ms', 0):>6.1f} | {result['rss_mb']:>7.0f}"
+    )
+
+
+def compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {(r["rows"], r["sessions"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path.name} ({baseline['meta'].get('commit')}):")
+    matched = 0
+    for result in current["results"]:
+        before = previous.get((result["rows"], result["sessions"]))
+        if before is None or not before.get("p50_ms") or not result.get("p50_ms"):
+            continue
+        matched += 1
+        deltas = ", ".join(
+            f"{key} {result[key] / before[key] - 1:+.0%}" for key in ("rps", "p50_ms", "p99_ms") if before.get(key)
+        )
+        print(f"  rows={result['rows'] or 'sample'} sessions={result['sessions']}: {deltas}")
+    if not matched:
+        print("  no run with the same rows/sessions to compare")
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # ทุก agent ใช้ model กลางตัวเดียวผ่าน get_shared_model() -> แทนที่ก่อนสร้าง runtime
+    config._shared_model = ScriptedModel(SCRIPTS, latency=args.latency)
+    server.memo.enabled = not args.no_memo
+    port = args.port or _free_port()
+    start_server(port)
+
+    results: List[Dict[str, Any]] = []
+    header = (
+        f"{'rows':>8} | {'sessions':>8} | {'reqs':>4} | {'err':>3} | {'rps':>6} | {'p50 ms':>7} | {'p99 ms':>7} | "
+        f"{'orch':>6} | {'agent':>6} | {'transp':>6} | {'queue':>5} | {'tool':>6} | {'RSS MB':>7}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        workdir = Path(directory)
+        for rows in args.rows:
+            load_started = time.perf_counter()
+            # tool ของ server อ่าน ``server.repo`` ทุก call -> เปลี่ยนชุดข้อมูลได้โดยไม่ต้อง restart server
+            server.repo = load_repository(rows, workdir, args.bedrock_latency)
+            server.memo.clear()
+            load_s = time.perf_counter() - load_started
+            print(f"\naging rows: {rows or 'sample'} (loaded in {load_s:.2f}s)")
+            print(header)
+            print("-" * len(header))
+            pool = LoopbackPool(port)
+            runtime = AgentRuntime(
+                pool=pool,
+                log_sink=JsonlLogSink(workdir / "logs"),
+                max_in_flight=args.max_in_flight,
+                queue_timeout=600,
+            )
+            try:
+                for n_sessions in args.sessions:
+                    result = run_level(runtime, n_sessions, args.turns)
+                    result.update(rows=rows, load_s=round(load_s, 3), tool_cache=server.memo.stats())
+                    results.append(result)
+                    _print_level(rows, result)
+            finally:
+                runtime.shutdown()
+                runtime.log_sink.close()
+                pool.close_all()
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[0, 100_000], help="จำนวนแถว Aging (0 = ไฟล์ตัวอย่าง)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="เวลาต่อ model call ของ stub (วินาที)")
+    parser.add_argument("--bedrock-latency", type=float, default=0.05, help="เวลาต่อ invoke_model ของ stub boto3")
+    parser.add_argument("--max-in-flight", type=int, default=config.RUNTIME_MAX_IN_FLIGHT)
+    parser.add_argument("--no-memo", action="store_true", help="ปิด memoization ของ tool บน server")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="ไฟล์ JSON ผลลัพธ์ (ค่าเริ่มต้น benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, default=None, help="JSON ของรอบก่อนเพื่อแสดงผลต่าง")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or RESULTS_DIR / f"e2e_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nsaved {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
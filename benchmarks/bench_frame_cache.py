@@ -0,0 +1,63 @@
+"""
+Benchmark: เวลาโหลด Aging report ตอน start แบบ parse CSV ทุกครั้ง (cold) vs อ่านจาก Frame Cache (warm)
+รวมกรณีแตะไฟล์ (mtime เปลี่ยนแต่เนื้อหาเดิม -> เทียบ sha1) และกรณีไฟล์เปลี่ยน (คืน cache เก่า + re-ingest ใน background)
+
+    python -m benchmarks.bench_frame_cache --rows 50000 300000 --format feather parquet
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from app.data.frame_cache import FrameCache
+from app.data.schemas import AGING_SCHEMA, load_frame
+from benchmarks.bench_frame_memory import build_csv
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(sizes: List[int], formats: List[str]) -> None:
+    print(f"pandas {pd.__version__}")
+    print(f"{'rows':>9} | {'format':<8} | {'cold (s)':>8} | {'warm (s)':>8} | {'touch (s)':>9} | {'stale (s)':>9} | {'speedup':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            path = build_csv(rows, Path(directory))
+            loader = lambda: load_frame(path, AGING_SCHEMA)
+            for fmt in formats:
+                cache = FrameCache(Path(directory) / f"cache-{fmt}", fmt)
+                if not cache.enabled:
+                    print("pyarrow is not installed; frame cache disabled")
+                    return
+                _, cold = _timed(lambda: cache.load("aging", path, loader, "bench"))
+                _, warm = _timed(lambda: cache.load("aging", path, loader, "bench"))
+                os.utime(path)
+                _, touch = _timed(lambda: cache.load("aging", path, loader, "bench"))
+                # ต่อท้ายแถวเดิมซ้ำ 1 แถว = ไฟล์ต้นทางเปลี่ยน
+                last_line = path.read_text(encoding="utf-8").splitlines(keepends=True)[-1]
+                with open(path, "a", encoding="utf-8") as handle:
+                    handle.write(last_line)
+                _, stale = _timed(lambda: cache.load("aging", path, loader, "bench", on_refresh=lambda *_: None))
+                while cache._refreshing:
+                    time.sleep(0.05)
+                print(
+                    f"{rows:>9} | {fmt:<8} | {cold:>8.3f} | {warm:>8.3f} | {touch:>9.3f} | {stale:>9.3f} | {cold / warm:>6.0f}x"
+                )
+            path.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 300_000])
+    parser.add_argument("--format", dest="formats", nargs="+", default=["feather", "parquet"])
+    args = parser.parse_args()
+    run(args.rows, args.formats)
@@ -0,0 +1,78 @@
+"""
+Benchmark: หน่วยความจำ/เวลาโหลด Aging report แบบ dtype=str ทุกคอลัมน์ (เดิม) vs ReportSchema (C parser / pyarrow)
+ขยายไฟล์ตัวอย่างเป็นจำนวนแถวที่ต้องการ (คีย์ที่ควรไม่ซ้ำถูกต่อท้ายด้วยเลขรอบ)
+
+    python -m benchmarks.bench_frame_memory --rows 50000 300000
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from app.config import AGING_REPORT_PATH
+from app.data.schemas import AGING_SCHEMA, load_frame
+
+UNIQUE_COLUMNS = ["pk_report_stock_balance", "sort_key_report_stock_balance", "GSI_ItemDate_Doc", "GSI_Wh_Prein_Item_Date_Doc", "docno"]
+
+
+def build_csv(rows: int, directory: Path) -> Path:
+    sample = pd.read_csv(AGING_REPORT_PATH, dtype=str)
+    repeats = -(-rows // len(sample))
+    frames = []
+    for i in range(repeats):
+        chunk = sample.copy()
+        for column in UNIQUE_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = chunk[column] + f"-{i}"
+        frames.append(chunk)
+    path = directory / f"aging_{rows}.csv"
+    pd.concat(frames, ignore_index=True).head(rows).to_csv(path, index=False)
+    return path
+
+
+def legacy_load(path: Path, dtype=str) -> pd.DataFrame:
+    # เหมือน DataRepository._load_csv เวอร์ชันเดิม
+    df = pd.read_csv(path, dtype=dtype).fillna("")
+    df["diff_day"] = pd.to_numeric(df["diff_day"], errors="coerce").fillna(0)
+    return df
+
+
+def _measure(fn, path: Path):
+    start = time.perf_counter()
+    df = fn(path)
+    return df.memory_usage(deep=True).sum() / 1024 ** 2, time.perf_counter() - start
+
+
+def run(sizes: List[int]) -> None:
+    # pandas 2.x เก็บ dtype=str เป็น Python object; pandas 3 ใช้ string dtype แบบ arrow -> แสดงทั้งสองแบบ
+    loaders = [
+        ("dtype=object", lambda p: legacy_load(p, dtype=object)),
+        ("dtype=str (เดิม)", legacy_load),
+        ("schema + c", lambda p: load_frame(p, AGING_SCHEMA, engine="c")),
+    ]
+    if importlib.util.find_spec("pyarrow") is not None:
+        loaders.append(("schema + pyarrow", lambda p: load_frame(p, AGING_SCHEMA, engine="pyarrow")))
+    print(f"pandas {pd.__version__}")
+    print(f"{'rows':>9} | {'loader':<18} | {'memory (MB)':>11} | {'vs old':>7} | {'load (s)':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            path = build_csv(rows, Path(directory))
+            baseline = None
+            for name, loader in loaders:
+                memory, seconds = _measure(loader, path)
+                baseline = baseline or memory
+                print(f"{rows:>9} | {name:<18} | {memory:>11.1f} | {memory / baseline:>6.0%} | {seconds:>8.2f}")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 300_000])
+    args = parser.parse_args()
+    run(args.rows)
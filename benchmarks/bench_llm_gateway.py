@@ -0,0 +1,122 @@
+"""
+Benchmark: burst ของการจัดหมวดค่าใช้จ่าย (invoke_model) ไปยัง fake Bedrock ที่รับงานพร้อมกันได้จำกัด
+เทียบ boto3 client ตรง ๆ แบบเดิม (retry ของ botocore ค่าเริ่มต้น) กับ client ของ LLMGateway (AIMD + jittered backoff)
+prompt ใช้รายการรหัสเต็มเป็นส่วนต้นที่ mark ให้ cache -> รายงานสัดส่วน token ที่อ่านจาก cache
+ปิดท้ายด้วย Strands Agent หนึ่ง call ผ่าน ``LLMGateway.bedrock_model`` (converse) เพื่อตรวจ cache point ของ system prompt
+
+    python -m benchmarks.bench_llm_gateway [--requests 200] [--threads 32] [--capacity 4] [--latency 0.05]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import boto3
+from botocore.exceptions import ClientError
+
+from app.llm.gateway import AdaptiveLimiter, LLMGateway
+from benchmarks.fake_bedrock import FakeBedrock
+
+MODEL_ID = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+REGION = "us-east-1"
+# รายการรหัสขนาดใกล้เคียง ap_expensother.csv (ส่วนคงที่ของ prompt)
+MASTER_LIST = "\n".join(f"{chr(65 + i % 8)}{i:04d} - ค่าใช้จ่ายประเภทที่ {i}" for i in range(1, 600))
+PREFIX = f"คุณเป็นผู้เชี่ยวชาญด้านการจัดหมวดหมู่ค่าใช้จ่าย\n\nรายการค่าใช้จ่ายที่มี:\n{MASTER_LIST}\n"
+
+
+def _call(gateway: LLMGateway, client: Any, i: int) -> Dict[str, Any]:
+    body = gateway.anthropic_body(PREFIX + f'\nคำอธิบาย: "ค่าแท็กซี่ {100 + i} บาท"\n', max_tokens=50, cached_prefix=PREFIX)
+    start = time.perf_counter()
+    try:
+        client.invoke_model(modelId=MODEL_ID, body=body)["body"].read()
+        return {"ok": True, "latency": time.perf_counter() - start}
+    except ClientError as e:
+        return {"ok": False, "latency": time.perf_counter() - start, "error": e.response["Error"]["Code"]}
+
+
+def run_burst(
+    label: str, gateway: LLMGateway, client: Any, fake: FakeBedrock, requests: int, threads: int
+) -> Dict[str, Any]:
+    fake.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results: List[Dict[str, Any]] = list(pool.map(lambda i: _call(gateway, client, i), range(requests)))
+    wall = time.perf_counter() - start
+    latencies = sorted(r["latency"] for r in results if r["ok"])
+    counters = dict(fake.counters)
+    cached = counters["cache_read_tokens"]
+    return {
+        "label": label,
+        "ok": len(latencies),
+        "failed": requests - len(latencies),
+        "server_429": counters["throttled"],
+        "peak": counters["peak_concurrency"],
+        "wall_s": round(wall, 2),
+        "p50_s": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_s": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "cache_read_share": round(cached / max(1, counters["input_tokens"]), 2),
+    }
+
+
+def check_agent(gateway: LLMGateway, fake: FakeBedrock) -> None:
+    from strands import Agent
+
+    fake.reset()
+    model = gateway.bedrock_model(MODEL_ID, REGION, streaming=False)
+    agent = Agent(model=model, system_prompt="SYSTEM ROLE: Reporter Agent. " * 300, callback_handler=None)
+    agent("สรุป aging stock")
+    agent("แล้วคลัง 002 ล่ะ")
+    print(
+        f"Strands agent via gateway: served={fake.counters['served']} "
+        f"cache_write_tokens={fake.counters['cache_write_tokens']} cache_read_tokens={fake.counters['cache_read_tokens']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=4, help="request พร้อมกันที่ fake endpoint รับได้")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # boto3 ต้องมี credential ไว้เซ็น request (fake endpoint ไม่ตรวจ)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "fake")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "fake")
+    fake = FakeBedrock(args.capacity, args.latency, args.throttle_rate).start()
+    try:
+        raw = boto3.client("bedrock-runtime", region_name=REGION, endpoint_url=fake.url)
+        gateway = LLMGateway(endpoint_url=fake.url, limiter_factory=lambda: AdaptiveLimiter(max_limit=args.threads))
+        gated = gateway.client(REGION)
+
+        rows = [
+            run_burst("boto3 client (botocore retries)", gateway, raw, fake, args.requests, args.threads),
+            run_burst("LLMGateway (AIMD + backoff)", gateway, gated, fake, args.requests, args.threads),
+        ]
+        print(f"{args.requests} requests from {args.threads} threads; fake capacity {args.capacity}, latency {args.latency}s")
+        header = f"{'client':<34} | {'ok':>4} | {'failed':>6} | {'429s':>5} | {'peak':>4} | {'wall s':>6} | {'p50 s':>6} | {'p95 s':>6} | cache"
+        print(header)
+        print("-" * len(header))
+        for r in rows:
+            print(
+                f"{r['label']:<34} | {r['ok']:>4} | {r['failed']:>6} | {r['server_429']:>5} | {r['peak']:>4} | "
+                f"{r['wall_s']:>6} | {r['p50_s'] or '-':>6} | {r['p95_s'] or '-':>6} | {r['cache_read_share']:.0%}"
+            )
+        stats = gated.stats()
+        print(
+            f"gateway: limit={stats['limit']} retries={stats['retries']} throttles={stats['throttles']} "
+            f"decreases={stats['decreases']} queue wait p50={stats['queue_wait_ms']['p50']} ms "
+            f"p95={stats['queue_wait_ms']['p95']} ms max={stats['queue_wait_ms']['max']} ms"
+        )
+        check_agent(gateway, fake)
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
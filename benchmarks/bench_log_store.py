@@ -0,0 +1,95 @@
+"""
+Benchmark: AgentLogStore แบบ deque + asdict (เดิม) vs ring buffer + index สำหรับ add/tail/delta query
+คอลัมน์ ``add sink`` = add พร้อมส่งต่อไป JsonlLogSink (เขียนไฟล์ใน background thread)
+
+    python -m benchmarks.bench_log_store --sizes 2000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from app.telemetry.log_store import AgentLogStore
+from app.telemetry.sink import JsonlLogSink
+
+AGENTS = ["User", "Orchestrator", "IC Agent", "PPN Agent", "OF Agent"]
+STAGES = ["input", "tool", "output", "error", "metric"]
+
+
+@dataclass
+class LegacyLogEvent:
+    timestamp: str
+    agent: str
+    stage: str
+    message: str
+    payload: Optional[Dict[str, Any]] = None
+
+
+class LegacyLogStore:
+    # เหมือน AgentLogStore เวอร์ชันเดิม (ตัด process buffering ออกเพราะไม่มีผลกับการวัด)
+    def __init__(self, max_length: int) -> None:
+        self._events: Deque[LegacyLogEvent] = deque(maxlen=max_length)
+
+    def add(self, agent: str, stage: str, message: str, payload: Optional[Dict[str, Any]] = None) -> None:
+        self._events.append(LegacyLogEvent(datetime.utcnow().isoformat(), agent, stage, message.strip(), payload))
+
+    def tail(self, limit: int = 200) -> List[Dict[str, Any]]:
+        return [asdict(e) for e in list(self._events)[-limit:]]
+
+
+def _fill(store, events: int) -> float:
+    payload = {"tool": {"name": "read_report", "input": {"report_name": "aging"}}}
+    start = time.perf_counter()
+    for i in range(events):
+        store.add(AGENTS[i % len(AGENTS)], STAGES[i % len(STAGES)], f"event {i}", payload if i % 7 == 0 else None)
+    return time.perf_counter() - start
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], tail: int, repeat: int) -> None:
+    print(
+        f"{'events':>9} | {'add old (us)':>12} | {'add new (us)':>12} | {'add sink (us)':>13} | {'tail old (ms)':>13} | "
+        f"{'tail new (ms)':>13} | {'agent tail (ms)':>15} | {'delta 10 (ms)':>13}"
+    )
+    for events in sizes:
+        legacy, store = LegacyLogStore(events), AgentLogStore(events)
+        add_old = _fill(legacy, events) / events
+        add_new = _fill(store, events) / events
+        with tempfile.TemporaryDirectory() as directory:
+            sink = JsonlLogSink(directory)
+            add_sink = _fill(AgentLogStore(events, sink=sink, session_id="bench"), events) / events
+            sink.close()
+        tail_old = _time(lambda: legacy.tail(tail), repeat)
+        tail_new = _time(lambda: store.tail(tail), repeat)
+        agent_tail = _time(lambda: store.query(agent="OF Agent", limit=tail), repeat)
+
+        # delta: render ครั้งก่อนได้ cursor แล้วมี event ใหม่ 10 รายการ
+        cursor = store.query(limit=1).cursor
+        _fill(store, 10)
+        delta = _time(lambda: store.query(since=cursor, limit=tail), repeat)
+        print(
+            f"{events:>9} | {add_old * 1e6:>12.2f} | {add_new * 1e6:>12.2f} | {add_sink * 1e6:>13.2f} | {tail_old * 1000:>13.2f} | "
+            f"{tail_new * 1000:>13.3f} | {agent_tail * 1000:>15.3f} | {delta * 1000:>13.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 100_000, 1_000_000])
+    parser.add_argument("--tail", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.tail, args.repeat)
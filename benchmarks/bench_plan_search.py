@@ -0,0 +1,79 @@
+"""
+Benchmark: full-table ``str.contains`` scan (เดิม) vs PlanSearchIndex สำหรับ get_plan
+
+    python -m benchmarks.bench_plan_search --sizes 10000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.data.search_index import PlanSearchIndex
+
+MATERIALS = ["ปูนซีเมนต์", "เหล็กเส้น DB12", "ทรายหยาบ", "หิน เบอร์ 1", "อิฐมอญ", "ไม้แบบ", "ท่อ PVC 4\"", "สีรองพื้น", "กระเบื้องหลังคา", "ลวดผูกเหล็ก"]
+TASKS = ["งานฐานราก", "งานเสาชั้น 1", "งานคานชั้น 2", "งานพื้น", "งานผนังก่ออิฐ", "งานหลังคา", "งานระบบประปา", "งานทาสี"]
+UNITS = ["ถุง", "เส้น", "ลบ.ม.", "ก้อน", "แผ่น", "ม้วน", "ท่อน"]
+QUERIES = ["ฐานราก", "DB12", "ปูน", "TASK-000123", "ไม่มีข้อมูลนี้"]
+
+
+def build_plan_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    task_ids = rng.integers(0, max(rows // 10, 1), rows)
+    return pd.DataFrame(
+        {
+            "cost_code": [f"{c:06d}" for c in rng.integers(10000, 20000, rows)],
+            "c_des1": np.asarray(MATERIALS)[rng.integers(0, len(MATERIALS), rows)],
+            "c_des2": "",
+            "itemcode": [f"P{c:013d}" for c in rng.integers(0, 5000, rows)],
+            "pre_event": [f"20210{c:02d}" for c in rng.integers(0, 40, rows)],
+            "required_qty": rng.integers(1, 500, rows).astype(str),
+            "start_date": "2025-01-01",
+            "task_id": [f"TASK-{t:06d}" for t in task_ids],
+            "task_name": np.asarray(TASKS)[task_ids % len(TASKS)],
+            "unit": np.asarray(UNITS)[rng.integers(0, len(UNITS), rows)],
+        }
+    )
+
+
+def scan_search(df: pd.DataFrame, query: str) -> pd.DataFrame:
+    # เหมือน DataRepository.get_plan เวอร์ชันเดิม
+    mask = df.apply(lambda x: x.astype(str).str.contains(query, case=False, na=False)).any(axis=1)
+    return df[mask].head(20)
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], repeat: int) -> None:
+    print(f"{'rows':>9} | {'build (s)':>9} | {'query':<14} | {'scan (ms)':>10} | {'index (ms)':>10} | {'speedup':>8} | {'hits':>7}")
+    for rows in sizes:
+        df = build_plan_frame(rows)
+        start = time.perf_counter()
+        index = PlanSearchIndex(df)
+        build = time.perf_counter() - start
+        for query in QUERIES:
+            scan = _time(lambda: scan_search(df, query), repeat)
+            lookup = _time(lambda: df.iloc[index.search(query).row_ids], repeat)
+            hits = index.search(query).total
+            print(
+                f"{rows:>9} | {build:>9.2f} | {query:<14} | {scan * 1000:>10.1f} | "
+                f"{lookup * 1000:>10.2f} | {scan / lookup:>7.0f}x | {hits:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
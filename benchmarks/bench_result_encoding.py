@@ -0,0 +1,67 @@
+"""
+Benchmark: จำนวน token (ประมาณด้วย app.data.tokens.estimate_tokens) ของผลลัพธ์ tool ที่ส่งให้ LLM
+เทียบ records เดิม (list ของ dict ทุกคอลัมน์) กับ columnar / csv (ตัดคอลัมน์ composite key, ย้ายค่าคงที่ไป constants)
+และ columnar + งบ max_tokens บน query ตัวอย่างของ Reporter
+
+    python -m benchmarks.bench_result_encoding [--budget 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.config import TOOL_RESULT_MAX_TEXT
+from app.data.repository import DataRepository
+from app.data.tokens import estimate_tokens
+from app.mcp_servers.encoding import encode_rows
+
+
+def _tokens(value: Any) -> int:
+    # FastMCP ส่ง structured content เป็น JSON แบบไม่เว้นวรรค (ไม่ escape ภาษาไทย)
+    return estimate_tokens(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str))
+
+
+def scenarios(repo: DataRepository) -> List[Tuple[str, Callable[[], List[Dict[str, Any]]]]]:
+    older = [{"column": "diff_day", "op": "gt", "value": 180}]
+    return [
+        ("read_report aging (20 rows)", lambda: repo.read_report("aging_stock_balance")),
+        ("read_report aging 5 columns", lambda: repo.read_report("aging_stock_balance", ["c_des1", "whcode", "qtybal", "diff_day", "unitname"])),
+        ("query >180 days, top 100", lambda: repo.query_report("aging", filters=older, sort=[{"column": "diff_day", "descending": True}], limit=100)["rows"]),
+        ("query >180 days in 001, top 50", lambda: repo.query_report("aging", filters=older + [{"column": "whcode", "op": "eq", "value": "001"}], limit=50)["rows"]),
+        ("query qtybal per whcode", lambda: repo.query_report("aging", group_by=["whcode"], aggregates=[{"column": "qtybal", "func": "sum"}], limit=50)["rows"]),
+    ]
+
+
+def run(budget: int) -> None:
+    repo = DataRepository()
+    header = f"{'query':<32} | {'rows':>4} | {'records':>7} | {'columnar':>8} | {'csv':>6} | {f'budget {budget}':>11} | {'saved':>6}"
+    print(header)
+    print("-" * len(header))
+    totals = [0, 0, 0, 0]
+    for name, fetch in scenarios(repo):
+        rows = fetch()
+        if not rows:
+            print(f"{name:<32} | (no data)")
+            continue
+        legacy = _tokens(rows)
+        columnar = _tokens(encode_rows(rows, "columnar", max_text=TOOL_RESULT_MAX_TEXT))
+        csv_tokens = _tokens(encode_rows(rows, "csv", max_text=TOOL_RESULT_MAX_TEXT))
+        budgeted = encode_rows(rows, "columnar", max_tokens=budget, max_text=TOOL_RESULT_MAX_TEXT)
+        budget_tokens = _tokens(budgeted)
+        kept = f"{budget_tokens} ({budgeted['row_count']})"
+        for i, value in enumerate((legacy, columnar, csv_tokens, budget_tokens)):
+            totals[i] += value
+        print(
+            f"{name:<32} | {len(rows):>4} | {legacy:>7} | {columnar:>8} | {csv_tokens:>6} | {kept:>11} | "
+            f"{1 - min(columnar, csv_tokens) / legacy:>6.0%}"
+        )
+    print("-" * len(header))
+    print(f"{'total':<32} | {'':>4} | {totals[0]:>7} | {totals[1]:>8} | {totals[2]:>6} | {totals[3]:>11} | {1 - min(totals[1], totals[2]) / totals[0]:>6.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=1000, help="max_tokens สำหรับคอลัมน์ budget")
+    args = parser.parse_args()
+    run(args.budget)
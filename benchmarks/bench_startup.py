@@ -0,0 +1,127 @@
+"""
+Benchmark: cold start (process ใหม่ทุกรอบ ไม่มี module ใด import ไว้ก่อน) เทียบกับเป้าหมาย
+- import app.config / app.llm.gateway (module ค่าคงที่ที่ทุกส่วน import)
+- import server + tool call แรก (ข้อมูลโหลดตอนใช้ครั้งแรก: call แรกรวมเวลาโหลดชุดข้อมูลนั้น)
+- dashboard render ครั้งแรกด้วย streamlit AppTest (ไม่ต้องมี MCP server / Bedrock: agent สร้างตอนได้ข้อความแรก)
+เวลาเป็นมัธยฐานของ ``--repeat`` รอบ นับจากบรรทัดแรกของโค้ดที่วัด (ไม่รวมการบูต interpreter)
+``--detail`` แสดง module ที่ใช้เวลา import (self) มากที่สุดจาก ``-X importtime``
+
+    python -m benchmarks.bench_startup [--repeat 5] [--detail] [--check]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+class Scenario(NamedTuple):
+    name: str
+    code: str
+    target_ms: float
+
+
+# โค้ดแต่ละ scenario พิมพ์ JSON {"ms": ...} เป็นบรรทัดสุดท้าย
+SCENARIOS = (
+    Scenario("import app.config", "import app.config", 50),
+    Scenario("import app.llm.gateway", "import app.llm.gateway", 100),
+    Scenario("import server", "import app.mcp_servers.server", 2500),
+    Scenario(
+        "server: first tool call",
+        """
+import asyncio
+from fastmcp import Client
+import app.mcp_servers.server as server
+
+async def first_call():
+    async with Client(server.mcp) as client:
+        await client.call_tool("get_report_columns", {"report_name": "aging"})
+
+asyncio.run(first_call())
+""",
+        3000,
+    ),
+    Scenario(
+        "dashboard: first render",
+        """
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app/ui/dashboard.py", default_timeout=120)
+app.run()
+assert not app.exception, app.exception
+""",
+        2500,
+    ),
+)
+
+_WRAPPER = """
+import json, sys, time
+_start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+print(json.dumps({{"ms": (time.perf_counter() - _start) * 1000}}))
+"""
+
+
+def run_once(code: str, importtime: bool = False) -> Tuple[float, str]:
+    args = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", _WRAPPER.format(code=code)]
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT), "LOG_SINK": "none", "DATA_RELOAD_INTERVAL_SECONDS": "0"}
+    proc = subprocess.run(args, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=300)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "scenario failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])["ms"], proc.stderr
+
+
+def top_imports(stderr: str, limit: int) -> List[Tuple[int, str]]:
+    """(self µs, module) ที่มากที่สุดจาก output ของ -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--detail", action="store_true", help="แสดง module ที่ import ช้าที่สุดของแต่ละ scenario")
+    parser.add_argument("--check", action="store_true", help="exit 1 ถ้ามี scenario เกินเป้าหมาย")
+    args = parser.parse_args()
+
+    header = f"{'scenario':<26} | {'median ms':>9} | {'min ms':>8} | {'target ms':>9} | result"
+    print(header)
+    print("-" * len(header))
+    failed: Dict[str, float] = {}
+    for scenario in SCENARIOS:
+        try:
+            times = [run_once(scenario.code)[0] for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{scenario.name:<26} | {'-':>9} | {'-':>8} | {scenario.target_ms:>9.0f} | error: {e}")
+            failed[scenario.name] = float("nan")
+            continue
+        median = statistics.median(times)
+        ok = median <= scenario.target_ms
+        if not ok:
+            failed[scenario.name] = median
+        print(
+            f"{scenario.name:<26} | {median:>9.0f} | {min(times):>8.0f} | {scenario.target_ms:>9.0f} | "
+            f"{'ok' if ok else 'OVER'}"
+        )
+        if args.detail:
+            _, stderr = run_once(scenario.code, importtime=True)
+            for self_us, name in top_imports(stderr, 8):
+                print(f"{'':<26}   {self_us / 1000:>8.1f} ms  {name}")
+    print("-" * len(header))
+    if args.check and failed:
+        raise SystemExit(f"over target: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
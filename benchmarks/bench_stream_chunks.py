@@ -0,0 +1,101 @@
+"""
+Benchmark: ส่ง token stream ผ่าน callback ของ Strands เข้า AgentLogStore
+เดิม: ต่อ string + สร้าง LogEvent + format เวลา ทุก token / ใหม่: chunk accumulator (join ตอนอ่าน)
+
+    python -m benchmarks.bench_stream_chunks --chunks 5000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional
+
+from app.telemetry.callbacks import build_agent_callback
+from app.telemetry.log_store import AgentLogStore
+
+CHUNKS = ["สรุป", "ยอด", "คง", "คลัง", " ", "ปูน", "ซีเมนต์", " 120 ", "ถุง", " ", "stock", " ", "balance", "\n"]
+
+
+@dataclass
+class LegacyLogEvent:
+    timestamp: str
+    agent: str
+    stage: str
+    message: str
+    payload: Optional[Dict[str, Any]] = None
+
+
+class LegacyLogStore:
+    # เหมือน AgentLogStore เวอร์ชันเดิม (process buffer ต่อ string ทุก token)
+    def __init__(self, max_length: int = 2000) -> None:
+        self._events: Deque[LegacyLogEvent] = deque(maxlen=max_length)
+        self._lock = Lock()
+        self._process_buffers: Dict[str, LegacyLogEvent] = {}
+
+    def add(self, agent: str, stage: str, message: str, payload: Optional[Dict[str, Any]] = None) -> LegacyLogEvent:
+        event = LegacyLogEvent(datetime.utcnow().isoformat(), agent, stage, message.strip(), payload)
+        with self._lock:
+            if stage == "process" and payload is None:
+                existing = self._process_buffers.get(agent)
+                if existing:
+                    existing.message = f"{existing.message} {event.message}".strip()
+                    existing.timestamp = event.timestamp
+                    return existing
+                self._events.append(event)
+                self._process_buffers[agent] = event
+                return event
+            self._process_buffers.pop(agent, None)
+            self._events.append(event)
+            return event
+
+    def tail(self, limit: int = 200) -> List[Dict[str, Any]]:
+        with self._lock:
+            events = list(self._events)[-limit:]
+        return [asdict(e) for e in events]
+
+
+def legacy_callback(agent_name: str, log_store: LegacyLogStore):
+    # callback เดิม: strip แล้ว add ทุก chunk
+    def handler(**kwargs: Any) -> None:
+        chunk = kwargs["data"].strip()
+        if chunk:
+            log_store.add(agent_name, "process", chunk)
+
+    return handler
+
+
+def _stream(handler, chunks: int) -> float:
+    start = time.perf_counter()
+    for i in range(chunks):
+        handler(data=CHUNKS[i % len(CHUNKS)])
+    return time.perf_counter() - start
+
+
+def run(sizes: List[int]) -> None:
+    print(f"{'chunks':>8} | {'old total (ms)':>14} | {'new total (ms)':>14} | {'old/chunk (us)':>14} | {'new/chunk (us)':>14} | {'speedup':>8} | {'read (ms)':>9}")
+    for chunks in sizes:
+        legacy = LegacyLogStore()
+        old = _stream(legacy_callback("Orchestrator", legacy), chunks)
+
+        store = AgentLogStore()
+        new = _stream(build_agent_callback("Orchestrator", store), chunks)
+        start = time.perf_counter()
+        message = store.tail(1)[0]["message"]
+        read = time.perf_counter() - start
+        assert len(message) > chunks  # ข้อความครบทุก chunk
+
+        print(
+            f"{chunks:>8} | {old * 1000:>14.1f} | {new * 1000:>14.1f} | {old / chunks * 1e6:>14.2f} | "
+            f"{new / chunks * 1e6:>14.2f} | {old / new:>7.1f}x | {read * 1000:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[5_000, 50_000])
+    args = parser.parse_args()
+    run(args.chunks)
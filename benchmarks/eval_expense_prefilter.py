@@ -0,0 +1,80 @@
+"""
+Offline evaluation: ExpenseRetriever pre-filter vs. การส่ง expense master list ทั้งหมดให้ LLM
+
+    python -m benchmarks.eval_expense_prefilter            # ไม่เรียก Bedrock (recall@K, local accuracy, token)
+    python -m benchmarks.eval_expense_prefilter --live     # เรียก Bedrock เทียบ accuracy ทั้งสองแบบ
+
+ไฟล์ชุดทดสอบ: CSV คอลัมน์ description, expected_codes (หลายรหัสคั่นด้วย "|")
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+from typing import List, Tuple
+
+from app.config import EXPENSE_CANDIDATE_K
+from app.data.repository import DataRepository
+from app.data.tokens import estimate_tokens
+
+DEFAULT_DATASET = Path(__file__).resolve().parent / "data" / "expense_eval.csv"
+
+
+def load_dataset(path: Path) -> List[Tuple[str, set[str]]]:
+    with open(path, encoding="utf-8") as f:
+        return [(row["description"], set(row["expected_codes"].split("|"))) for row in csv.DictReader(f)]
+
+
+def run(dataset: Path, live: bool) -> None:
+    repo = DataRepository()
+    samples = load_dataset(dataset)
+
+    stats = {"recall": 0, "local": 0, "local_correct": 0, "full_prompt": 0, "filtered_prompt": 0, "llm_full": 0, "llm_filtered": 0}
+    print(f"{'description':<40} | {'top-1':<6} | {'score':>5} | {'in list':<7} | route")
+    for description, expected in samples:
+        lookup = repo.lookup_expense(description)
+        candidates = lookup.candidates
+        # รหัสที่ถูกต้องอยู่ในรายการที่ LLM เห็นหรือไม่ (top-K + รหัสหมวดทั่วไป)
+        in_list = lookup.full_list or any(f"{code} - " in lookup.expense_list_str for code in expected)
+        confident = lookup.local_code is not None
+        full_prompt = repo.build_expense_prompt(description)
+        filtered_prompt = repo.build_expense_prompt(description, lookup.expense_list_str)
+
+        stats["recall"] += in_list
+        stats["full_prompt"] += estimate_tokens(full_prompt)
+        if confident:
+            stats["local"] += 1
+            stats["local_correct"] += lookup.local_code in expected
+        else:
+            stats["filtered_prompt"] += estimate_tokens(filtered_prompt)
+            if live:
+                stats["llm_filtered"] += repo.invoke_expense_llm(filtered_prompt) in expected
+        if live:
+            stats["llm_full"] += repo.invoke_expense_llm(full_prompt) in expected
+
+        top = candidates[0] if candidates else None
+        route = "local" if confident else ("llm(full)" if lookup.full_list else "llm(top-K)")
+        print(
+            f"{description[:40]:<40} | {top.expens_code if top else '-':<6} | "
+            f"{top.score if top else 0:>5.2f} | {str(in_list):<7} | {route}"
+        )
+
+    n = len(samples)
+    print()
+    print(f"samples                    : {n}")
+    print(f"{'recall@' + str(EXPENSE_CANDIDATE_K) + ' + general':<27}: {stats['recall'] / n:.1%}")
+    print(f"skipped LLM (local)        : {stats['local']} ({stats['local'] / n:.1%}), accuracy {stats['local_correct'] / max(stats['local'], 1):.1%}")
+    print(f"prompt tokens, full list   : {stats['full_prompt']:,}")
+    print(f"prompt tokens, pre-filter  : {stats['filtered_prompt']:,} (-{1 - stats['filtered_prompt'] / stats['full_prompt']:.1%})")
+    if live:
+        pipeline_correct = stats["local_correct"] + stats["llm_filtered"]
+        print(f"accuracy, full list (LLM)  : {stats['llm_full'] / n:.1%}")
+        print(f"accuracy, pre-filter       : {pipeline_correct / n:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--live", action="store_true", help="call Bedrock to compare end-to-end accuracy")
+    args = parser.parse_args()
+    run(args.dataset, args.live)
@@ -0,0 +1,203 @@
+"""
+Fake Bedrock Runtime endpoint ในเครื่อง (HTTP) สำหรับทดสอบ LLM gateway โดยไม่เรียก AWS
+- POST /model/<id>/invoke (Anthropic Messages) ตอบรหัสค่าใช้จ่ายตัวแรกที่อยู่ใน prompt เหมือน StubBedrockClient
+- POST /model/<id>/converse ตอบข้อความสั้น ๆ (ใช้กับ BedrockModel ที่ตั้ง streaming=False)
+- รับงานพร้อมกันได้ไม่เกิน ``capacity`` เกินนั้น (หรือสุ่มตาม ``throttle_rate``) ตอบ 429 ThrottlingException
+- นับ prefix ที่ถูก mark ไว้ให้ cache (cache_control / cachePoint): เจอซ้ำ = cache read, ครั้งแรก = cache write
+
+    LLM_ENDPOINT_URL=http://127.0.0.1:8900 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x streamlit run app/ui/dashboard.py
+    python -m benchmarks.fake_bedrock --port 8900 --capacity 4 --latency 0.5
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+CODE_RE = re.compile(r"\b[A-Z]\d{4}\b")
+_PATH_RE = re.compile(r"^/model/(?P<model>[^/]+)/(?P<op>invoke|converse)$")
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeBedrock:
+    def __init__(self, capacity: int = 4, latency: float = 0.05, throttle_rate: float = 0.0, port: int = 0) -> None:
+        self.capacity = capacity
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._prefixes: set = set()
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "served": 0,
+            "throttled": 0,
+            "peak_concurrency": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "input_tokens": 0,
+        }
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                fake._handle(self)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeBedrock":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-bedrock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._prefixes.clear()
+            for key in self.counters:
+                self.counters[key] = 0
+
+    # --- request handling ---
+    def _admit(self) -> bool:
+        with self._lock:
+            self.counters["requests"] += 1
+            if self._in_flight >= self.capacity or random.random() < self.throttle_rate:
+                self.counters["throttled"] += 1
+                return False
+            self._in_flight += 1
+            self.counters["peak_concurrency"] = max(self.counters["peak_concurrency"], self._in_flight)
+            return True
+
+    def _cache(self, prefix: Optional[str]) -> Tuple[int, int]:
+        """(cache read, cache write) token ของ prefix ที่ถูก mark"""
+        if not prefix:
+            return 0, 0
+        digest = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            hit = digest in self._prefixes
+            self._prefixes.add(digest)
+            key = "cache_read_tokens" if hit else "cache_write_tokens"
+            self.counters[key] += _tokens(prefix)
+        return (_tokens(prefix), 0) if hit else (0, _tokens(prefix))
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        body = json.loads(request.rfile.read(int(request.headers.get("Content-Length") or 0)) or b"{}")
+        match = _PATH_RE.match(request.path)
+        if match is None:
+            self._send(request, 404, {"message": f"Unknown path {request.path}"}, "ResourceNotFoundException")
+            return
+        if not self._admit():
+            self._send(request, 429, {"message": "Too many requests, please wait before trying again."}, "ThrottlingException")
+            return
+        try:
+            time.sleep(self.latency)
+            if match.group("op") == "invoke":
+                payload = self._invoke(body)
+            else:
+                payload = self._converse(body)
+            with self._lock:
+                self.counters["served"] += 1
+            self._send(request, 200, payload)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _invoke(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        content = body["messages"][0]["content"]
+        blocks: List[Dict[str, Any]] = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        prompt = "".join(block.get("text", "") for block in blocks)
+        cached = "".join(block["text"] for block in blocks if "cache_control" in block)
+        read, write = self._cache(cached)
+        with self._lock:
+            self.counters["input_tokens"] += _tokens(prompt)
+        code = CODE_RE.search(prompt)
+        return {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": code.group(0) if code else "A0000"}],
+            "stop_reason": "end_turn",
+            "usage": {
+                "input_tokens": _tokens(prompt) - read - write,
+                "output_tokens": 2,
+                "cache_read_input_tokens": read,
+                "cache_creation_input_tokens": write,
+            },
+        }
+
+    def _converse(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        system = body.get("system") or []
+        # ส่วนก่อน cachePoint ของ system prompt + tool spec คือ prefix ที่ cache ได้
+        prefix = ""
+        if any("cachePoint" in block for block in system):
+            prefix += json.dumps([b for b in system if "text" in b], ensure_ascii=False)
+        tools = (body.get("toolConfig") or {}).get("tools") or []
+        if any("cachePoint" in tool for tool in tools):
+            prefix += json.dumps([t for t in tools if "toolSpec" in t], ensure_ascii=False)
+        read, write = self._cache(prefix)
+        total = _tokens(json.dumps(body, ensure_ascii=False))
+        with self._lock:
+            self.counters["input_tokens"] += total
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}},
+            "stopReason": "end_turn",
+            "usage": {
+                "inputTokens": total - read - write,
+                "outputTokens": 1,
+                "totalTokens": total + 1,
+                "cacheReadInputTokens": read,
+                "cacheWriteInputTokens": write,
+            },
+            "metrics": {"latencyMs": int(self.latency * 1000)},
+        }
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any], error_type: str = "") -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        if error_type:
+            request.send_header("x-amzn-ErrorType", f"{error_type}:http://internal.amazon.com/coral/com.amazon.bedrock/")
+        request.end_headers()
+        request.wfile.write(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake Bedrock Runtime endpoint.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--capacity", type=int, default=4, help="request พร้อมกันสูงสุดก่อนตอบ 429")
+    parser.add_argument("--latency", type=float, default=0.5, help="วินาทีต่อ request")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="โอกาสตอบ 429 แม้ยังไม่เต็ม capacity")
+    args = parser.parse_args()
+    fake = FakeBedrock(args.capacity, args.latency, args.throttle_rate, port=args.port).start()
+    print(f"Fake Bedrock listening on {fake.url} (capacity={args.capacity}, latency={args.latency}s)")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(fake.counters))
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
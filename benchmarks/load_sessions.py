@@ -0,0 +1,107 @@
+"""
+Load test: AgentRuntime กลาง 1 ตัว + AgentSession ต่อผู้ใช้ ที่ 1/10/50 session พร้อมกัน
+ใช้ StubModel (ไม่เรียก Bedrock) และ StubConnectionPool (ไม่ต้องเปิด MCP server)
+
+    python -m benchmarks.load_sessions --sessions 1 10 50 --turns 5 --latency 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from typing import List
+
+import app.config as config
+from app.runtime.runtime import AgentRuntime
+from benchmarks.stubs import StubConnectionPool, StubModel
+
+MESSAGES = ["aging stock เกิน 180 วัน", "แผนงานฐานราก", "เบิกค่าแท็กซี่ 350 บาท", "สรุป cost โครงการ"]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_level(n_sessions: int, turns: int, latency: float, max_in_flight: int) -> dict:
+    gc.collect()
+    rss_before = rss_mb()
+    tracemalloc.start()
+
+    runtime = AgentRuntime(pool=StubConnectionPool(), max_in_flight=max_in_flight, queue_timeout=600)
+    sessions = [runtime.create_session() for _ in range(n_sessions)]
+    latencies: List[float] = []
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+    def user(session_index: int) -> None:
+        nonlocal peak_in_flight
+        session = sessions[session_index]
+        for turn in range(turns):
+            start = time.perf_counter()
+            session.handle(MESSAGES[(session_index + turn) % len(MESSAGES)])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                peak_in_flight = max(peak_in_flight, runtime.stats()["in_flight"])
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "sessions": n_sessions,
+        "requests": len(latencies),
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "rss_delta_mb": rss_mb() - rss_before,
+        "heap_peak_mb": heap_peak / 1024 / 1024,
+        "peak_in_flight": peak_in_flight,
+    }
+    runtime.shutdown()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency per call (s)")
+    parser.add_argument("--max-in-flight", type=int, default=config.RUNTIME_MAX_IN_FLIGHT)
+    args = parser.parse_args()
+
+    # ทุก agent ใช้ model กลางตัวเดียว -> แทนด้วย StubModel
+    config._shared_model = StubModel(latency=args.latency)
+
+    print(
+        f"{'sessions':>8} | {'requests':>8} | {'rps':>6} | {'p50 ms':>8} | {'p95 ms':>8} | "
+        f"{'RSS Δ MB':>8} | {'heap MB':>8} | {'in-flight':>9}"
+    )
+    for n in args.sessions:
+        r = run_level(n, args.turns, args.latency, args.max_in_flight)
+        print(
+            f"{r['sessions']:>8} | {r['requests']:>8} | {r['throughput_rps']:>6.1f} | {r['p50_ms']:>8.0f} | "
+            f"{r['p95_ms']:>8.0f} | {r['rss_delta_mb']:>8.1f} | {r['heap_peak_mb']:>8.1f} | "
+            f"{r['peak_in_flight']:>4}/{args.max_in_flight}"
+        )
+
+
+if __name__ == "__main__":
+    main()
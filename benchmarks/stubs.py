@@ -0,0 +1,209 @@
+"""
+Deterministic stand-ins for Bedrock and the MCP pool, used by the offline benchmarks.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from strands.models import Model
+
+# คำสำคัญสำหรับเลือก domain agent ของ Orchestrator แบบ deterministic
+ROUTING_KEYWORDS = {
+    "of_agent": ("เบิก", "ค่า", "expense", "บาท"),
+    "ppn_agent": ("แผน", "plan", "งาน", "material"),
+    "reporter_agent": ("aging", "stock", "cost", "รายงาน", "คงคลัง"),
+}
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        texts = [block["text"] for block in message.get("content", []) if "text" in block]
+        if texts:
+            return " ".join(texts)
+    return ""
+
+
+def _has_pending_tool_result(messages: List[Dict[str, Any]]) -> bool:
+    return bool(messages) and any("toolResult" in block for block in messages[-1].get("content", []))
+
+
+def _tool_results_this_turn(messages: List[Dict[str, Any]]) -> int:
+    """จำนวนข้อความ toolResult หลังข้อความผู้ใช้ล่าสุด = ขั้นที่ agent ทำไปแล้วใน turn นี้"""
+    count = 0
+    for message in reversed(messages):
+        blocks = message.get("content", [])
+        if message.get("role") == "user" and not any("toolResult" in block for block in blocks):
+            break
+        if any("toolResult" in block for block in blocks):
+            count += 1
+    return count
+
+
+class StubModel(Model):
+    """
+    Strands model ที่ไม่เรียก network: หน่วงเวลาตาม ``latency`` แล้ว stream คำตอบเป็น chunk
+    ถ้ามี tool ให้ใช้และยังไม่ได้เรียก จะเรียก tool ที่ ``choose_tool`` เลือก (ค่าเริ่มต้น: ตาม keyword)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        answer: str = "สรุปผลจากข้อมูลที่ได้รับเรียบร้อยแล้ว",
+        chunk_size: int = 8,
+        choose_tool: Optional[Callable[[str, List[str]], Optional[str]]] = None,
+    ) -> None:
+        self.latency = latency
+        self.answer = answer
+        self.chunk_size = chunk_size
+        self.choose_tool = choose_tool or self._route_by_keyword
+        self.config: Dict[str, Any] = {"model_id": "stub"}
+
+    @staticmethod
+    def _route_by_keyword(text: str, tool_names: List[str]) -> Optional[str]:
+        lowered = text.lower()
+        for tool_name, keywords in ROUTING_KEYWORDS.items():
+            if tool_name in tool_names and any(k in lowered for k in keywords):
+                return tool_name
+        return tool_names[0] if tool_names else None
+
+    def next_tool_call(
+        self, messages: List[Dict[str, Any]], prompt: str, tool_names: List[str]
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(ชื่อ tool, input) ที่จะเรียกต่อ หรือ None = ตอบเป็นข้อความ (ค่าเริ่มต้น: เรียก tool เดียวแล้วตอบ)"""
+        if _has_pending_tool_result(messages):
+            return None
+        tool_name = self.choose_tool(prompt, tool_names)
+        if not tool_name:
+            return None
+        return tool_name, ({"query": prompt} if tool_name.endswith("_agent") else {})
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> Any:
+        return self.config
+
+    def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        raise NotImplementedError("StubModel does not support structured output")
+
+    async def stream(
+        self,
+        messages,
+        tool_specs=None,
+        system_prompt=None,
+        **kwargs: Any,
+    ) -> AsyncIterable[Dict[str, Any]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        prompt = _last_user_text(messages)
+        input_tokens = sum(len(json.dumps(m, ensure_ascii=False)) for m in messages) // 4
+        yield {"messageStart": {"role": "assistant"}}
+
+        tool_names = [spec["name"] for spec in (tool_specs or [])]
+        call = self.next_tool_call(messages, prompt, tool_names)
+        if call:
+            tool_name, tool_input = call[0], json.dumps(call[1], ensure_ascii=False)
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": uuid.uuid4().hex, "name": tool_name}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": tool_input}}}}
+            yield {"contentBlockStop": {}}
+            stop_reason, output_tokens = "tool_use", len(tool_input) // 4
+        else:
+            for i in range(0, len(self.answer), self.chunk_size):
+                yield {"contentBlockDelta": {"delta": {"text": self.answer[i : i + self.chunk_size]}}}
+            yield {"contentBlockStop": {}}
+            stop_reason, output_tokens = "end_turn", len(self.answer) // 2
+
+        yield {"messageStop": {"stopReason": stop_reason}}
+        yield {
+            "metadata": {
+                "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": input_tokens + output_tokens},
+                "metrics": {"latencyMs": int(self.latency * 1000)},
+            }
+        }
+
+
+ToolScript = Sequence[Tuple[str, Dict[str, Any]]]
+
+
+class ScriptedModel(StubModel):
+    """
+    StubModel ที่เรียก tool ตามลำดับที่กำหนดต่อ agent: ``scripts`` = {ชื่อ tool ที่บอกว่าเป็น agent ไหน: [(tool, input), ...]}
+    ค่า string ใน input แทน ``{prompt}`` ด้วยข้อความผู้ใช้ได้; agent ที่ไม่มี script (Orchestrator) เลือก agent ตาม keyword
+    """
+
+    def __init__(self, scripts: Dict[str, ToolScript], latency: float = 0.0, **kwargs: Any) -> None:
+        super().__init__(latency=latency, **kwargs)
+        self.scripts = scripts
+
+    def next_tool_call(
+        self, messages: List[Dict[str, Any]], prompt: str, tool_names: List[str]
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        for marker, steps in self.scripts.items():
+            if marker not in tool_names:
+                continue
+            step = _tool_results_this_turn(messages)
+            if step >= len(steps):
+                return None
+            tool_name, tool_input = steps[step]
+            return tool_name, {k: v.format(prompt=prompt) if isinstance(v, str) else v for k, v in tool_input.items()}
+        return super().next_tool_call(messages, prompt, tool_names)
+
+
+class _StubBody:
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self._raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def read(self) -> bytes:
+        return self._raw
+
+
+class StubBedrockClient:
+    """
+    แทน ``boto3.client("bedrock-runtime")`` ของ DataRepository: หน่วงเวลาแล้วตอบรหัสค่าใช้จ่ายตัวแรกที่อยู่ใน prompt
+    (รายการ candidate) จึงได้ผลเหมือนเดิมทุกครั้ง
+    """
+
+    CODE_RE = re.compile(r"\b[A-Z]\d{4}\b")
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    def invoke_model(self, modelId: str, body: str, **kwargs: Any) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        prompt = json.loads(body)["messages"][0]["content"]
+        if isinstance(prompt, list):  # ส่วนต้นที่ mark cache_control ถูกแยกเป็น content block
+            prompt = "".join(block["text"] for block in prompt)
+        match = self.CODE_RE.search(prompt)
+        return {"body": _StubBody({"content": [{"type": "text", "text": match.group(0) if match else "A0000"}]})}
+
+
+class StubConnection:
+    """MCPConnection ที่ไม่มี tool (ให้ domain agent ตอบจาก model โดยตรง)"""
+
+    def tools(self, allowed=None) -> List[Any]:
+        return []
+
+    def ensure_healthy(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class StubConnectionPool:
+    def get(self, url: str) -> StubConnection:
+        return StubConnection()
+
+    def close_all(self) -> None:
+        pass